@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'core',
     'users',
     'posts',
@@ -144,13 +145,16 @@ REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "core.paginations.DynamicPagination",
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.StatelessJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
         'core.permissions.IsActive',
-    )
+    ),
+    # number of trusted proxies in front of the app, throttles (users.shield) read the client ip
+    # from X-Forwarded-For only behind them, 0 uses REMOTE_ADDR because the header is set by clients
+    'NUM_PROXIES': 0,
 }
 
 
@@ -166,5 +170,73 @@ SIMPLE_JWT = {
 }
 
 
+# role and status of users in stateless JWT authentication (core.authentication)
+STATELESS_AUTH = {
+    'REFRESH_INTERVAL': 30,
+}
+
+
+# write-behind buffer of views of posts (posts.buffers)
+VIEW_BUFFER = {
+    'ENABLED': False,
+    'MAX_SIZE': 500,
+    'FLUSH_INTERVAL': 2.0,
+    'SPOOL_DIR': os.path.join(BASE_DIR, 'spool', 'views'),
+}
+
+
+# audit logs of /users/token/ (users.audit), deferred mode inserts them in batches off the request path
+LOGIN_AUDIT = {
+    'MODE': 'deferred',
+    'MAX_SIZE': 200,
+    'FLUSH_INTERVAL': 1.0,
+    'MAX_PENDING': 10000,
+}
+
+
+# failed logins that are allowed in a sliding window before /users/token/ returns 429 (users.shield)
+LOGIN_SHIELD = {
+    'ENABLED': True,
+    'WINDOW': 300,
+    'BUCKETS': 10,
+    'MAX_USERNAME_FAILURES': 10,
+    'MAX_IP_FAILURES': 50,
+    'LRU_SIZE': 10000,
+}
+
+
+# raw logins that are kept before rollup-logins rolls them into daily counts (users.retention)
+LOGINS_RETENTION = {
+    'RAW_DAYS': 90,
+    'MONTHS_AHEAD': 3,
+}
+
+
+# cache backend, locmem is per process so use a shared backend (redis, memcached) in production
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+
+# cache-aside of post details (core.caches)
+POST_CACHE = {
+    'ENABLED': True,
+    'TIMEOUT': 300,
+    'LOCK_TIMEOUT': 10,
+    'WAIT': 2.0,
+}
+
+
+# cache of users that are nested in responses (core.caches)
+USER_CARD_CACHE = {
+    'ENABLED': True,
+    'TIMEOUT': 3600,
+    'LRU_SIZE': 5000,
+}
+
+
 # CORS_ALLOW_ORIGINS = []
 CORS_ALLOW_ALL_ORIGINS = True
\ No newline at end of file
@@ -0,0 +1,147 @@
+import threading
+from time import monotonic
+from django.conf import settings
+from django.db.models import Q, Count, Max
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed, InvalidToken
+)
+from rest_framework_simplejwt.settings import api_settings
+from core.models import Users
+
+
+DEFAULTS = {
+    # seconds that the statuses of users are kept in memory before they are read again
+    'REFRESH_INTERVAL': 30,
+}
+# claims that users.serializers.TokenSerializer adds to the tokens
+TOKEN_CLAIMS = ('username', 'role', 'status')
+
+
+def auth_settings():
+    return {**DEFAULTS, **getattr(settings, 'STATELESS_AUTH', {})}
+
+
+class UserStatuses:
+    """
+    An in-memory map of the users that are not active users with user role (admins, suspended,
+    deleted and inactive users), it is small and refreshed from database periodically.
+    the ids of all users are kept in a bitmap, so the ids that are not in the map and are in the
+    bitmap are active users with user role, and unknown ids (new or hard deleted users) are misses.
+    """
+
+    def __init__(self, refresh_interval):
+        self.refresh_interval = refresh_interval
+        self.users = {}
+        # bit i is set when the user with id i exists
+        self.ids = bytearray()
+        self.ids_count = 0
+        self.last_id = 0
+        self.loaded_at = None
+        self.lock = threading.Lock()
+
+    def stale(self):
+        return self.loaded_at is None or monotonic() - self.loaded_at > self.refresh_interval
+
+    def expire(self):
+        self.loaded_at = None
+
+    def _add_ids(self, ids):
+        for pk in ids:
+            byte, bit = divmod(pk, 8)
+            if byte >= len(self.ids):
+                self.ids.extend(bytes(max(byte + 1 - len(self.ids), len(self.ids))))
+            if not self.ids[byte] & (1 << bit):
+                self.ids[byte] |= 1 << bit
+                self.ids_count += 1
+            self.last_id = max(self.last_id, pk)
+
+    def refresh_ids(self):
+        """
+        add the users that are created after the last refresh to the bitmap,
+        it is rebuilt only when users are deleted (its count is more than the count of users).
+        """
+        self._add_ids(Users.objects.filter(Q(id__gt=self.last_id)).values_list('id', flat=True))
+        total = Users.objects.aggregate(count=Count('id'), last=Max('id'))
+        if total['count'] != self.ids_count or (total['last'] or 0) != self.last_id:
+            self.ids, self.ids_count, self.last_id = bytearray(), 0, 0
+            self._add_ids(Users.objects.values_list('id', flat=True).iterator(chunk_size=10000))
+
+    def refresh(self):
+        self.users = {
+            pk: (role, status, active)
+            for pk, role, status, active in Users.objects.filter(
+                ~Q(role=Users.Roles.USER) | ~Q(status=Users.Status.ACTIVE) | Q(is_active=False)
+            ).values_list('id', 'role', 'status', 'is_active')
+        }
+        self.refresh_ids()
+        self.loaded_at = monotonic()
+
+    def exists(self, user_id):
+        byte, bit = divmod(user_id, 8)
+        return 0 <= byte < len(self.ids) and bool(self.ids[byte] & (1 << bit))
+
+    def get(self, user_id):
+        """
+        returns (role, status, is_active) of the user or None when the user is not known.
+        """
+        if self.stale():
+            with self.lock:
+                if self.stale():
+                    self.refresh()
+        if user_id in self.users:
+            return self.users[user_id]
+        if not self.exists(user_id):
+            return None
+        return (Users.Roles.USER, Users.Status.ACTIVE, True)
+
+
+_statuses = None
+_statuses_lock = threading.Lock()
+
+
+def user_statuses():
+    """
+    returns the statuses of users of this process.
+    """
+    global _statuses
+    if _statuses is None:
+        with _statuses_lock:
+            if _statuses is None:
+                _statuses = UserStatuses(auth_settings()['REFRESH_INTERVAL'])
+    return _statuses
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that builds request.user from the claims of the token without loading its row.
+    role and status are taken from the in-memory statuses, so a suspended or deleted user and a changed
+    role are applied after at most REFRESH_INTERVAL seconds (and at once in the process that saved them).
+    the username is taken from its claim and the other fields of the user are deferred and loaded from
+    database only if they are read, tokens of unknown ids are authenticated by the database.
+    """
+
+    def get_user(self, validated_token):
+        if any(claim not in validated_token for claim in TOKEN_CLAIMS):
+            # tokens that are issued before the claims were added
+            return super().get_user(validated_token)
+
+        try:
+            user_id = int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError):
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        found = user_statuses().get(user_id)
+        if found is None:
+            # a user that is created after the last refresh or is deleted, it is read from database
+            return super().get_user(validated_token)
+        role, status, active = found
+        if not active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        loaded = {
+            'id': user_id, 'username': validated_token['username'], 'is_active': active, 'role': role, 'status': status
+        }
+        fields = [field.attname for field in Users._meta.concrete_fields if field.attname in loaded]
+        return Users.from_db(None, fields, [loaded[name] for name in fields])
@@ -0,0 +1,210 @@
+import threading
+from collections import OrderedDict
+from hashlib import md5
+from time import monotonic, sleep, time_ns
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.request import Request
+
+
+DEFAULTS = {
+    # when it is False post details are serialized on every request
+    'ENABLED': True,
+    # seconds that a post detail is kept, entries of old versions expire by it
+    'TIMEOUT': 300,
+    # seconds that a rebuild holds the lock of its key
+    'LOCK_TIMEOUT': 10,
+    # seconds that a request waits for the rebuild of another request before it builds itself
+    'WAIT': 2.0,
+}
+# seconds between the reads of a request that waits for a rebuild
+POLL_INTERVAL = 0.02
+
+USER_CARD_DEFAULTS = {
+    # when it is False nested users are joined and serialized on every response
+    'ENABLED': True,
+    # seconds that a card is kept in the shared cache
+    'TIMEOUT': 3600,
+    # maximum number of cards in the in-process tier
+    'LRU_SIZE': 5000,
+}
+
+
+def cache_settings():
+    return {**DEFAULTS, **getattr(settings, 'POST_CACHE', {})}
+
+
+def user_card_settings():
+    return {**USER_CARD_DEFAULTS, **getattr(settings, 'USER_CARD_CACHE', {})}
+
+
+# versions
+def version_key(kind, pk):
+    return f"version:{kind}:{pk}"
+
+
+def get_versions(*keys):
+    """
+    returns the versions of the keys. a missing (new or evicted) version starts from the current
+    time, so it never returns to a value that the entries of the old version are keyed by.
+    """
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, time_ns(), timeout=None)
+        found.update(cache.get_many(missing))
+    return tuple(found.get(key) for key in keys)
+
+
+def bump_version(kind, pk):
+    """
+    invalidate every cached entry that is built from the object.
+    """
+    key = version_key(kind, pk)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time_ns(), timeout=None)
+
+
+def request_variant(request: Request):
+    """
+    returns a short hash of the queryparams that change the representation of an object.
+    """
+    key = repr((
+        request.get_host(), request.query_params.get('expand'), request.query_params.get('fields')
+    ))
+    return md5(key.encode('utf-8'), usedforsecurity=False).hexdigest()[:16]
+
+
+def get_or_build(key, build, timeout, lock_timeout, wait):
+    """
+    cache-aside read of key with single-flight rebuild, only the request that takes the lock
+    of a missing key runs build() and the others wait for its result.
+    """
+    data = cache.get(key)
+    if data is not None:
+        return data
+
+    lock = f"{key}:lock"
+    deadline = monotonic() + wait
+    while not cache.add(lock, 1, timeout=lock_timeout):
+        sleep(POLL_INTERVAL)
+        data = cache.get(key)
+        if data is not None:
+            return data
+        if monotonic() > deadline:
+            # the holder of the lock is slow or dead, do not wait more
+            return build()
+
+    try:
+        data = build()
+        cache.set(key, data, timeout=timeout)
+        return data
+    finally:
+        cache.delete(lock)
+
+
+# post details
+def post_detail_key(post_id, variant, post_version, user_version):
+    # versions are in the key so an invalidated entry is never read again
+    return f"post-detail:{post_id}:{variant}:{post_version}:{user_version}"
+
+
+def post_versions(post_id, user_id):
+    """
+    versions of the post and its user, they are read before the post so a change that is committed
+    while the detail is built moves the next request to a new key.
+    """
+    return get_versions(version_key('posts', post_id), version_key('users', user_id))
+
+
+# user cards
+class LRUCache:
+    """
+    A bounded in-process cache that evicts the least recently used entries.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_many(self, keys):
+        found = {}
+        with self.lock:
+            for key in keys:
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    found[key] = self.entries[key]
+        return found
+
+    def set_many(self, items):
+        with self.lock:
+            for key, value in items.items():
+                self.entries[key] = value
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class UserCards:
+    """
+    The serialized representations of users that are nested in responses, keyed by user id and
+    the version of the user that is bumped on Users.save. cards are read from an in-process LRU tier,
+    then from the shared cache and the rest are built by one query.
+    """
+
+    def __init__(self, lru_size, timeout):
+        self.lru = LRUCache(lru_size)
+        self.timeout = timeout
+
+    def get_many(self, ids, variant, build):
+        """
+        returns ({id: card}, {id: version}) of the users, build(ids) returns {id: card} of the users
+        that are not cached. variant separates the cards of different hosts (urls of files).
+        """
+        versions = dict(zip(ids, get_versions(*(version_key('users', pk) for pk in ids))))
+        keys = {pk: f"user-card:{variant}:{pk}:{versions[pk]}" for pk in ids}
+
+        found = self.lru.get_many(keys.values())
+        cards = {pk: found[key] for pk, key in keys.items() if key in found}
+        missing = [pk for pk in ids if pk not in cards]
+        if not missing:
+            return cards, versions
+
+        shared = cache.get_many([keys[pk] for pk in missing])
+        loaded = {pk: shared[keys[pk]] for pk in missing if keys[pk] in shared}
+        built = build([pk for pk in missing if pk not in loaded])
+        if built:
+            cache.set_many({keys[pk]: card for pk, card in built.items()}, timeout=self.timeout)
+
+        loaded.update(built)
+        self.lru.set_many({keys[pk]: card for pk, card in loaded.items()})
+        cards.update(loaded)
+        return cards, versions
+
+
+_user_cards = None
+_user_cards_lock = threading.Lock()
+
+
+def get_user_cards():
+    """
+    returns the user cards of this process or None when the cache is disabled.
+    """
+    global _user_cards
+    config = user_card_settings()
+    if not config['ENABLED']:
+        return None
+
+    if _user_cards is None:
+        with _user_cards_lock:
+            if _user_cards is None:
+                _user_cards = UserCards(config['LRU_SIZE'], config['TIMEOUT'])
+    return _user_cards
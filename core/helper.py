@@ -1,14 +1,29 @@
 from rest_framework.response import Response
 from rest_framework.request import Request
-from rest_framework.serializers import ModelSerializer
+from rest_framework.serializers import (
+    ModelSerializer, BaseSerializer, ListSerializer
+)
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from django.db.models import Choices
 from django.db.models import Model
 from django.db.models import (ForeignKey, OneToOneField, ManyToManyField)
 from django.db.models import Q
 from rest_framework.pagination import PageNumberPagination
-from django.core.exceptions import FieldDoesNotExist, FieldError
-from core.paginations import (DynamicPagination)
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import QuerySet
+from core.paginations import (DynamicPagination, KeysetPagination)
+from core.renderers import stream_json
+from django.http import StreamingHttpResponse
+from core.serializers import (DynamicFieldsMixin, ValuesSerializer, expanded_paths)
+from random import Random, randrange
+from math import gcd
+from time import monotonic
+from array import array
+from functools import lru_cache
+from hashlib import md5
+from collections import OrderedDict
+import threading
 
 
 def update_status_value(request: Request, self, status_class: Choices, seriaizer: ModelSerializer):
@@ -39,68 +54,76 @@ def limit_paginate(request: Request, pagination_class: PageNumberPagination):
 
 
 # functions
-def dynamic_search(request: Request, model: Model):
+SEARCH_LIKE = "istartswith"
+SEARCH_OUT_QUERY_PARAMS = ['limit', 'page', 'cursor', 'fields', 'expand']
+SEARCH_EQUAL_TO_FIELDS = ['id']
+
+
+@lru_cache(maxsize=1024)
+def search_plan(model: Model, keys: tuple):
     """
-    a function that you can have dynamic search.
+    returns the lookups of query params keys on the model, the keys must be declared in
+    `search_fields` of the model (fields that are backed by an index).
+    the plan is cached by the shape of query params so fields are resolved once.
     """
-    # variables
-    like = "istartswith"
-    out_query_params = ['limit', 'page']
-    equal_to_fields = ['id']
+    searchable = getattr(model, 'search_fields', ('id',))
+    plan = []
 
-    query_params = request.query_params
-    if query_params:
-        query_search = Q()
+    for key in keys:
+        if key not in searchable:
+            raise ValidationError({"detail": f"Field ({key}) is not searchable."})
 
-        for key, value in query_params.items():
-            if key in out_query_params:
-                continue
+        search_items = key.split('-')
+        field_name = search_items[0]
 
-            if not value:
-                return Response(
-                    {"detail": "value for search is empty."},
-                    status=status.HTTP_400_BAD_REQUEST)
+        try:
+            field_obj = model._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            raise ValidationError({"detail": "Not found field."})
 
-            search_items = key.split('-')
-            field_name = search_items[0]
+        if isinstance(field_obj, (ForeignKey, ManyToManyField, OneToOneField)):
+            if len(search_items) < 2:
+                raise ValidationError({"detail": "Set second field for foreign fields."})
+            sub_field_name = search_items[1]
+            if sub_field_name.lower() not in SEARCH_EQUAL_TO_FIELDS:
+                plan.append((key, f"{field_name}__{sub_field_name}__{SEARCH_LIKE}"))
+            else:
+                plan.append((key, f"{field_name}__{sub_field_name}"))
+        else:
+            if field_name.lower() not in SEARCH_EQUAL_TO_FIELDS:
+                plan.append((key, f"{field_name}__{SEARCH_LIKE}"))
+            else:
+                plan.append((key, f"{field_name}"))
 
-            try:
-                field_obj = model._meta.get_field(field_name)
-
-                if isinstance(field_obj, (ForeignKey, ManyToManyField, OneToOneField)):
-                    try:
-                        sub_field_name = search_items[1]
-                        if sub_field_name.lower() not in equal_to_fields:
-                            query_search &= Q(
-                                **{f"{field_name}__{sub_field_name}__{like}": value}
-                            )
-                        else:
-                            query_search &= Q(
-                                **{f"{field_name}__{sub_field_name}": value}
-                            )
-                    except IndexError:
-                        return Response(
-                            {"detail": "Set second field for foreign fields."},
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
-                else:
-                    if field_name.lower() not in equal_to_fields:
-                        query_search &= Q(
-                            **{f"{field_name}__{like}": value}
-                        )
-                    else:
-                        query_search &= Q(
-                            **{f"{field_name}": value}
-                        )
-            except (FieldDoesNotExist, FieldError):
-                return Response(
-                    data={
-                        "detail": "Not found field.",
-                    },
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-        return model.objects.filter(query_search)
+    return tuple(plan)
+
+
+def search_keys(request: Request):
+    """
+    returns the query params keys of the request that are searched, without the params of
+    pagination and representation (SEARCH_OUT_QUERY_PARAMS).
+    views run dynamic_search only when there are search keys, otherwise their scope is kept.
+    """
+    return tuple(sorted(
+        key for key in request.query_params.keys() if key not in SEARCH_OUT_QUERY_PARAMS
+    ))
+
+
+def dynamic_search(request: Request, model: Model):
+    """
+    a function that you can have dynamic search on the indexed fields of the model.
+    """
+    query_params = request.query_params
+    keys = search_keys(request)
+    query_search = Q()
+
+    for key, lookup in search_plan(model, keys):
+        value = query_params.get(key)
+        if not value:
+            raise ValidationError({"detail": "value for search is empty."})
+        query_search &= Q(**{lookup: value})
+
+    return model.objects.filter(query_search)
 
 
 def set_queryset(self, role, field, check_field, model: Model):
@@ -115,3 +138,360 @@ def set_queryset(self, role, field, check_field, model: Model):
         pass
 
     return self.queryset
+
+
+# bulk APIs
+# the maximum number of ids in a bulk request
+MAX_BULK_SIZE = 100
+
+
+def bulk_ids(value, name):
+    """
+    returns the ids of a bulk request (a list or a comma separated string) in their order without duplicates.
+    """
+    if isinstance(value, str):
+        value = [item for item in value.split(',') if item.strip()]
+    if not isinstance(value, (list, tuple)) or not value:
+        raise ValidationError({"detail": f"{name} must be a non-empty list of ids."})
+
+    try:
+        ids = list(dict.fromkeys(int(item) for item in value))
+    except (TypeError, ValueError):
+        raise ValidationError({"detail": f"{name} must be a list of integers."})
+
+    if len(ids) > MAX_BULK_SIZE:
+        raise ValidationError({"detail": f"{name} can have at most {MAX_BULK_SIZE} ids."})
+    return ids
+
+
+# random sampling
+# the seconds that a pool of ids is kept before it is rebuilt from database
+SAMPLE_POOL_TTL = 60
+# the maximum number of pools that are kept in memory
+SAMPLE_POOL_MAX = 32
+
+# {sql of the ids query: (time that it is built, ids)} in least recently used order
+_sample_pools = OrderedDict()
+_sample_pools_lock = threading.Lock()
+
+
+def sample_seed(request: Request):
+    """
+    get the seed of random sampling from queryparams or generate a new one.
+    the seed is saved on the request so the paginator can keep it in next/previous links.
+    """
+    seed = request.query_params.get('seed')
+    try:
+        seed = int(seed)
+    except (TypeError, ValueError):
+        seed = randrange(1, 2 ** 31)
+
+    request._sample_seed = seed
+    return seed
+
+
+def sample_pool(queryset: QuerySet, shared=True):
+    """
+    returns the ordered ids of the queryset from a periodically rebuilt in-memory pool.
+    the pools are shared by the requests of the process and keyed by the SQL of the ids query,
+    querysets that are filtered by the request user must pass shared=False so they do not take
+    a pool for every user.
+    """
+    ids_query = queryset.order_by('pk').values_list('pk', flat=True)
+    if not shared:
+        return array('q', ids_query.iterator(chunk_size=10000))
+
+    key = str(ids_query.query)
+    now = monotonic()
+    with _sample_pools_lock:
+        found = _sample_pools.get(key)
+        if found and now - found[0] < SAMPLE_POOL_TTL:
+            _sample_pools.move_to_end(key)
+            return found[1]
+
+    # the pool is read out of the lock so other pools are not blocked by the query
+    pool = array('q', ids_query.iterator(chunk_size=10000))
+    with _sample_pools_lock:
+        _sample_pools[key] = (now, pool)
+        _sample_pools.move_to_end(key)
+        while len(_sample_pools) > SAMPLE_POOL_MAX:
+            _sample_pools.popitem(last=False)
+    return pool
+
+
+class SeededSample:
+    """
+    A lazy list of objects of a queryset in a random order that is fixed by a seed.
+    the order is an affine permutation of the id pool so every page is computed
+    without sorting the table and same seed always returns same pages.
+    """
+
+    def __init__(self, queryset: QuerySet, seed: int, shared=True):
+        self.queryset = queryset
+        self.pool = sample_pool(queryset, shared)
+
+        size = len(self.pool)
+        rng = Random(seed)
+        self.step, self.offset = 1, 0
+        if size > 1:
+            self.step = rng.randrange(1, size)
+            while gcd(self.step, size) != 1:
+                self.step = rng.randrange(1, size)
+            self.offset = rng.randrange(size)
+
+    def __len__(self):
+        return len(self.pool)
+
+    def count(self):
+        return len(self.pool)
+
+    def _ids(self, start, stop):
+        size = len(self.pool)
+        return [self.pool[(self.step * i + self.offset) % size] for i in range(start, stop)]
+
+    def _fetch(self, ids):
+        found = self.queryset.filter(pk__in=ids).in_bulk()
+        return [found[pk] for pk in ids if pk in found]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, _ = index.indices(len(self.pool))
+            return self._fetch(self._ids(start, stop))
+
+        if index < 0:
+            index += len(self.pool)
+        if not 0 <= index < len(self.pool):
+            raise IndexError("sample index out of range")
+        return self._fetch(self._ids(index, index + 1))[0]
+
+    def __iter__(self):
+        for start in range(0, len(self.pool), 1000):
+            yield from self[start:start + 1000]
+
+
+def sample_list(request: Request, self, shared=True):
+    """
+    A function for list views that return the queryset of the view in a seeded random order,
+    views of per-user querysets pass shared=False (see sample_pool).
+    """
+    objects = SeededSample(self.filter_queryset(self.get_queryset()), sample_seed(request), shared)
+
+    page = self.paginate_queryset(objects)
+    if page is not None:
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    serializer = self.get_serializer(objects, many=True)
+    return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+# prefetch planner
+@lru_cache(maxsize=512)
+def related_paths(serializer_class, expand=None):
+    """
+    read the nested serializers of a serializer class by their `source` and returns
+    the paths for select_related (forward foreign and one to one fields) and prefetch_related.
+    when expand (a frozenset of ?expand= paths) is given, the nested serializers of
+    DynamicFieldsMixin that are not expanded are skipped like their responses.
+    """
+    select, prefetch = [], []
+
+    def walk(serializer: BaseSerializer, model: Model, prefix, field_prefix, in_prefetch):
+        for name, field in serializer.fields.items():
+            many = isinstance(field, ListSerializer)
+            nested = field.child if many else field
+            if not isinstance(nested, BaseSerializer) or field.source == '*' or '.' in field.source:
+                continue
+            if expand is not None and isinstance(field, DynamicFieldsMixin) and f"{field_prefix}{name}" not in expand:
+                continue
+
+            try:
+                model_field = model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                continue
+            if not model_field.is_relation:
+                continue
+
+            path = f"{prefix}{field.source}"
+            forward = (model_field.many_to_one or model_field.one_to_one) and model_field.concrete
+            if forward and not many and not in_prefetch:
+                select.append(path)
+            else:
+                prefetch.append(path)
+
+            walk(
+                nested, model_field.related_model, f"{path}__", f"{field_prefix}{name}.",
+                in_prefetch or not forward or many
+            )
+
+    serializer = serializer_class()
+    model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+    if model is not None:
+        walk(serializer, model, '', '', False)
+    return tuple(select), tuple(prefetch)
+
+
+def prefetch_queryset(queryset: QuerySet, serializer_class, expand=None):
+    """
+    apply select_related and prefetch_related that the serializer class needs on the queryset.
+    """
+    if not isinstance(queryset, QuerySet):
+        return queryset
+
+    select, prefetch = related_paths(serializer_class, expand)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+class PrefetchMixin:
+    """
+    A mixin for generic views that joins the relations of the nested serializers
+    that are expanded in the request to the queryset of the view,
+    so a page runs a constant number of queries.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        expand = frozenset(expanded_paths(self.request))
+        return prefetch_queryset(queryset, self.get_serializer_class(), expand)
+
+
+# conditional requests
+def make_etag(request: Request, *parts):
+    """
+    returns a weak ETag of the parts of a response and the queryparams that change its representation.
+    """
+    key = repr((
+        request.get_host(), request.query_params.get('expand'), request.query_params.get('fields'), parts
+    ))
+    return f'W/"{md5(key.encode("utf-8"), usedforsecurity=False).hexdigest()}"'
+
+
+def not_modified(request: Request, etag):
+    """
+    weak comparison of the ETag with If-None-Match of the request.
+    """
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    return etag.removeprefix('W/') in {item.strip().removeprefix('W/') for item in header.split(',')}
+
+
+def instance_state(instance: Model):
+    """
+    returns the values of the concrete fields of the instance and of its joined relations.
+    """
+    state = [(field.attname, getattr(instance, field.attname)) for field in instance._meta.concrete_fields]
+    for name, related in sorted(instance._state.fields_cache.items()):
+        state.append((name, instance_state(related) if related is not None else None))
+    return state
+
+
+def pagination_state(paginator):
+    # the count and links of a page are part of its response
+    if paginator is None:
+        return ()
+    page = getattr(paginator, 'page', None)
+    count = page.paginator.count if page is not None else None
+    return (count, paginator.get_next_link(), paginator.get_previous_link())
+
+
+class ValuesListMixin:
+    """
+    A mixin for list views that renders the page by the ValuesSerializer of the serializer class,
+    the views without a declared values serializer or with fields that can not be compiled use DRF.
+    """
+
+    def list(self, request: Request, *args, **kwargs):
+        values = ValuesSerializer.of(self.get_serializer_class())
+        if values is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if not isinstance(queryset, QuerySet):
+            return super().list(request, *args, **kwargs)
+
+        plan = values.plan(request, queryset.query.annotations)
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = queryset.prefetch_related(None).values_list(*plan.lookups)
+        page = self.paginate_queryset(queryset)
+        rows = page if page is not None else list(queryset)
+        cards, versions = values.load_cards(rows, request, plan)
+
+        # the rows of the projection and the versions of their cards are the data of the response,
+        # a client that has them gets 304
+        etag = make_etag(request, rows, versions, *pagination_state(self.paginator if page is not None else None))
+        if not_modified(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        if page is not None:
+            response = self.get_paginated_response(values.render(rows, request, plan, cards))
+        else:
+            response = Response(values.render(rows, request, plan, cards))
+        response['ETag'] = etag
+        return response
+
+
+class ConditionalRetrieveMixin:
+    """
+    A mixin for retrieve views that answers If-None-Match with 304 when the object has not changed.
+    the ETag is a hash of the fields of the object and the relations that are joined for the response,
+    so it is derived from the fetched row without running the serializer.
+    """
+
+    def retrieve(self, request: Request, *args, **kwargs):
+        instance = self.get_object()
+        etag = make_etag(request, instance_state(instance))
+        if not_modified(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        response = Response(self.get_serializer(instance).data)
+        response['ETag'] = etag
+        return response
+
+
+class StreamingListMixin:
+    """
+    A mixin for list views that streams the whole result for ?limit=none as a JSON array.
+    rows are read by queryset.iterator(chunk_size) and encoded chunk by chunk (by the
+    ValuesSerializer of the serializer class when it is declared), so the memory of an
+    export does not grow with the number of rows.
+    """
+    stream_chunk_size = 2000
+
+    def list(self, request: Request, *args, **kwargs):
+        if (request.query_params.get('limit') or '').lower() != 'none':
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if not isinstance(queryset, QuerySet):
+            return super().list(request, *args, **kwargs)
+
+        # keyset views stream in the order of their pages
+        pagination_class = self.pagination_class
+        if pagination_class is not None and issubclass(pagination_class, KeysetPagination):
+            queryset = queryset.order_by(*('-' + field for field in pagination_class.ordering))
+
+        values = ValuesSerializer.of(self.get_serializer_class())
+        plan = values.plan(request, queryset.query.annotations) if values is not None else None
+        if plan is not None:
+            rows = queryset.prefetch_related(None).values_list(*plan.lookups).iterator(self.stream_chunk_size)
+
+            def render(chunk):
+                return values.render(chunk, request, plan)
+        else:
+            rows = queryset.iterator(self.stream_chunk_size)
+
+            def render(chunk):
+                return self.get_serializer(chunk, many=True).data
+
+        return StreamingHttpResponse(
+            stream_json(rows, render, self.stream_chunk_size), content_type='application/json'
+        )
@@ -0,0 +1,317 @@
+import json
+import multiprocessing
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil
+from time import perf_counter
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Q
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from core import models as CoreModels
+from core.permissions import IsAdmin
+from core.urls import router as core_router
+from posts import models as PostsModels
+from posts.urls import router as posts_router
+from users import models as UsersModels
+from users.urls import router as users_router
+from posts import buffers
+from users import audit
+from colorama import Fore, Style
+
+
+ROUTERS = (('core', core_router), ('posts', posts_router), ('users', users_router))
+USERNAME = 'bench-api'
+ADMIN_USERNAME = 'bench-api-admin'
+PASSWORD = 'bench-api'
+# fields of models that own their rows, details are read from the rows of the benchmark user
+OWNER_FIELDS = ('user', 'follower_user')
+
+
+def percentile(values, percent):
+    # nearest-rank percentile of sorted values
+    return values[max(0, ceil(percent / 100 * len(values)) - 1)]
+
+
+def init_worker():
+    """
+    the forked workers inherit the login audit and view buffer of the parent without their threads,
+    so every worker starts its own.
+    """
+    audit._audit = None
+    buffers._buffer = None
+
+
+def flush_writes():
+    # workers exit without atexit, the queued logins and views are inserted after every batch
+    for queue in (audit._audit, buffers._buffer):
+        if queue is not None:
+            queue.flush()
+
+
+def run_requests(method, path, data, headers, count):
+    """
+    send count requests by the test client and returns [(milliseconds, status, queries)],
+    it runs in the worker processes.
+    """
+    client = Client(**headers)
+    results = []
+    for _ in range(count):
+        with CaptureQueriesContext(connection) as queries:
+            started = perf_counter()
+            if method == 'POST':
+                response = client.post(path, data, content_type='application/json')
+            else:
+                response = client.get(path, data)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = (perf_counter() - started) * 1000
+        results.append((elapsed, response.status_code, len(queries)))
+    flush_writes()
+    return results
+
+
+class Command(BaseCommand):
+    help = (
+        "Send requests to every route of the core, posts and users routers and the token views, "
+        "and report latency percentiles, throughput and SQL queries of every endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50, help="Number of measured requests of every endpoint."
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=4, help="Number of worker processes that send the requests."
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=2, help="Requests of every worker that are sent before measuring."
+        )
+        parser.add_argument(
+            '--filter', default='', help="Only endpoints that have this text in their path."
+        )
+        parser.add_argument(
+            '--output', default=None, help="Write the results as JSON to this file."
+        )
+        parser.add_argument(
+            '--baseline', default=None, help="JSON results of an earlier run to compare p95 and queries with."
+        )
+
+    # data
+    def ensure_data(self):
+        """
+        create the benchmark users and one row of every kind of them, so every route has something to return.
+        """
+        password = make_password(PASSWORD)
+        users = {}
+        for username, role in ((USERNAME, CoreModels.Users.Roles.USER), (ADMIN_USERNAME, CoreModels.Users.Roles.ADMIN)):
+            user, created = CoreModels.Users.objects.get_or_create(
+                username=username,
+                defaults={
+                    'first_name': 'bench', 'last_name': 'bench', 'phone': '0', 'email': None,
+                    'role': role, 'password': password,
+                },
+            )
+            users[role] = user
+        user = users[CoreModels.Users.Roles.USER]
+
+        post = CoreModels.Posts.objects.filter(Q(user=user)).first()
+        if post is None:
+            text = CoreModels.Texts.objects.create(
+                text='bench api', user=user, status=CoreModels.Texts.Status.IS_USED
+            )
+            post = CoreModels.Posts.objects.create(user=user, title='bench api', text=text)
+        album, _ = PostsModels.Albums.objects.get_or_create(user=user, title='bench api')
+        PostsModels.SavePosts.objects.get_or_create(user=user, post=post, album=album)
+        PostsModels.LikePost.objects.get_or_create(user=user, post=post)
+        PostsModels.ViewPost.objects.get_or_create(user=user, post=post)
+        if not PostsModels.Comments.objects.filter(Q(user=user)).exists():
+            PostsModels.Comments.objects.create(user=user, post=post, comment='bench api')
+
+        # followings and a follower of the benchmark user
+        followed = CoreModels.Users.objects.filter(
+            Q(role=CoreModels.Users.Roles.USER) & Q(status=CoreModels.Users.Status.ACTIVE) & ~Q(pk=user.pk)
+        ).values_list('id', flat=True)[:10]
+        UsersModels.Follow.objects.bulk_create([
+            UsersModels.Follow(follower_user=user, followed_user_id=pk) for pk in followed
+        ] + [
+            UsersModels.Follow(follower_user=users[CoreModels.Users.Roles.ADMIN], followed_user=user)
+        ], ignore_conflicts=True)
+        return users
+
+    def tokens(self, client, username):
+        response = client.post(
+            '/users/token/', {'username': username, 'password': PASSWORD}, content_type='application/json'
+        )
+        if response.status_code != 200:
+            raise CommandError(f"Can not get a token of {username}: {response.status_code} {response.content[:200]}")
+        return response.json()
+
+    def detail_pk(self, model, user):
+        queryset = model.objects.all()
+        if model is CoreModels.Users:
+            return user.pk
+        for field in OWNER_FIELDS:
+            if any(item.name == field for item in model._meta.fields):
+                owned = queryset.filter(Q(**{field: user})).values_list('id', flat=True).first()
+                if owned is not None:
+                    return owned
+        return queryset.values_list('id', flat=True).first()
+
+    # endpoints
+    def endpoints(self, users):
+        """
+        returns [(method, path, data, admin)] of the routes, admin routes are sent by the admin user.
+        write endpoints that change data are left out, except the idempotent bulk endpoints and tokens.
+        """
+        user = users[CoreModels.Users.Roles.USER]
+        posts = list(CoreModels.Posts.objects.order_by('id').values_list('id', flat=True)[:20])
+        users_ids = list(CoreModels.Users.objects.order_by('id').values_list('id', flat=True)[:20])
+        title = CoreModels.Posts.objects.filter(Q(user=user)).values_list('title', flat=True).first() or 'bench'
+        # query params that routes need to return data
+        params = {
+            'posts/random-posts/': {'day': 30},
+            'posts/search/': {'q': title.split()[0]},
+            'posts/interactions/': {'posts': ','.join(map(str, posts))},
+            'users/follow-status/': {'users': ','.join(map(str, users_ids))},
+        }
+        bodies = {
+            'posts/bulk-like-posts/': {'posts': posts},
+            'posts/bulk-view-post/': {'posts': posts},
+        }
+
+        found = []
+        for app, router in ROUTERS:
+            found.append(('GET', f'/{app}/', {}, False))
+            for prefix, viewset, _ in router.registry:
+                route = f'{app}/{prefix}/'
+                admin = IsAdmin in getattr(viewset, 'permission_classes', ())
+                if hasattr(viewset, 'list'):
+                    found.append(('GET', f'/{route}', params.get(route, {}), admin))
+                if hasattr(viewset, 'retrieve'):
+                    model = getattr(viewset.queryset, 'model', None)
+                    pk = self.detail_pk(model, user) if model is not None else None
+                    if pk is not None:
+                        found.append(('GET', f'/{route}{pk}/', {}, admin))
+                if route in bodies:
+                    found.append(('POST', f'/{route}', bodies[route], admin))
+        return found
+
+    def measure(self, pool, method, path, data, headers, count, warmup, concurrency):
+        counts = [count // concurrency + (1 if i < count % concurrency else 0) for i in range(concurrency)]
+        if pool is None:
+            run_requests(method, path, data, headers, warmup)
+            started = perf_counter()
+            results = run_requests(method, path, data, headers, count)
+            return results, perf_counter() - started
+
+        list(pool.map(run_requests, *zip(*[(method, path, data, headers, warmup)] * concurrency)))
+        started = perf_counter()
+        futures = [
+            pool.submit(run_requests, method, path, data, headers, part) for part in counts if part
+        ]
+        results = [result for future in futures for result in future.result()]
+        return results, perf_counter() - started
+
+    def summary(self, method, path, results, wall):
+        timings = sorted(elapsed for elapsed, _, _ in results)
+        statuses = {}
+        for _, status, _ in results:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        return {
+            'endpoint': f'{method} {path}',
+            'requests': len(results),
+            'statuses': statuses,
+            'errors': sum(count for status, count in statuses.items() if int(status) >= 400),
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            'throughput_rps': round(len(results) / wall, 1),
+            'queries_per_request': round(sum(queries for _, _, queries in results) / len(results), 2),
+        }
+
+    def report(self, result, baseline):
+        color = Fore.RED if result['errors'] else ''
+        line = (
+            f"{color}{result['endpoint']:<52}{Style.RESET_ALL} "
+            f"p50 {result['p50_ms']:>8.2f}  p95 {result['p95_ms']:>8.2f}  p99 {result['p99_ms']:>8.2f} ms  "
+            f"{result['throughput_rps']:>8.1f} req/s  {result['queries_per_request']:>6.2f} queries  "
+            f"{','.join(f'{status}:{count}' for status, count in result['statuses'].items())}"
+        )
+        old = baseline.get(result['endpoint'])
+        if old:
+            change = (result['p95_ms'] - old['p95_ms']) / (old['p95_ms'] or 1) * 100
+            color = Fore.RED if change > 10 else Fore.GREEN if change < -10 else ''
+            line += (
+                f"  {color}p95 {change:+.0f}%{Style.RESET_ALL}"
+                f" queries {result['queries_per_request'] - old['queries_per_request']:+.2f}"
+            )
+        print(line)
+
+    def commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def handle(self, *args, **options):
+        count, concurrency, warmup = options['requests'], options['concurrency'], options['warmup']
+        if count < 1 or concurrency < 1:
+            raise CommandError("--requests and --concurrency must be positive.")
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = {result['endpoint']: result for result in json.load(file)['results']}
+
+        users = self.ensure_data()
+        client = Client()
+        tokens = {role: self.tokens(client, user.username) for role, user in users.items()}
+        headers = {
+            admin: {'HTTP_AUTHORIZATION': f"Bearer {tokens[role]['access']}"}
+            for admin, role in ((False, CoreModels.Users.Roles.USER), (True, CoreModels.Users.Roles.ADMIN))
+        }
+        endpoints = [
+            (method, path, data, headers[admin]) for method, path, data, admin in self.endpoints(users)
+        ] + [
+            ('POST', '/users/token/', {'username': USERNAME, 'password': PASSWORD}, {}),
+            ('POST', '/users/token/refresh/', {'refresh': tokens[CoreModels.Users.Roles.USER]['refresh']}, {}),
+        ]
+        endpoints = [endpoint for endpoint in endpoints if options['filter'] in endpoint[1]]
+        print(
+            f"{Fore.CYAN}Endpoints: {len(endpoints)}, requests: {count}, "
+            f"concurrency: {concurrency}, warmup: {warmup}{Style.RESET_ALL}"
+        )
+
+        # workers are forked with the loaded project and open their own database connections
+        connections.close_all()
+        pool = None
+        if concurrency > 1:
+            pool = ProcessPoolExecutor(
+                concurrency, mp_context=multiprocessing.get_context('fork'), initializer=init_worker
+            )
+
+        results = []
+        try:
+            for method, path, data, endpoint_headers in endpoints:
+                responses, wall = self.measure(
+                    pool, method, path, data, endpoint_headers, count, warmup, concurrency
+                )
+                result = self.summary(method, path, responses, wall)
+                results.append(result)
+                self.report(result, baseline)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump({
+                    'commit': self.commit(), 'database': connection.vendor,
+                    'requests': count, 'concurrency': concurrency, 'warmup': warmup, 'results': results,
+                }, file, indent=2)
+            print(f"{Fore.CYAN}Results are written to {options['output']}{Style.RESET_ALL}")
@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand
+from core import models as CoreModels
+from core.helper import SeededSample
+from time import perf_counter
+from colorama import Fore, Style
+
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = "Compare ORDER BY RANDOM() pagination with the seeded sampling of core.helper on posts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=1_000_000, help="Make sure this number of posts exists before benchmark."
+        )
+        parser.add_argument(
+            '--pages', type=int, default=20, help="Number of pages that are fetched in every mode."
+        )
+        parser.add_argument(
+            '--limit', type=int, default=10, help="Page size."
+        )
+
+    def ensure_posts(self, count):
+        """
+        bulk insert text posts for a benchmark user until the table has `count` posts.
+        """
+        missing = count - CoreModels.Posts.objects.count()
+        if missing <= 0:
+            return
+
+        print(f"Inserting {missing} Posts ... ", end='', flush=True)
+        user, _ = CoreModels.Users.objects.get_or_create(
+            username='bench-random',
+            defaults={'first_name': 'bench', 'last_name': 'bench', 'phone': '0', 'email': None},
+        )
+        while missing > 0:
+            size = min(BATCH_SIZE, missing)
+            texts = CoreModels.Texts.objects.bulk_create([
+                CoreModels.Texts(text='bench', user=user, status=CoreModels.Texts.Status.IS_USED)
+                for _ in range(size)
+            ])
+            CoreModels.Posts.objects.bulk_create([
+                CoreModels.Posts(user=user, title='bench', text=text) for text in texts
+            ])
+            missing -= size
+        print(f"{Fore.GREEN}OK{Style.RESET_ALL}")
+
+    def measure(self, name, pages, fetch_page):
+        started = perf_counter()
+        for page in range(pages):
+            list(fetch_page(page))
+        elapsed = perf_counter() - started
+        print(f"{name:<24} total {elapsed * 1000:>10.1f} ms   per page {elapsed * 1000 / pages:>8.2f} ms")
+        return elapsed
+
+    def handle(self, *args, **options):
+        self.ensure_posts(options['posts'])
+        pages, limit = options['pages'], options['limit']
+        queryset = CoreModels.Posts.objects.all()
+        print(f"{Fore.CYAN}Posts: {CoreModels.Posts.objects.count()}, pages: {pages}, limit: {limit}{Style.RESET_ALL}")
+
+        random_order = self.measure(
+            "ORDER BY RANDOM()", pages,
+            lambda page: queryset.order_by('?')[page * limit:(page + 1) * limit]
+        )
+
+        # building the id pool happens once per SAMPLE_POOL_TTL so it is measured separately
+        started = perf_counter()
+        sample = SeededSample(queryset, seed=1)
+        print(f"{'SeededSample pool build':<24} total {(perf_counter() - started) * 1000:>10.1f} ms")
+        seeded = self.measure(
+            "SeededSample", pages,
+            lambda page: sample[page * limit:(page + 1) * limit]
+        )
+
+        # same seed returns same pages
+        stable = SeededSample(queryset, seed=1)[:limit] == SeededSample(queryset, seed=1)[:limit]
+        print(f"Speedup: {random_order / seeded:.1f}x, stable pages with same seed: {stable}")
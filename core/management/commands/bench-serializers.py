@@ -0,0 +1,113 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from core import models as CoreModels
+from core.serializers import (
+    ValuesSerializer, PostsSerializer, UsersSerializer, expanded_paths
+)
+from core.helper import prefetch_queryset
+from core.paginations import DynamicPagination
+from posts import models as PostsModels
+from posts.serializers import LikePostSerializer
+from time import perf_counter
+from colorama import Fore, Style
+
+
+BATCH_SIZE = 5000
+
+# (name, serializer class, queryset, ?expand=)
+CASES = [
+    ('posts', PostsSerializer, lambda: CoreModels.Posts.objects.all(), ''),
+    (
+        'posts expanded', PostsSerializer, lambda: CoreModels.Posts.objects.all(),
+        'user_detail,text_detail.user_detail,image_detail.user_detail,video_detail.user_detail'
+    ),
+    ('users', UsersSerializer, lambda: CoreModels.Users.objects.all(), ''),
+    ('liked posts', LikePostSerializer, lambda: PostsModels.LikePost.objects.all(), ''),
+    (
+        'liked posts expanded', LikePostSerializer, lambda: PostsModels.LikePost.objects.all(),
+        'user_details,post_details.user_detail,post_details.text_detail'
+    ),
+]
+
+
+class Command(BaseCommand):
+    help = "Compare the speed of ValuesSerializer with the ModelSerializers, their parity is tested by the tests of the apps."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=DynamicPagination.page_size * 10, help="Page size."
+        )
+        parser.add_argument(
+            '--rounds', type=int, default=50, help="Number of pages that are rendered in every mode."
+        )
+
+    def ensure_rows(self, count):
+        """
+        bulk insert posts and likes of a benchmark user until there is a page of them.
+        """
+        user, _ = CoreModels.Users.objects.get_or_create(
+            username='bench-serializers',
+            defaults={'first_name': 'bench', 'last_name': 'bench', 'phone': '0', 'email': None},
+        )
+        missing = count - CoreModels.Posts.objects.count()
+        if missing > 0:
+            print(f"Inserting {missing} Posts ... ", end='', flush=True)
+            while missing > 0:
+                size = min(BATCH_SIZE, missing)
+                texts = CoreModels.Texts.objects.bulk_create([
+                    CoreModels.Texts(text='bench', user=user, status=CoreModels.Texts.Status.IS_USED)
+                    for _ in range(size)
+                ])
+                CoreModels.Posts.objects.bulk_create([
+                    CoreModels.Posts(user=user, title='bench', text=text) for text in texts
+                ])
+                missing -= size
+            print(f"{Fore.GREEN}OK{Style.RESET_ALL}")
+
+        if PostsModels.LikePost.objects.count() < count:
+            liked = PostsModels.LikePost.objects.filter(Q(user=user)).values_list('post', flat=True)
+            posts = CoreModels.Posts.objects.exclude(Q(id__in=liked)).values_list('id', flat=True)[:count]
+            PostsModels.LikePost.objects.bulk_create(
+                [PostsModels.LikePost(user=user, post_id=post) for post in posts], ignore_conflicts=True
+            )
+
+    def request(self, expand):
+        return Request(APIRequestFactory().get('/', {'expand': expand} if expand else {}))
+
+    def model_page(self, serializer_class, queryset, request, limit):
+        expand = frozenset(expanded_paths(request))
+        page = list(prefetch_queryset(queryset, serializer_class, expand)[:limit])
+        return serializer_class(page, many=True, context={'request': request}).data
+
+    def values_page(self, values, queryset, request, limit):
+        plan = values.plan(request)
+        return values.render(queryset.values_list(*plan.lookups)[:limit], request, plan)
+
+    def measure(self, rounds, render):
+        started = perf_counter()
+        for _ in range(rounds):
+            render()
+        return (perf_counter() - started) * 1000 / rounds
+
+    def handle(self, *args, **options):
+        limit, rounds = options['limit'], options['rounds']
+        self.ensure_rows(limit)
+        print(f"{Fore.CYAN}Page size: {limit}, rounds: {rounds}{Style.RESET_ALL}")
+
+        for name, serializer_class, queryset, expand in CASES:
+            request = self.request(expand)
+            queryset = queryset().order_by('id')
+            values = ValuesSerializer.of(serializer_class)
+            if values is None or values.plan(request) is None:
+                print(f"{name:<22} {Fore.RED}can not be compiled{Style.RESET_ALL}")
+                continue
+
+            model_ms = self.measure(rounds, lambda: self.model_page(serializer_class, queryset, request, limit))
+            values_ms = self.measure(rounds, lambda: self.values_page(values, queryset, request, limit))
+            print(
+                f"{name:<22} ModelSerializer {model_ms:>8.2f} ms   ValuesSerializer {values_ms:>8.2f} ms   "
+                f"speedup {model_ms / values_ms:.1f}x"
+            )
+
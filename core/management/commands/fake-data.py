@@ -1,179 +1,356 @@
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from faker import Faker
 from core import models as CoreModels
 from posts import models as PostsModels
 from users import models as UsersModels
-from random import randint, choice
+from random import Random
+from itertools import accumulate
+from time import perf_counter
 from django.contrib.auth.hashers import make_password
-from django.db.models import Q
+from django.db import connection, transaction
+from django.db.models import Q, Choices, DateTimeField
+from django.utils import timezone
 from colorama import Fore, Style
 
 
-def Green_OK():
-    print(f"{Fore.GREEN}OK{Style.RESET_ALL}")
+def Green_OK(count=None, started=None):
+    details = f" ({count} rows in {perf_counter() - started:.1f} s)" if started is not None else ""
+    print(f"{Fore.GREEN}OK{Style.RESET_ALL}{details}")
 
 
 faker_fa = Faker('fa_IR')
 
+# number of generated texts, names, ... that rows are filled from, faker is too slow for every row
+POOL_SIZE = 500
+ALBUM_TITLE = 'Saved Posts'
+
+
+def insert_rows(model, fields, rows, batch_size, ignore_conflicts=False):
+    """
+    insert rows (tuples of values of the attnames in fields) in batches and returns the number of rows.
+    postgres loads them by COPY and the other databases by bulk_create, the other fields get their
+    defaults. rows that break a unique constraint are skipped when ignore_conflicts is True.
+    """
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            count += _insert_batch(model, fields, batch, ignore_conflicts)
+            batch = []
+    if batch:
+        count += _insert_batch(model, fields, batch, ignore_conflicts)
+    return count
+
+
+def _insert_batch(model, fields, rows, ignore_conflicts):
+    if connection.vendor != 'postgresql':
+        model.objects.bulk_create(
+            [model(**dict(zip(fields, row))) for row in rows], ignore_conflicts=ignore_conflicts
+        )
+        return len(rows)
+
+    # COPY does not run pre_save, so auto_now_add and the defaults of not null fields are given
+    now = timezone.now()
+    extra = {}
+    for field in model._meta.concrete_fields:
+        if field.primary_key or field.attname in fields:
+            continue
+        if getattr(field, 'auto_now_add', False) or getattr(field, 'auto_now', False):
+            extra[field.attname] = now if isinstance(field, DateTimeField) else timezone.localdate()
+        elif not field.null:
+            default = field.get_default()
+            extra[field.attname] = default.value if isinstance(default, Choices) else default
+
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    columns = ', '.join(qn(model._meta.get_field(name).column) for name in [*fields, *extra])
+    extra_values = tuple(extra.values())
+    with transaction.atomic(), connection.cursor() as cursor:
+        target = table
+        if ignore_conflicts:
+            # COPY can not skip conflicts, rows are copied to a temporary table and inserted from it
+            target = qn('seed_rows')
+            cursor.execute(f"CREATE TEMP TABLE {target} ON COMMIT DROP AS SELECT {columns} FROM {table} WITH NO DATA")
+        with cursor.cursor.copy(f"COPY {target} ({columns}) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row(row + extra_values)
+        if ignore_conflicts:
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {target} ON CONFLICT DO NOTHING"
+            )
+            return cursor.rowcount
+    return len(rows)
+
+
+def new_ids(model, last_id):
+    """
+    ids of the rows that are inserted after last_id, in the order of insert.
+    """
+    return list(model.objects.filter(Q(id__gt=last_id)).order_by('id').values_list('id', flat=True))
+
+
+def last_id(model):
+    return model.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
 
 class Command(BaseCommand):
-    print(f"{Fore.CYAN}Inserting fake data ... {Style.RESET_ALL}")
+    help = (
+        "Insert fake users, posts and interactions in batches. followers and engagement of users "
+        "and posts follow power-law distributions, --seed makes the data reproducible."
+    )
 
-    def handle(self, *args, **options):
-        # inserting users
-        print("Inserting Users ... ", end='')
-        for _ in range(30):
+    def add_arguments(self, parser):
+        counts = {
+            'users': 30, 'posts': 90, 'likes': 30, 'views': 30, 'comments': 30, 'saves': 30, 'follows': 60,
+        }
+        for name, default in counts.items():
+            parser.add_argument(f'--{name}', type=int, default=default, help=f"Number of {name} to insert.")
+        parser.add_argument(
+            '--seed', type=int, default=None, help="Seed of the random generators for a reproducible dataset."
+        )
+        parser.add_argument(
+            '--password', default='password', help="Password of every inserted user, it is hashed once."
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=10000, help="Number of rows in every COPY or bulk_create."
+        )
+        parser.add_argument(
+            '--exponent', type=float, default=1.1,
+            help="Exponent of the Zipf popularity of users (followers) and posts (likes, views, ...)."
+        )
+        parser.add_argument(
+            '--alpha', type=float, default=1.5,
+            help="Shape of the Pareto activity of users, how many posts, follows and interactions they make."
+        )
+        parser.add_argument(
+            '--skip-derived', action='store_true',
+            help="Do not recompute counters, search documents and timelines after insert."
+        )
+
+    # distributions
+    def popularity(self, ids):
+        """
+        returns (ids, cumulative weights), ids are shuffled and the weight of rank r is 1 / r ** exponent.
+        """
+        ids = list(ids)
+        self.random.shuffle(ids)
+        return ids, list(accumulate((rank ** -self.exponent for rank in range(1, len(ids) + 1))))
+
+    def activity(self, ids, total, cap):
+        """
+        split total between ids by Pareto weights and returns [(id, count)], no count is more than cap.
+        """
+        weights = [self.random.paretovariate(self.alpha) for _ in ids]
+        scale = total / (sum(weights) or 1)
+        # random rounding keeps the sum close to total
+        counts = [(pk, min(cap, int(weight * scale + self.random.random()))) for pk, weight in zip(ids, weights)]
+        return [(pk, count) for pk, count in counts if count]
+
+    def pick(self, population, k, exclude=None):
+        """
+        k distinct items of the population by their popularity.
+        """
+        ids, weights = population
+        picked = set()
+        for _ in range(5):
+            missing = k - len(picked)
+            if missing <= 0:
+                break
+            picked.update(self.random.choices(ids, cum_weights=weights, k=missing + missing // 4 + 1))
+            picked.discard(exclude)
+        return list(picked)[:k]
+
+    def pools(self):
+        self.texts = [faker_fa.text(300) for _ in range(POOL_SIZE)]
+        self.titles = [faker_fa.text(20) for _ in range(POOL_SIZE)]
+        self.first_names = [faker_fa.first_name()[:150] for _ in range(POOL_SIZE)]
+        self.last_names = [faker_fa.last_name()[:150] for _ in range(POOL_SIZE)]
+        self.user_names = [faker_fa.user_name()[:100] for _ in range(POOL_SIZE)]
+        self.phones = [faker_fa.phone_number()[:150] for _ in range(POOL_SIZE)]
+        self.domains = [faker_fa.free_email_domain() for _ in range(POOL_SIZE)]
+        self.profiles = [faker_fa.image_url(width=256, height=256) for _ in range(POOL_SIZE)]
+        self.images = [faker_fa.image_url(width=1366, height=768) for _ in range(POOL_SIZE)]
+        self.videos = [faker_fa.file_path(extension='mp4') for _ in range(POOL_SIZE)]
+
+    # inserts
+    def insert_users(self, count):
+        # one hash for every user, hashing is the slowest part of a user
+        password = make_password(self.password)
+        start = last_id(CoreModels.Users) + 1
+        statuses = [status.value for status in CoreModels.Users.Status]
+
+        def rows():
+            for number in range(start, start + count):
+                username = f"{self.random.choice(self.user_names)}_{number}"
+                yield (
+                    password, username, self.random.choice(self.first_names), self.random.choice(self.last_names),
+                    self.random.choice(self.phones), f"{username}@{self.random.choice(self.domains)}",
+                    CoreModels.Users.Roles.USER.value, self.random.choice(self.profiles),
+                    self.random.choices(statuses, weights=[90, 5, 5])[0],
+                )
+
+        return insert_rows(
+            CoreModels.Users,
+            ('password', 'username', 'first_name', 'last_name', 'phone', 'email', 'role', 'profile', 'status'),
+            rows(), self.batch_size
+        )
+
+    def insert_test_users(self):
+        # user1 and admin are used in the documents of the APIs
+        for username, password, role in (
+            ('user1', '1234', CoreModels.Users.Roles.USER), ('admin', 'admin', CoreModels.Users.Roles.ADMIN),
+        ):
+            if CoreModels.Users.objects.filter(Q(username=username)).exists():
+                continue
             CoreModels.Users.objects.create(
-                first_name=faker_fa.first_name()[:150],
-                last_name=faker_fa.last_name()[:150],
-                email=faker_fa.email(),
-                role=CoreModels.Users.Roles.USER,
-                profile=faker_fa.image_url(width=256, height=256),
-                status=choice(
-                    list(CoreModels.Users.Status)
-                ),
-                password=make_password(faker_fa.password(special_chars=False)),
-                username=faker_fa.user_name()[:150],
-                phone=faker_fa.phone_number()[:150],
+                first_name=username, last_name=username, email=faker_fa.email(), role=role,
+                profile=faker_fa.image_url(width=256, height=256), status=CoreModels.Users.Status.ACTIVE,
+                password=make_password(password), username=username, phone=faker_fa.phone_number(),
             )
-        # # create test users
-        CoreModels.Users.objects.create(
-            first_name='user1',
-            last_name='user1',
-            email=faker_fa.email(),
-            role=CoreModels.Users.Roles.USER,
-            profile=faker_fa.image_url(width=256, height=256),
-            status=CoreModels.Users.Status.ACTIVE,
-            password=make_password('1234'),
-            username='user1',
-            phone=faker_fa.phone_number(),
+
+    def insert_posts(self, users, count):
+        """
+        insert posts of users by their activity, every post has a text and some have an image or a video.
+        """
+        authors = [
+            user for user, posts in self.activity(users, count, count) for _ in range(posts)
+        ]
+        self.random.shuffle(authors)
+        images = [user for user in authors if self.random.random() < 0.4]
+        videos = [user for user in authors if self.random.random() < 0.1]
+
+        content = {}
+        for model, field, pool, owners in (
+            (CoreModels.Texts, 'text', self.texts, authors),
+            (CoreModels.Images, 'image', self.images, images),
+            (CoreModels.Videos, 'video', self.videos, videos),
+        ):
+            start = last_id(model)
+            fields = (field, 'user_id', 'status') + (('caption',) if model is not CoreModels.Texts else ())
+            insert_rows(model, fields, (
+                (self.random.choice(pool), user, CoreModels.Texts.Status.IS_USED.value) +
+                ((self.random.choice(self.texts),) if model is not CoreModels.Texts else ())
+                for user in owners
+            ), self.batch_size)
+            # contents of a user are given to posts of the same user in order
+            content[field] = {}
+            for user, pk in zip(owners, new_ids(model, start)):
+                content[field].setdefault(user, []).append(pk)
+
+        def rows():
+            for user in authors:
+                image = content['image'].get(user)
+                video = content['video'].get(user)
+                yield (
+                    user, self.random.choice(self.titles), content['text'][user].pop(),
+                    image.pop() if image else None, video.pop() if video else None,
+                )
+
+        return insert_rows(
+            CoreModels.Posts, ('user_id', 'title', 'text_id', 'image_id', 'video_id'), rows(), self.batch_size
+        )
+
+    def insert_albums(self, users):
+        count = insert_rows(
+            PostsModels.Albums, ('user_id', 'title'), ((user, ALBUM_TITLE) for user in users),
+            self.batch_size, ignore_conflicts=True
         )
-        CoreModels.Users.objects.create(
-            first_name='admin ',
-            last_name='admin',
-            email=faker_fa.email(),
-            role=CoreModels.Users.Roles.ADMIN,
-            profile=faker_fa.image_url(width=256, height=256),
-            status=CoreModels.Users.Status.ACTIVE,
-            password=make_password('admin'),
-            username='admin',
-            phone=faker_fa.phone_number(),
+        # saved posts of a user go to its album
+        self.albums = dict(PostsModels.Albums.objects.filter(Q(title=ALBUM_TITLE)).values_list('user', 'id'))
+        return count
+
+    def interactions(self, users, posts, total):
+        """
+        yield distinct (user, post) pairs, active users make more and popular posts get more of them.
+        """
+        for user, count in self.activity(users, total, len(posts[0])):
+            for post in self.pick(posts, count):
+                yield user, post
+
+    def insert_follows(self, users, total):
+        popular = self.popularity(users)
+
+        def rows():
+            for follower, count in self.activity(users, total, len(users) - 1):
+                for followed in self.pick(popular, count, exclude=follower):
+                    yield follower, followed
+
+        return insert_rows(
+            UsersModels.Follow, ('follower_user_id', 'followed_user_id'), rows(), self.batch_size,
+            ignore_conflicts=True
         )
-        user_users_list = list(CoreModels.Users.objects.filter(
+
+    def step(self, name, insert):
+        print(f"Inserting {name} ... ", end='', flush=True)
+        started = perf_counter()
+        count = insert()
+        Green_OK(count, started)
+
+    def handle(self, *args, **options):
+        self.random = Random(options['seed'])
+        if options['seed'] is not None:
+            faker_fa.seed_instance(options['seed'])
+        self.password = options['password']
+        self.batch_size = options['batch_size']
+        self.exponent = options['exponent']
+        self.alpha = options['alpha']
+        started = perf_counter()
+        print(f"{Fore.CYAN}Inserting fake data ... {Style.RESET_ALL}")
+        self.pools()
+
+        # inserting users
+        self.step('Users', lambda: self.insert_users(options['users']))
+        self.insert_test_users()
+        # every loop below uses this list instead of querying users again
+        users = list(CoreModels.Users.objects.filter(
             Q(role=CoreModels.Users.Roles.USER)
+        ).order_by('id').values_list('id', flat=True))
+        if len(users) < 2:
+            print(f"{Fore.RED}At least two users are needed.{Style.RESET_ALL}")
+            return
+
+        # insertnig posts with their texts, images and videos
+        self.step('Posts', lambda: self.insert_posts(users, options['posts']))
+        posts = self.popularity(CoreModels.Posts.objects.order_by('id').values_list('id', flat=True))
+        if not posts[0]:
+            print(f"{Fore.RED}No posts.{Style.RESET_ALL}")
+            return
+
+        # inserting Albums and SavePosts
+        self.step('Albums', lambda: self.insert_albums(users))
+        self.step('SavePosts', lambda: insert_rows(
+            PostsModels.SavePosts, ('user_id', 'post_id', 'album_id'),
+            ((user, post, self.albums[user]) for user, post in self.interactions(users, posts, options['saves'])),
+            self.batch_size, ignore_conflicts=True
+        ))
+
+        for name, model, total in (
+            ('LikedPosts', PostsModels.LikePost, options['likes']),
+            ('ViewPosts', PostsModels.ViewPost, options['views']),
+        ):
+            self.step(name, lambda: insert_rows(
+                model, ('user_id', 'post_id'), self.interactions(users, posts, total),
+                self.batch_size, ignore_conflicts=True
+            ))
+
+        # isnerting comments, a user can comment a post many times
+        self.step('Comments', lambda: insert_rows(
+            PostsModels.Comments, ('user_id', 'post_id', 'comment'), (
+                (user, post, self.random.choice(self.texts))
+                for user, count in self.activity(users, options['comments'], options['comments'])
+                for post in self.random.choices(posts[0], cum_weights=posts[1], k=count)
+            ), self.batch_size
         ))
-        users_count = CoreModels.Users.objects.count()
-        Green_OK()
-
-        # inserting texts
-        print("Inserting Texts ... ", end='')
-        # # Will fill in inserting posts
-        Green_OK()
-
-        # inserting videos
-        print("Inserting Videos ... ", end='')
-        # # Will fill in inserting posts
-        Green_OK()
-
-        # inserting Images
-        print('Inserting Images ... ', end='')
-        # # Will fill in inserting posts
-        Green_OK()
-
-        # insertnig posts
-        print('Inserting Posts ... ', end='')
-        for _ in range(users_count * randint(1, 5)):
-            # # inserting image, video and text content and use the in post at the same time
-            text = CoreModels.Texts.objects.create(
-                text=faker_fa.text(300),
-                user=choice(user_users_list),
-                status=CoreModels.Texts.Status.IS_USED
-            )
-            video = CoreModels.Videos.objects.create(
-                video=faker_fa.file_path(extension='mp4'),
-                user=choice(list(
-                    CoreModels.Users.objects.filter(
-                        Q(role=CoreModels.Users.Roles.USER)
-                    ))),
-                caption=faker_fa.text(300) or "",
-                status=CoreModels.Texts.Status.IS_USED
-            )
-            image = CoreModels.Images.objects.create(
-                image=faker_fa.image_url(width=1366, height=768),
-                user=choice(user_users_list),
-                caption=faker_fa.text(300) or "",
-                status=CoreModels.Texts.Status.IS_USED
-            )
-            CoreModels.Posts.objects.create(
-                user=choice(user_users_list),
-                title=faker_fa.text(20),
-                text=text or None,
-                video=video or None,
-                image=image or None,
-            )
-        posts_list = list(CoreModels.Posts.objects.all())
-        Green_OK()
-
-        # inserting Albums
-        print('Inserting Albums ... ', end='')
-        for user in user_users_list:
-            PostsModels.Albums.objects.create(
-                user=user,
-                title='Saved Posts',
-            )
-        Green_OK()
-
-        # inserting SavePosts
-        print('Inserting SavePosts ... ', end='')
-        for user in user_users_list:
-            album = choice(PostsModels.Albums.objects.filter(Q(user=user.pk)))
-            PostsModels.SavePosts.objects.create(
-                user=user,
-                post=choice(posts_list),
-                album=album,
-            )
-        Green_OK()
-
-        # inserting like posts
-        print('Inserting LikedPosts ... ', end='')
-        for _ in range(users_count):
-            PostsModels.LikePost.objects.create(
-                user=choice(user_users_list),
-                post=choice(posts_list),
-            )
-        Green_OK()
-
-        # isnerting comments
-        print('Inserting Comments ... ', end='')
-        for _ in range(users_count):
-            PostsModels.Comments.objects.create(
-                user=choice(user_users_list),
-                post=choice(posts_list),
-                comment=faker_fa.text(randint(50, 300)),
-            )
-        Green_OK()
-
-        # inserting View Posts
-        print('Inserting ViewPosts ... ', end='')
-        for _ in range(users_count):
-            PostsModels.ViewPost.objects.create(
-                user=choice(user_users_list),
-                post=choice(posts_list),
-            )
-        Green_OK()
 
         # inserting Followusers
-        print('Inserting Follow ... ', end='')
-        for _ in range(users_count * 2):
-            flr_user = choice(user_users_list)
-            fld_user = choice(
-                list(CoreModels.Users.objects.filter(~Q(pk=flr_user.pk)))
-            )
-            UsersModels.Follow.objects.create(
-                follower_user=flr_user,
-                followed_user=fld_user,
-                status=UsersModels.Follow.Status.FOLLOEWED
-            )
-        Green_OK()
+        self.step('Follow', lambda: self.insert_follows(users, options['follows']))
+
+        # rows are inserted without signals, the derived data is built once for all of them
+        if not options['skip_derived']:
+            call_command('reconcile-counters')
+            call_command('reindex-search')
+            call_command('rebuild-timelines')
 
-        print(f'{Fore.CYAN}Completed...! {Style.RESET_ALL}')
+        print(f'{Fore.CYAN}Completed in {perf_counter() - started:.1f} s...! {Style.RESET_ALL}')
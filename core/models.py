@@ -1,5 +1,10 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import (
+    OpClass, GinIndex
+)
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models.functions import Upper
 from rest_framework.exceptions import (
     ValidationError
 )
@@ -50,8 +55,25 @@ class Users(AbstractUser):
     last_login = None
     groups = None
 
+    # query params of dynamic_search, every field is backed by an index
+    search_fields = ('id', 'username', 'first_name', 'last_name', 'email')
+
     class Meta:
         db_table = 'users'
+        indexes = [
+            models.Index(
+                OpClass(Upper('username'), name='text_pattern_ops'), name='users_username_upper_idx'
+            ),
+            models.Index(
+                OpClass(Upper('first_name'), name='text_pattern_ops'), name='users_first_name_upper_idx'
+            ),
+            models.Index(
+                OpClass(Upper('last_name'), name='text_pattern_ops'), name='users_last_name_upper_idx'
+            ),
+            models.Index(
+                OpClass(Upper('email'), name='text_pattern_ops'), name='users_email_upper_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.username
@@ -81,6 +103,9 @@ class Texts(models.Model):
         verbose_name='created_at', auto_now_add=True
     )
 
+    # query params of dynamic_search, every field is backed by an index
+    search_fields = ('id', 'user-id')
+
     class Meta:
         db_table = 'Texts'
 
@@ -115,6 +140,9 @@ class Videos(models.Model):
         verbose_name='created_at', auto_now_add=True
     )
 
+    # query params of dynamic_search, every field is backed by an index
+    search_fields = ('id', 'user-id')
+
     class Meta:
         db_table = 'Videos'
 
@@ -149,6 +177,9 @@ class Images(models.Model):
         verbose_name='created_at', auto_now_add=True
     )
 
+    # query params of dynamic_search, every field is backed by an index
+    search_fields = ('id', 'user-id')
+
     class Meta:
         db_table = 'Images'
 
@@ -182,9 +213,39 @@ class Posts(models.Model):
     created_at = models.DateField(
         verbose_name='created_at', auto_now_add=True
     )
+    # denormalized engagement counters, kept by posts.counters
+    likes_count = models.PositiveIntegerField(
+        verbose_name='likes_count', default=0, editable=False
+    )
+    comments_count = models.PositiveIntegerField(
+        verbose_name='comments_count', default=0, editable=False
+    )
+    views_count = models.PositiveIntegerField(
+        verbose_name='views_count', default=0, editable=False
+    )
+    saves_count = models.PositiveIntegerField(
+        verbose_name='saves_count', default=0, editable=False
+    )
+    # full-text search document of title, text and captions, kept by posts.search
+    search_vector = SearchVectorField(
+        verbose_name='search_vector', null=True, editable=False
+    )
+
+    # query params of dynamic_search, every field is backed by an index
+    search_fields = ('id', 'title', 'user-id')
+    # fields that change without post_save, they are read fresh on cached responses
+    counter_fields = ('likes_count', 'comments_count', 'views_count', 'saves_count')
 
     class Meta:
         db_table = 'Posts'
+        indexes = [
+            models.Index(
+                OpClass(Upper('title'), name='text_pattern_ops'), name='posts_title_upper_idx'
+            ),
+            GinIndex(
+                fields=['search_vector'], name='posts_search_vector_idx'
+            ),
+        ]
 
     def __str__(self):
         return "%s -> %s" % (self.user.username, self.title[:30] or "No Title")
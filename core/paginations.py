@@ -1,5 +1,14 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import (
+    PageNumberPagination, BasePagination
+)
 from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import replace_query_param
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+import json
 
 
 class DynamicPagination(PageNumberPagination):
@@ -15,3 +24,130 @@ class DynamicPagination(PageNumberPagination):
                 return False
             return limit
         return super().get_page_size(request)
+
+    def _keep_seed(self, url):
+        # keep the seed of random sampling in links so next pages follow the same order
+        seed = getattr(self.request, '_sample_seed', None)
+        if url is None or seed is None:
+            return url
+        return replace_query_param(url, 'seed', seed)
+
+    def get_next_link(self):
+        return self._keep_seed(super().get_next_link())
+
+    def get_previous_link(self):
+        return self._keep_seed(super().get_previous_link())
+
+
+class KeysetPagination(BasePagination):
+    """
+    a cursor pagination that is keyed on (created_at, id) and pages in constant time
+    without COUNT(*) and OFFSET. views opt into it by `pagination_class = KeysetPagination`.
+    """
+    page_size = 10
+    max_page_size = 100
+    ordering = ('created_at', 'id')
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request: Request):
+        limit = request.query_params.get(self.limit_query_param)
+        if not limit:
+            return self.page_size
+        if limit.lower() == 'none':
+            return self.max_page_size
+        try:
+            return min(max(int(limit), 1), self.max_page_size)
+        except ValueError:
+            return self.page_size
+
+    def encode_cursor(self, instance, reverse):
+        position = [str(getattr(instance, field)) for field in self.ordering]
+        data = json.dumps({'p': position, 'r': reverse}, separators=(',', ':'))
+        cursor = urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request: Request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            data = json.loads(urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            position = [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.ordering, data['p'], strict=True)
+            ]
+            return position, bool(data['r'])
+        except (TypeError, ValueError, KeyError, DjangoValidationError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request: Request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request, queryset.model)
+
+        # newest first, walk backward from the cursor or forward when it is a previous cursor
+        lookup, ordering = ('gt', self.ordering) if reverse else (
+            'lt', tuple('-' + field for field in self.ordering)
+        )
+        if position is not None:
+            first, second = self.ordering
+            queryset = queryset.filter(
+                Q(**{f"{first}__{lookup}": position[0]}) |
+                Q(**{first: position[0], f"{second}__{lookup}": position[1]})
+            )
+
+        results = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.next_url = self.previous_url = None
+        if results:
+            if has_more or reverse:
+                self.next_url = self.encode_cursor(results[-1], reverse=False)
+            if position is not None and (has_more or not reverse):
+                self.previous_url = self.encode_cursor(results[0], reverse=True)
+
+        return results
+
+    def get_next_link(self):
+        return self.next_url
+
+    def get_previous_link(self):
+        return self.previous_url
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.next_url,
+            'previous': self.previous_url,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param, 'required': False, 'in': 'query',
+                'description': 'The pagination cursor value.', 'schema': {'type': 'string'},
+            },
+            {
+                'name': self.limit_query_param, 'required': False, 'in': 'query',
+                'description': f'Number of items per page (maximum {self.max_page_size}).',
+                'schema': {'type': 'integer'},
+            },
+        ]
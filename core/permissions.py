@@ -1,27 +1,38 @@
 from rest_framework.permissions import (
-    BasePermission, IsAuthenticated, SAFE_METHODS
+    BasePermission, SAFE_METHODS
 )
 from core.models import Users
 from rest_framework.request import Request
 from rest_framework.exceptions import PermissionDenied
 
 
+def is_authenticated(request: Request):
+    return bool(request.user and request.user.is_authenticated)
+
+
+def is_active(request: Request):
+    """
+    the status of the user is read from request.user, raise when it is not active.
+    """
+    if request.user.status == Users.Status.ACTIVE:
+        return True
+    raise PermissionDenied(
+        detail=f"Your account is {request.user.status}", code=403
+    )
+
+
 # is active user
 class IsActive(BasePermission):
     def has_permission(self, request: Request, view):
-        if request.user.status == Users.Status.ACTIVE:
-            return True
-        else:
-            raise PermissionDenied(
-                detail=f"Your account is {request.user.status}", code=403
-            )
+        return is_active(request)
 
 
 # Is amdin
 class IsAdmin(BasePermission):
     def has_permission(self, request: Request, view):
         return bool(
-            IsActive().has_permission(request, view) and
+            is_authenticated(request) and
+            is_active(request) and
             request.user.role == Users.Roles.ADMIN
         )
 
@@ -30,8 +41,8 @@ class IsAdmin(BasePermission):
 class IsUser(BasePermission):
     def has_permission(self, request: Request, view):
         return bool(
-            IsAuthenticated().has_permission(request, view) and
-            IsActive().has_permission(request, view) and
+            is_authenticated(request) and
+            is_active(request) and
             request.user.role == Users.Roles.USER
         )
 
@@ -39,17 +50,15 @@ class IsUser(BasePermission):
 # is not authenticated
 class IsAnonymous(BasePermission):
     def has_permission(self, request: Request, view):
-        return not bool(
-            IsAuthenticated().has_permission(request, view)
-        )
+        return not is_authenticated(request)
 
 
 # just allow PUT, DELETE, PATCH methods for owen user
 class IsSelfOrReadOnly(BasePermission):
     def has_permission(self, request, view):
         return (
-            IsAuthenticated().has_permission(request, view) and
-            IsActive().has_permission(request, view)
+            is_authenticated(request) and
+            is_active(request)
         )
 
     def has_object_permission(self, request, view, obj):
@@ -0,0 +1,47 @@
+from itertools import islice
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# same output as JSONRenderer of DRF: compact and unicode
+_encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def dumps(data):
+    """
+    encode data to JSON bytes by orjson when it is installed, otherwise by the encoder of DRF.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, default=_encoder.default)
+    return _encoder.encode(data).encode('utf-8')
+
+
+def _chunks(rows, chunk_size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def stream_json(rows, render, chunk_size):
+    """
+    yield a JSON array of rows chunk by chunk, render converts a list of rows to a list of items.
+    only one chunk of rows and its items are in memory at a time.
+    """
+    yield b'['
+    first = True
+    for chunk in _chunks(rows, chunk_size):
+        items = dumps(render(chunk))[1:-1]
+        if not items:
+            continue
+        if not first:
+            yield b','
+        first = False
+        yield items
+    yield b']'
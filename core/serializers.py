@@ -1,10 +1,330 @@
 from rest_framework.serializers import (
-    ModelSerializer, CharField
+    ModelSerializer, CharField, BaseSerializer, PrimaryKeyRelatedField, ListSerializer,
+    RelatedField, FileField, IntegerField, EmailField, BooleanField, ChoiceField, ReadOnlyField
 )
+from rest_framework.fields import empty
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.request import Request
+from django.core.exceptions import FieldDoesNotExist
 from core import models as CoreModels
+from core.caches import get_user_cards
 
 
-class UsersSerializer(ModelSerializer):
+# fields that return the value of the database as it is
+PLAIN_FIELDS = (IntegerField, CharField, EmailField, BooleanField, ChoiceField, ReadOnlyField)
+
+
+def requested_paths(request: Request, param):
+    """
+    returns the comma separated paths of a queryparam as a set.
+    """
+    value = request.query_params.get(param)
+    if not value:
+        return set()
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+def expanded_paths(request: Request):
+    """
+    returns the nested serializers that are expanded by ?expand=, with their parents.
+    """
+    expand = set()
+    for path in requested_paths(request, 'expand'):
+        names = path.split('.')
+        expand.update('.'.join(names[:index]) for index in range(1, len(names) + 1))
+    return expand
+
+
+class DynamicFieldsMixin:
+    """
+    A mixin for serializers of API responses.
+    nested serializers are returned only when they are in ?expand= (like expand=user_detail,post_details.user_details)
+    otherwise only the id of the relation is returned, and ?fields= (like fields=id,title,post_details.title)
+    selects the fields of every level.
+    """
+
+    def field_path(self):
+        names = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                names.append(node.field_name)
+            node = node.parent
+        return '.'.join(reversed(names))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None:
+            return fields
+
+        path = self.field_path()
+        prefix = f"{path}." if path else ''
+
+        # ids-only nesting, unless the nested serializer is expanded
+        expand = expanded_paths(request)
+        for name, field in list(fields.items()):
+            if isinstance(field, BaseSerializer) and f"{prefix}{name}" not in expand:
+                fields.pop(name)
+
+        # sparse fields of this level, only for reading
+        selected = {
+            item[len(prefix):].split('.')[0]
+            for item in requested_paths(request, 'fields') if item.startswith(prefix)
+        }
+        if selected and request.method in SAFE_METHODS:
+            fields = {name: field for name, field in fields.items() if name in selected}
+
+        return fields
+
+
+class NotCompilable(Exception):
+    pass
+
+
+class ValuesPlan:
+    """
+    the compiled form of a serializer: lookups of values_list(), entries that build a dict from a row
+    and the (index, values serializer) of nested serializers that are read from cached cards.
+    """
+
+    def __init__(self, lookups, entries, cards):
+        self.lookups = lookups
+        self.entries = entries
+        self.cards = cards
+
+
+class CardEntry:
+    """
+    a nested serializer that is filled from the cards of its values serializer, names are
+    the selected fields of the card or None for all of them.
+    """
+
+    def __init__(self, values, names):
+        self.values = values
+        self.names = names
+
+
+class ValuesSerializer:
+    """
+    A read-only serializer of list responses that is declared once per model from its ModelSerializer.
+    the fields of the serializer (after ?fields= and ?expand=) are compiled to the lookups of one
+    values_list() query and a plan that builds plain dicts from its rows, with the same output as
+    the ModelSerializer and without model instances or DRF fields on every row.
+    when `cards` (a function that returns the card cache or None) is given, the serializer is
+    not joined where it is nested and its output is read from the card cache by id.
+    """
+    registry = {}
+    max_plans = 256
+
+    def __init__(self, serializer_class, cards=None):
+        self.serializer_class = serializer_class
+        self.get_cards = cards
+        self.plans = {}
+        self.full_plan = None
+        ValuesSerializer.registry[serializer_class] = self
+
+    @classmethod
+    def of(cls, serializer_class):
+        """
+        returns the values serializer that is declared for the serializer class or None.
+        """
+        return cls.registry.get(serializer_class)
+
+    def plan(self, request: Request, annotations=()):
+        """
+        returns the plan of the request or None when a field can not be compiled.
+        annotations are the names that are annotated on the queryset of the rows.
+        """
+        key = (
+            request.query_params.get('expand'), request.query_params.get('fields'),
+            request.method in SAFE_METHODS, frozenset(annotations)
+        )
+        if key not in self.plans:
+            if len(self.plans) >= self.max_plans:
+                self.plans.clear()
+            try:
+                self.plans[key] = self.compile(request, key[-1])
+            except NotCompilable:
+                self.plans[key] = None
+        return self.plans[key]
+
+    def compile(self, request: Request = None, annotations=frozenset()):
+        """
+        compile the fields of the serializer for the request, without request all fields are compiled.
+        """
+        lookups, indexes, cards = [], {}, []
+
+        def index_of(lookup):
+            if lookup not in indexes:
+                indexes[lookup] = len(lookups)
+                lookups.append(lookup)
+            return indexes[lookup]
+
+        def walk(serializer: BaseSerializer, model, prefix):
+            # an entry is (name, index of the value in the row, converter, entries of a nested serializer)
+            entries = []
+            for name, field in serializer.fields.items():
+                if field.write_only:
+                    continue
+                if field.source == '*' or '.' in field.source:
+                    raise NotCompilable(name)
+                try:
+                    model_field = model._meta.get_field(field.source)
+                except FieldDoesNotExist:
+                    if not prefix and field.source in annotations:
+                        entries.append((name, index_of(field.source), self.converter(field, None), None))
+                        continue
+                    if field.read_only and field.default is empty and not field.allow_null \
+                            and not hasattr(model, field.source):
+                        # DRF skips a read-only field that its object does not have
+                        continue
+                    raise NotCompilable(name)
+                if not model_field.concrete or model_field.many_to_many:
+                    raise NotCompilable(name)
+
+                lookup = f"{prefix}{field.source}"
+                if isinstance(field, BaseSerializer):
+                    if isinstance(field, ListSerializer) or not model_field.is_relation:
+                        raise NotCompilable(name)
+
+                    values = ValuesSerializer.of(type(field))
+                    if values is not None and values.cards() is not None:
+                        # read from the cards by id instead of joining the table
+                        names = tuple(name for name, nested in field.fields.items() if not nested.write_only)
+                        index = index_of(lookup)
+                        cards.append((index, values))
+                        entries.append((
+                            name, index, None,
+                            CardEntry(values, None if names == values.card_names() else names)
+                        ))
+                        continue
+
+                    entries.append((
+                        name, index_of(lookup), None, walk(field, model_field.related_model, f"{lookup}__")
+                    ))
+                else:
+                    entries.append((name, index_of(lookup), self.converter(field, model_field), None))
+            return entries
+
+        serializer = self.serializer_class(context={'request': request} if request is not None else {})
+        entries = walk(serializer, serializer.Meta.model, '')
+        return ValuesPlan(tuple(lookups), entries, cards)
+
+    @staticmethod
+    def converter(field, model_field):
+        """
+        returns None for the fields that need no conversion, otherwise a function of (value, request).
+        """
+        if model_field is None:
+            # an annotation of the queryset
+            if isinstance(field, (FileField, RelatedField)):
+                raise NotCompilable(field.field_name)
+            if type(field) in PLAIN_FIELDS:
+                return None
+            to_representation = field.to_representation
+            return lambda value, request: to_representation(value)
+
+        if isinstance(field, FileField):
+            storage = model_field.storage
+            if not getattr(field, 'use_url', True):
+                return lambda value, request: value
+
+            def file_url(value, request):
+                if not value:
+                    return None
+                url = storage.url(value)
+                return request.build_absolute_uri(url) if request is not None else url
+            return file_url
+
+        if isinstance(field, RelatedField):
+            if isinstance(field, PrimaryKeyRelatedField) and field.pk_field is None:
+                return None
+            raise NotCompilable(field.field_name)
+
+        if model_field.is_relation:
+            raise NotCompilable(field.field_name)
+        if type(field) in PLAIN_FIELDS:
+            return None
+
+        to_representation = field.to_representation
+        return lambda value, request: to_representation(value)
+
+    # cards
+    def cards(self):
+        return self.get_cards() if self.get_cards is not None else None
+
+    def card_names(self):
+        if self.full_plan is None:
+            self.full_plan = self.compile()
+        return tuple(name for name, *_ in self.full_plan.entries)
+
+    def build_cards(self, ids, request: Request):
+        """
+        returns {id: card} of the objects by the full plan (every readable field).
+        """
+        if self.full_plan is None:
+            self.full_plan = self.compile()
+        plan = self.full_plan
+        queryset = self.serializer_class.Meta.model.objects.filter(pk__in=ids)
+        return {
+            row[0]: self.build(plan.entries, row[1:], request, {})
+            for row in queryset.values_list('pk', *plan.lookups)
+        }
+
+    def load_cards(self, rows, request: Request, plan: ValuesPlan):
+        """
+        returns the cards that the rows need and their versions, {values serializer: {id: card}}.
+        """
+        # the ids of every nested serializer of the same values serializer are loaded together
+        wanted = {}
+        for index, values in plan.cards:
+            wanted.setdefault(values, set()).update(row[index] for row in rows if row[index] is not None)
+
+        cards, versions = {}, []
+        for values, ids in wanted.items():
+            if not ids:
+                continue
+            found, found_versions = values.cards().get_many(
+                sorted(ids), request.get_host(), lambda missing: values.build_cards(missing, request)
+            )
+            cards.setdefault(values, {}).update(found)
+            versions.extend(sorted(found_versions.items()))
+        return cards, tuple(versions)
+
+    @classmethod
+    def build(cls, entries, row, request, cards):
+        data = {}
+        for name, index, convert, nested in entries:
+            value = row[index]
+            if value is None:
+                data[name] = None
+            elif nested is not None:
+                if type(nested) is CardEntry:
+                    card = cards[nested.values].get(value)
+                    if card is not None and nested.names is not None:
+                        card = {key: card[key] for key in nested.names}
+                    data[name] = card
+                else:
+                    data[name] = cls.build(nested, row, request, cards)
+            elif convert is None:
+                data[name] = value
+            else:
+                data[name] = convert(value, request)
+        return data
+
+    def render(self, rows, request: Request, plan: ValuesPlan = None, cards=None):
+        """
+        build the response of rows of values_list(*plan.lookups).
+        """
+        plan = plan or self.plan(request)
+        if plan.cards and cards is None:
+            rows = list(rows)
+            cards, _ = self.load_cards(rows, request, plan)
+        return [self.build(plan.entries, row, request, cards) for row in rows]
+
+
+class UsersSerializer(DynamicFieldsMixin, ModelSerializer):
     password = CharField(write_only=True)
 
     def create(self, validated_data):
@@ -30,36 +350,52 @@ class UsersSerializer(ModelSerializer):
         fields = '__all__'
 
 
-class TextsSerializer(ModelSerializer):
+class TextsSerializer(DynamicFieldsMixin, ModelSerializer):
+    user = PrimaryKeyRelatedField(read_only=True)
     user_detail = UsersSerializer(read_only=True, source='user')
 
     class Meta:
         model = CoreModels.Texts
-        exclude = ['user']
+        fields = '__all__'
 
 
-class VideosSerializer(ModelSerializer):
+class VideosSerializer(DynamicFieldsMixin, ModelSerializer):
+    user = PrimaryKeyRelatedField(read_only=True)
     user_detail = UsersSerializer(read_only=True, source='user')
 
     class Meta:
         model = CoreModels.Videos
-        exclude = ['user']
+        fields = '__all__'
 
 
-class ImagesSerializer(ModelSerializer):
+class ImagesSerializer(DynamicFieldsMixin, ModelSerializer):
+    user = PrimaryKeyRelatedField(read_only=True)
     user_detail = UsersSerializer(read_only=True, source='user')
 
     class Meta:
         model = CoreModels.Images
-        exclude = ['user']
+        fields = '__all__'
 
 
-class PostsSerializer(ModelSerializer):
+class PostsSerializer(DynamicFieldsMixin, ModelSerializer):
+    user = PrimaryKeyRelatedField(read_only=True)
     user_detail = UsersSerializer(read_only=True, source='user')
     text_detail = TextsSerializer(read_only=True, source='text')
     video_detail = VideosSerializer(read_only=True, source='video')
     image_detail = ImagesSerializer(read_only=True, source='image')
+    # interactions of the viewer, only on the posts that are annotated by posts.interactions
+    liked = BooleanField(read_only=True)
+    saved = BooleanField(read_only=True)
+    viewed = BooleanField(read_only=True)
 
     class Meta:
         model = CoreModels.Posts
-        exclude = ['user']
+        exclude = ['search_vector']
+
+
+# read-only fast serializers of list responses
+UsersValues = ValuesSerializer(UsersSerializer, cards=get_user_cards)
+TextsValues = ValuesSerializer(TextsSerializer)
+VideosValues = ValuesSerializer(VideosSerializer)
+ImagesValues = ValuesSerializer(ImagesSerializer)
+PostsValues = ValuesSerializer(PostsSerializer)
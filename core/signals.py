@@ -0,0 +1,58 @@
+from django.db import transaction
+from django.db.models.signals import (
+    post_save, post_delete
+)
+from django.dispatch import receiver
+from django.db.models import Q
+from core.models import (
+    Users, Posts, Texts, Images, Videos
+)
+from core.caches import bump_version
+from core.authentication import user_statuses
+
+
+@receiver(post_save, sender=Posts)
+@receiver(post_delete, sender=Posts)
+def invalidate_post(sender, instance: Posts, **kwargs):
+    """
+    invalidate the cached details of the post after the transaction is committed.
+    """
+    pk = instance.pk
+    transaction.on_commit(lambda: bump_version('posts', pk))
+
+
+@receiver(post_save, sender=Texts)
+@receiver(post_save, sender=Images)
+@receiver(post_save, sender=Videos)
+def invalidate_post_content(sender, instance, created, **kwargs):
+    """
+    invalidate the cached details of the post that uses the saved text, image or video.
+    deleting a content deletes its post (cascade) and that is handled by invalidate_post.
+    """
+    if created:
+        # no post uses a new content yet
+        return
+
+    field = {Texts: 'text', Images: 'image', Videos: 'video'}[sender]
+    pk = instance.pk
+
+    def invalidate():
+        for post in Posts.objects.filter(Q(**{field: pk})).values_list('id', flat=True):
+            bump_version('posts', post)
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=Users)
+@receiver(post_delete, sender=Users)
+def invalidate_user(sender, instance: Users, **kwargs):
+    """
+    invalidate the cached details of the posts of the user, they have the user nested,
+    and the statuses of users of stateless authentication.
+    """
+    pk = instance.pk
+
+    def invalidate():
+        bump_version('users', pk)
+        # role and status of the user are read again by the next request of this process
+        user_statuses().expire()
+    transaction.on_commit(invalidate)
@@ -1,3 +1,378 @@
+import json
+import threading
+from time import sleep
+from django.core.cache import cache
+from unittest import mock
 from django.test import TestCase
+from core import helper, authentication, caches
+from core.authentication import StatelessJWTAuthentication
+from core.serializers import ValuesSerializer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from core import models as CoreModels
+from posts import models as PostsModels
+from users import models as UsersModels
+from users.serializers import TokenSerializer
 
-# Create your tests here.
+
+class SocialData:
+    """
+    A mixin of test cases that creates users, posts of every kind and the interactions of them.
+    every list has more than one row, so a query per row changes the query counts of the tests.
+    """
+    rows = 4
+    # every nested serializer of a post
+    post_expand = 'user_detail,text_detail.user_detail,image_detail,video_detail'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # the timelines are filled by on_commit callbacks of the signals
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.users = [
+                CoreModels.Users.objects.create(
+                    username=f'user{index}', password='password', first_name='first', last_name='last',
+                    phone='0912', email=f'user{index}@example.com'
+                )
+                for index in range(cls.rows)
+            ]
+            cls.user = cls.users[0]
+            cls.admin = CoreModels.Users.objects.create(
+                username='admin', password='password', first_name='first', last_name='last',
+                phone='0912', email='admin@example.com', role=CoreModels.Users.Roles.ADMIN
+            )
+            cls.album = PostsModels.Albums.objects.create(user=cls.user, title='album')
+
+            for other in cls.users[1:]:
+                UsersModels.Follow.objects.create(follower_user=cls.user, followed_user=other)
+                UsersModels.Follow.objects.create(follower_user=other, followed_user=cls.user)
+                UsersModels.Logins.objects.create(
+                    user=other, username=other.username, status=UsersModels.Logins.Status.SUCCESS
+                )
+            # a failed login of an unknown username has no user
+            UsersModels.Logins.objects.create(username='unknown', status=UsersModels.Logins.Status.FAIL)
+
+            # posts of the user and of the others, some of them without image or text (null relations)
+            cls.posts = []
+            for index in range(cls.rows * 2):
+                owner = cls.users[index % 2]
+                text = CoreModels.Texts.objects.create(text=f'text {index}', user=owner) if index % 4 != 1 else None
+                image = CoreModels.Images.objects.create(
+                    image=f'posts/images/{index}.png', user=owner, caption='caption'
+                ) if index % 2 else None
+                video = CoreModels.Videos.objects.create(
+                    video=f'posts/videos/{index}.mp4', user=owner
+                ) if index % 4 == 0 else None
+                cls.posts.append(CoreModels.Posts.objects.create(
+                    user=owner, title=f'post {index}', text=text, image=image, video=video
+                ))
+
+            for post in cls.posts:
+                PostsModels.SavePosts.objects.create(user=cls.user, post=post, album=cls.album)
+                PostsModels.LikePost.objects.create(user=cls.user, post=post)
+                PostsModels.ViewPost.objects.create(user=cls.user, post=post)
+                PostsModels.Comments.objects.create(user=cls.user, post=post, comment='comment')
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def login(self, user):
+        self.client.force_authenticate(user)
+
+
+class QueryCounts(SocialData):
+    """
+    A mixin of test cases that assert the number of queries of endpoints, a list or a retrieve
+    runs a constant number of queries however many rows and nested serializers it returns.
+    """
+    def assertQueries(self, url, count):
+        # every request is counted with cold caches of post details, user cards and sample pools
+        cache.clear()
+        helper._sample_pools.clear()
+        with self.assertNumQueries(count):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return response
+
+    def first_id(self, model, **filters):
+        return model.objects.filter(**filters).order_by('id').values_list('id', flat=True).first()
+
+
+class ValuesParity(SocialData):
+    """
+    A mixin of test cases that compare the lists of ValuesListMixin with the lists of the ModelSerializers,
+    the ValuesSerializer of a view must return the same data as DRF for every ?fields= and ?expand=.
+    """
+
+    def get_json(self, url):
+        cache.clear()
+        helper._sample_pools.clear()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        if response.streaming:
+            return json.loads(b''.join(response.streaming_content))
+        return response.json()
+
+    def assertParity(self, url):
+        values = self.get_json(url)
+        # without a declared values serializer the views render the list by DRF
+        with mock.patch.object(ValuesSerializer, 'of', return_value=None):
+            model = self.get_json(url)
+        rows = values['results'] if isinstance(values, dict) else values
+        self.assertTrue(rows, url)
+        self.assertEqual(values, model, url)
+
+    def assertParities(self, url, *queries):
+        for query in ('',) + queries:
+            with self.subTest(query=query):
+                self.assertParity(f'{url}?{query}' if query else url)
+
+
+class ValuesParityTests(ValuesParity, TestCase):
+
+    def test_users(self):
+        self.assertParities('/core/users/', 'fields=id,username,email', 'username=user', 'limit=none')
+
+    def test_texts(self):
+        self.assertParities(
+            '/core/texts/', 'expand=user_detail', 'fields=id,text,user_detail.username&expand=user_detail',
+            'limit=none&expand=user_detail'
+        )
+
+    def test_images(self):
+        self.login(self.users[1])
+        self.assertParities('/core/images/', 'expand=user_detail', 'fields=id,image,caption')
+
+    def test_videos(self):
+        self.assertParities('/core/videos/', 'expand=user_detail', 'fields=id,video')
+
+    def test_posts(self):
+        self.assertParities(
+            '/core/posts/', f'expand={self.post_expand}', 'fields=id,title,liked,saved,viewed',
+            'fields=id,text_detail.text,text_detail.user_detail.username,image_detail&'
+            'expand=text_detail.user_detail,image_detail',
+            f'limit=none&expand={self.post_expand}'
+        )
+
+
+class QueryCountTests(QueryCounts, TestCase):
+
+    def test_users(self):
+        self.assertQueries('/core/users/', 2)
+        self.assertQueries(f'/core/users/{self.user.pk}/', 1)
+
+    def test_texts(self):
+        self.assertQueries('/core/texts/', 2)
+        self.assertQueries('/core/texts/?expand=user_detail', 3)
+        self.assertQueries(f'/core/texts/{self.first_id(CoreModels.Texts, user=self.user)}/?expand=user_detail', 1)
+
+    def test_images(self):
+        self.login(self.users[1])
+        self.assertQueries('/core/images/?expand=user_detail', 3)
+        self.assertQueries(f'/core/images/{self.first_id(CoreModels.Images, user=self.users[1])}/?expand=user_detail', 1)
+
+    def test_videos(self):
+        self.assertQueries('/core/videos/?expand=user_detail', 3)
+        self.assertQueries(f'/core/videos/{self.first_id(CoreModels.Videos, user=self.user)}/?expand=user_detail', 1)
+
+    def test_posts(self):
+        post = self.posts[0].pk
+        self.assertQueries('/core/posts/', 2)
+        self.assertQueries(f'/core/posts/?expand={self.post_expand}', 3)
+        self.assertQueries(f'/core/posts/{post}/', 2)
+        self.assertQueries(f'/core/posts/{post}/?expand={self.post_expand}', 2)
+
+
+class StatelessAuthenticationTests(TestCase):
+
+    def setUp(self):
+        authentication._statuses = None
+        self.user = self.create_user('user')
+
+    def create_user(self, username):
+        return CoreModels.Users.objects.create(
+            username=username, password='password', first_name='first', last_name='last', phone='0912'
+        )
+
+    def token(self, user):
+        return TokenSerializer.get_token(user).access_token
+
+    def get_user(self, user):
+        return StatelessJWTAuthentication().get_user(self.token(user))
+
+    def test_user_from_claims(self):
+        self.get_user(self.user)
+        # the statuses are loaded, the user and its username are read without database
+        with self.assertNumQueries(0):
+            user = self.get_user(self.user)
+            self.assertEqual((user.pk, user.username, user.role), (self.user.pk, 'user', CoreModels.Users.Roles.USER))
+
+    def test_unknown_ids(self):
+        self.get_user(self.user)
+        # a user that is created after the refresh is read from database
+        created = self.create_user('created')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_user(created).pk, created.pk)
+
+        # a deleted user is not authenticated by its token
+        token = self.token(created)
+        created.delete()
+        authentication.user_statuses().expire()
+        with self.assertRaises(AuthenticationFailed):
+            StatelessJWTAuthentication().get_user(token)
+
+    def test_request(self):
+        deleted = self.create_user('deleted')
+        token = self.token(deleted)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token(self.user)}')
+        self.assertEqual(client.get('/users/my-followings/').status_code, 200)
+
+        deleted.delete()
+        authentication.user_statuses().expire()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(client.get('/users/my-followings/').status_code, 401)
+
+
+class SeededSampleTests(SocialData, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        helper._sample_pools.clear()
+        self.addCleanup(helper._sample_pools.clear)
+
+    def ids(self, objects):
+        return [item.pk for item in objects]
+
+    def test_same_seed_same_order(self):
+        posts = CoreModels.Posts.objects.all()
+        first = helper.SeededSample(posts, 7)
+        self.assertEqual(self.ids(helper.SeededSample(posts, 7)[0:8]), self.ids(first[0:8]))
+        self.assertNotEqual(self.ids(helper.SeededSample(posts, 8)[0:8]), self.ids(first[0:8]))
+        # an index and a slice of the sample are the same objects
+        self.assertEqual([first[index].pk for index in range(len(first))], self.ids(first[0:8]))
+
+    def test_pages_do_not_overlap(self):
+        sample = helper.SeededSample(CoreModels.Posts.objects.all(), 7)
+        pages = [self.ids(sample[start:start + 3]) for start in range(0, len(sample), 3)]
+        ids = [pk for page in pages for pk in page]
+        self.assertEqual(sorted(ids), sorted(post.pk for post in self.posts))
+        self.assertEqual(self.ids(sample), ids)
+
+    def test_pages_of_requests(self):
+        url = '/posts/random-posts/?day=30&limit=3&seed=7'
+        first = self.client.get(url).json()
+        self.assertEqual(self.client.get(url).json(), first)
+
+        # the next links keep the seed, so the pages cover every post once
+        ids, page = [], first
+        while True:
+            ids.extend(row['id'] for row in page['results'])
+            if not page['next']:
+                break
+            self.assertIn('seed=7', page['next'])
+            page = self.client.get(page['next']).json()
+        self.assertEqual(sorted(ids), sorted(post.pk for post in self.posts))
+
+    def test_pool_eviction(self):
+        querysets = [CoreModels.Posts.objects.filter(user=user) for user in self.users[:3]]
+        with mock.patch.object(helper, 'SAMPLE_POOL_MAX', 2):
+            helper.sample_pool(querysets[0])
+            helper.sample_pool(querysets[1])
+            # the least recently used pool is evicted
+            helper.sample_pool(querysets[0])
+            helper.sample_pool(querysets[2])
+            with self.assertNumQueries(0):
+                helper.sample_pool(querysets[0])
+            with self.assertNumQueries(1):
+                helper.sample_pool(querysets[1])
+        self.assertEqual(len(helper._sample_pools), 2)
+
+        # a pool of a per-user queryset is not kept
+        with self.assertNumQueries(2):
+            helper.sample_pool(querysets[2], shared=False)
+            helper.sample_pool(querysets[2], shared=False)
+
+    def test_pool_ttl(self):
+        posts = CoreModels.Posts.objects.all()
+        now = helper.monotonic()
+        pool = helper.sample_pool(posts)
+        CoreModels.Posts.objects.filter(pk=self.posts[0].pk).delete()
+
+        with mock.patch.object(helper, 'monotonic', return_value=now + helper.SAMPLE_POOL_TTL - 1):
+            self.assertIs(helper.sample_pool(posts), pool)
+        with mock.patch.object(helper, 'monotonic', return_value=now + helper.SAMPLE_POOL_TTL + 1):
+            self.assertNotIn(self.posts[0].pk, helper.sample_pool(posts))
+
+
+class PostCacheTests(SocialData, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.post = self.posts[0]
+        self.url = f'/core/posts/{self.post.pk}/?expand=user_detail,text_detail'
+
+    def get(self, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_hit(self):
+        data = self.get(2)
+        # the detail is read from the cache, only the row of the post is queried
+        self.assertEqual(self.get(1), data)
+
+    def test_invalidation(self):
+        self.get(2)
+        with self.captureOnCommitCallbacks(execute=True):
+            CoreModels.Posts.objects.get(pk=self.post.pk).save(update_fields=['title'])
+        self.get(2)
+
+        changes = [
+            (CoreModels.Posts.objects.filter(pk=self.post.pk), 'title', 'new title', lambda data: data['title']),
+            (CoreModels.Texts.objects.filter(pk=self.post.text_id), 'text', 'new text',
+             lambda data: data['text_detail']['text']),
+            (CoreModels.Users.objects.filter(pk=self.post.user_id), 'first_name', 'new name',
+             lambda data: data['user_detail']['first_name']),
+        ]
+        for queryset, field, value, read in changes:
+            with self.subTest(field=field):
+                # a model save bumps the version of the post or its user, the old entry is not read again
+                instance = queryset.get()
+                setattr(instance, field, value)
+                with self.captureOnCommitCallbacks(execute=True):
+                    instance.save()
+                self.assertEqual(read(self.get(2)), value)
+                self.assertEqual(read(self.get(1)), value)
+
+    def test_single_flight(self):
+        builds, results = [], []
+
+        def build():
+            builds.append(1)
+            sleep(0.2)
+            return {'id': 1}
+
+        def read():
+            results.append(caches.get_or_build('key', build, timeout=60, lock_timeout=10, wait=5))
+
+        threads = [threading.Thread(target=read) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # one request builds the entry and the others wait for it
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(results, [{'id': 1}] * 5)
+        self.assertIsNone(cache.get('key:lock'))
+
+    def test_slow_builder(self):
+        # a request does not wait past `wait` for a lock that is not released and builds itself
+        cache.add('key:lock', 1)
+        with mock.patch.object(caches, 'POLL_INTERVAL', 0):
+            self.assertEqual(caches.get_or_build('key', lambda: 'built', 60, 10, wait=0.05), 'built')
+        self.assertIsNone(cache.get('key'))
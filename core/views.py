@@ -11,7 +11,15 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.request import Request
 from core.helper import (
-    dynamic_search, set_queryset
+    dynamic_search, search_keys, set_queryset, PrefetchMixin, StreamingListMixin, ValuesListMixin, ConditionalRetrieveMixin,
+    make_etag, not_modified
+)
+from core.caches import (
+    cache_settings, get_or_build, post_versions, post_detail_key, request_variant
+)
+from rest_framework.generics import get_object_or_404
+from posts.interactions import (
+    VIEWER_INTERACTIONS, annotate_viewer
 )
 from drf_spectacular.utils import (
     extend_schema, OpenApiParameter
@@ -22,7 +30,7 @@ from core.permissions import (
 
 
 # Users APIs
-class UserView(ModelViewSet):
+class UserView(PrefetchMixin, StreamingListMixin, ValuesListMixin, ConditionalRetrieveMixin, ModelViewSet):
     serializer_class = CoreSerializers.UsersSerializer
     queryset = CoreModels.Users.objects.all()
     permission_classes = [IsSelfOrReadOnly]
@@ -30,7 +38,7 @@ class UserView(ModelViewSet):
     @extend_schema(
         description="""
         Get request of users returns all of the uesrs.
-        for search in them and all of fields (foreign, normal) can use queryparmas.
+        for search in them the searchable fields (foreign, normal) of the model can use queryparmas.
         """,
         parameters=[
             OpenApiParameter(
@@ -64,32 +72,29 @@ class UserView(ModelViewSet):
 
     def get_queryset(self):
         request = self.request
-        if request.query_params:
+        if search_keys(request):
             return dynamic_search(request, CoreModels.Users)
         return super().get_queryset()
 
 
 # Texts APIs
-class TextsView(GenericViewSet, RetrieveModelMixin, ListModelMixin, CreateModelMixin):
+class TextsView(PrefetchMixin, StreamingListMixin, ValuesListMixin, ConditionalRetrieveMixin, GenericViewSet, RetrieveModelMixin, ListModelMixin, CreateModelMixin):
     serializer_class = CoreSerializers.TextsSerializer
     queryset = CoreModels.Texts.objects.all()
     permission_classes = [IsSelfOrReadOnly]
 
     def get_queryset(self):
         request = self.request
-        if request.query_params:
+        if search_keys(request):
             return dynamic_search(request, CoreModels.Texts)
         return set_queryset(self, CoreModels.Users.Roles.USER, 'user', self.request.user.pk, CoreModels.Texts)
 
     @extend_schema(
         description="""
         Get request of texts returns all of the texts.
-        for search in them and all of fields can use queryparmas.
+        for search in them the searchable fields of the model can use queryparmas.
         """,
         parameters=[
-            OpenApiParameter(
-                name='text', description="An example as normal field in search (?text=abc)", required=False,
-            ),
             OpenApiParameter(
                 name='user-id', description="An example as foreign field in search (?user-id=1)", required=False,
             ),
@@ -110,7 +115,7 @@ class TextsView(GenericViewSet, RetrieveModelMixin, ListModelMixin, CreateModelM
 
 
 # Videos APIs
-class VideosView(GenericViewSet, RetrieveModelMixin, ListModelMixin, CreateModelMixin):
+class VideosView(PrefetchMixin, StreamingListMixin, ValuesListMixin, ConditionalRetrieveMixin, GenericViewSet, RetrieveModelMixin, ListModelMixin, CreateModelMixin):
     serializer_class = CoreSerializers.VideosSerializer
     queryset = CoreModels.Videos.objects.all()
     permission_classes = [IsSelfOrReadOnly]
@@ -125,19 +130,16 @@ class VideosView(GenericViewSet, RetrieveModelMixin, ListModelMixin, CreateModel
 
     def get_queryset(self):
         request = self.request
-        if request.query_params:
+        if search_keys(request):
             return dynamic_search(request, CoreModels.Videos)
         return set_queryset(self, CoreModels.Users.Roles.USER, 'user', self.request.user.pk, CoreModels.Videos)
 
     @extend_schema(
         description="""
         Get request of videos returns all of the videos.
-        for search in them and all of fields can use queryparmas.
+        for search in them the searchable fields of the model can use queryparmas.
         """,
         parameters=[
-            OpenApiParameter(
-                name='caption', description="An example as normal field in search (?caption=abc)", required=False,
-            ),
             OpenApiParameter(
                 name='user-id', description="An example as foreign field in search (?user-id=1)", required=False,
             ),
@@ -158,7 +160,7 @@ class VideosView(GenericViewSet, RetrieveModelMixin, ListModelMixin, CreateModel
 
 
 # Videos APIs
-class ImagesView(GenericViewSet, RetrieveModelMixin, ListModelMixin, CreateModelMixin):
+class ImagesView(PrefetchMixin, StreamingListMixin, ValuesListMixin, ConditionalRetrieveMixin, GenericViewSet, RetrieveModelMixin, ListModelMixin, CreateModelMixin):
     """
     A view for get and create image
     """
@@ -176,19 +178,16 @@ class ImagesView(GenericViewSet, RetrieveModelMixin, ListModelMixin, CreateModel
 
     def get_queryset(self):
         request = self.request
-        if request.query_params:
+        if search_keys(request):
             return dynamic_search(request, CoreModels.Images)
         return set_queryset(self, CoreModels.Users.Roles.USER, 'user', self.request.user.pk, CoreModels.Images)
 
     @extend_schema(
         description="""
         Get request of images returns all of the images.
-        for search in them and all of fields can use queryparmas.
+        for search in them the searchable fields of the model can use queryparmas.
         """,
         parameters=[
-            OpenApiParameter(
-                name='caption', description="An example as normal field in search (?caption=abc)", required=False,
-            ),
             OpenApiParameter(
                 name='user-id', description="An example as foreign field in search (?user-id=1)", required=False,
             ),
@@ -209,21 +208,23 @@ class ImagesView(GenericViewSet, RetrieveModelMixin, ListModelMixin, CreateModel
 
 
 # Posts APIs
-class PostsView(ModelViewSet):
+class PostsView(PrefetchMixin, StreamingListMixin, ValuesListMixin, ConditionalRetrieveMixin, ModelViewSet):
     serializer_class = CoreSerializers.PostsSerializer
     queryset = CoreModels.Posts.objects.all()
     permission_classes = [IsSelfOrReadOnly]
 
     def get_queryset(self):
         request = self.request
-        if request.query_params:
-            return dynamic_search(request, CoreModels.Posts)
-        return set_queryset(self, CoreModels.Users.Roles.USER, 'user', self.request.user.pk, CoreModels.Posts)
+        if search_keys(request):
+            posts = dynamic_search(request, CoreModels.Posts)
+        else:
+            posts = set_queryset(self, CoreModels.Users.Roles.USER, 'user', self.request.user.pk, CoreModels.Posts)
+        return annotate_viewer(posts, request.user)
 
     @extend_schema(
         description="""
         Get request of posts returns all of the posts.
-        for search in them and all of fields can use queryparmas.
+        for search in them the searchable fields of the model can use queryparmas.
         """,
         parameters=[
             OpenApiParameter(
@@ -243,6 +244,41 @@ class PostsView(ModelViewSet):
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
+    def retrieve(self, request: Request, *args, **kwargs):
+        config = cache_settings()
+        if not config['ENABLED']:
+            return super().retrieve(request, *args, **kwargs)
+
+        # visibility of the post, its user, the counters and the interactions of the viewer
+        # in one indexed query, they are not taken from the cache
+        queryset = self.filter_queryset(self.get_queryset())
+        fresh_fields = CoreModels.Posts.counter_fields + tuple(
+            name for name in VIEWER_INTERACTIONS if name in queryset.query.annotations
+        )
+        row = get_object_or_404(
+            queryset.values_list('id', 'user', *fresh_fields),
+            **{self.lookup_field: self.kwargs[self.lookup_url_kwarg or self.lookup_field]}
+        )
+        pk, user, fresh = row[0], row[1], dict(zip(fresh_fields, row[2:]))
+        post_version, user_version = post_versions(pk, user)
+
+        etag = make_etag(request, post_version, user_version, row)
+        if not_modified(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        def build():
+            return dict(self.get_serializer(self.get_object()).data)
+
+        data = get_or_build(
+            post_detail_key(pk, request_variant(request), post_version, user_version), build,
+            config['TIMEOUT'], config['LOCK_TIMEOUT'], config['WAIT']
+        )
+        data = {
+            name: fresh.get(name, value) for name, value in data.items()
+            if name in fresh or name not in VIEWER_INTERACTIONS
+        }
+        return Response(data, headers={'ETag': etag})
+
     def create(self, request: Request, *args, **kwargs):
         # variables
         status_value_IN_USED = CoreModels.Images.Status.IS_USED
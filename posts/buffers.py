@@ -0,0 +1,191 @@
+import atexit
+import logging
+import os
+import threading
+from pathlib import Path
+from time import monotonic
+from django.conf import settings
+from django.db import connection
+from posts.models import ViewPost
+from posts.counters import bulk_insert
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # when it is False views are inserted on the request path
+    'ENABLED': False,
+    # flush when this number of unique (user, post) pairs are waiting
+    'MAX_SIZE': 500,
+    # flush when the oldest waiting view is older than this seconds
+    'FLUSH_INTERVAL': 2.0,
+    # directory of the journals that keep waiting views if the process dies
+    'SPOOL_DIR': os.path.join(settings.BASE_DIR, 'spool', 'views'),
+}
+
+
+def buffer_settings():
+    return {**DEFAULTS, **getattr(settings, 'VIEW_BUFFER', {})}
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ViewBuffer:
+    """
+    An in-process write-behind buffer of views of posts.
+    duplicate (user, post) pairs are removed in memory, every view is appended to a journal
+    file before it is buffered and the journal is removed only after the views are inserted,
+    so the views of a dead process are replayed by the next process that starts a buffer.
+    a daemon thread inserts the views when MAX_SIZE pairs are waiting or FLUSH_INTERVAL is passed,
+    requests only append to the journal and never wait for the insert.
+    """
+
+    def __init__(self, max_size, flush_interval, spool_dir):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.spool_dir = Path(spool_dir)
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stats = {
+            'depth': 0, 'flushes': 0, 'flushed_rows': 0, 'failed_flushes': 0,
+            'last_flush_seconds': 0.0, 'max_flush_seconds': 0.0,
+        }
+
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self.journal_path = self.spool_dir / f"{os.getpid()}.log"
+        self.journal = open(self.journal_path, 'a', encoding='utf-8')
+        self.recover()
+
+        self.worker = threading.Thread(target=self._run, name='view-buffer', daemon=True)
+        self.worker.start()
+
+    def _journal(self, pairs):
+        self.journal.writelines(f"{user},{post}\n" for user, post in pairs)
+        self.journal.flush()
+
+    def _buffer(self, pairs):
+        for pair in pairs:
+            self.pending.setdefault(pair, None)
+        self.stats['depth'] = len(self.pending)
+
+    def recover(self):
+        """
+        move the journals of dead processes into this buffer.
+        """
+        for path in self.spool_dir.glob('*.log*'):
+            pid = path.name.split('.')[0]
+            if not pid.isdigit() or int(pid) == os.getpid() or _pid_alive(int(pid)):
+                continue
+
+            with open(path, encoding='utf-8') as file:
+                pairs = [
+                    tuple(int(item) for item in line.split(','))
+                    for line in file if line.strip()
+                ]
+            with self.lock:
+                self._journal(pairs)
+                self._buffer(pairs)
+            path.unlink(missing_ok=True)
+            logger.info("recovered %s views from %s", len(pairs), path.name)
+
+    def add(self, user_id, post_id):
+        with self.lock:
+            self._journal([(user_id, post_id)])
+            self._buffer([(user_id, post_id)])
+            full = len(self.pending) >= self.max_size
+
+        if full:
+            # the worker inserts them, the request does not wait for the insert
+            self.wake.set()
+
+    def _run(self):
+        while True:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            try:
+                self.flush()
+            finally:
+                connection.close()
+
+    def flush(self):
+        """
+        insert the waiting views by one bulk_create and update views_count of their posts.
+        """
+        with self.flush_lock:
+            with self.lock:
+                if not self.pending:
+                    return 0
+                pairs = list(self.pending)
+                self.pending = {}
+                self.stats['depth'] = 0
+
+                # the next views go to a new journal and this one is removed after insert
+                self.journal.close()
+                flushing_path = self.journal_path.with_name(f"{os.getpid()}.log.{self.stats['flushes']}")
+                os.replace(self.journal_path, flushing_path)
+                self.journal = open(self.journal_path, 'a', encoding='utf-8')
+
+            started = monotonic()
+            try:
+                inserted = insert_views(pairs)
+            except Exception:
+                logger.exception("flushing %s views failed", len(pairs))
+                with self.lock:
+                    self.stats['failed_flushes'] += 1
+                    self._journal(pairs)
+                    self._buffer(pairs)
+                flushing_path.unlink(missing_ok=True)
+                return 0
+            flushing_path.unlink(missing_ok=True)
+
+            elapsed = monotonic() - started
+            self.stats['flushes'] += 1
+            self.stats['flushed_rows'] += inserted
+            self.stats['last_flush_seconds'] = elapsed
+            self.stats['max_flush_seconds'] = max(self.stats['max_flush_seconds'], elapsed)
+            logger.info(
+                "flushed %s views (%s new) in %.1f ms, buffer depth %s",
+                len(pairs), inserted, elapsed * 1000, self.stats['depth']
+            )
+            return inserted
+
+
+def insert_views(pairs):
+    """
+    insert (user, post) pairs of views that are not saved yet and returns the number of new rows.
+    """
+    new_pairs, _ = bulk_insert(ViewPost, pairs)
+    return len(new_pairs)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_view_buffer():
+    """
+    returns the buffer of this process or None when write-behind mode is disabled.
+    """
+    global _buffer
+    config = buffer_settings()
+    if not config['ENABLED']:
+        return None
+
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = ViewBuffer(
+                    config['MAX_SIZE'], config['FLUSH_INTERVAL'], config['SPOOL_DIR']
+                )
+                atexit.register(_buffer.flush)
+    return _buffer
@@ -0,0 +1,111 @@
+from django.db import connection, transaction
+from django.db.models import (
+    F, Q, Count, OuterRef, Subquery, Value, Case, When, PositiveIntegerField
+)
+from django.db.models.functions import Coalesce, Greatest
+from core.models import Posts
+from posts import models as PostsModels
+
+
+# the interaction models and the counter field of Posts that counts them
+COUNTERS = {
+    PostsModels.LikePost: 'likes_count',
+    PostsModels.Comments: 'comments_count',
+    PostsModels.ViewPost: 'views_count',
+    PostsModels.SavePosts: 'saves_count',
+}
+# rows of every INSERT of bulk_insert, 3 params a row stays under the params limit of sqlite
+BATCH_SIZE = 300
+
+
+def update_counter(model, post_id, delta=1):
+    """
+    add delta to the counter of the model on the post atomically in the database.
+    """
+    field = COUNTERS[model]
+    Posts.objects.filter(Q(pk=post_id)).update(
+        **{field: Greatest(F(field) + delta, Value(0), output_field=PositiveIntegerField())}
+    )
+
+
+def update_counters(model, counts):
+    """
+    add the counts ({post id: delta}) to the counter of the model on many posts by one UPDATE.
+    """
+    if not counts:
+        return
+    field = COUNTERS[model]
+    Posts.objects.filter(Q(id__in=counts)).update(**{field: Case(
+        *[When(id=post, then=Greatest(F(field) + delta, Value(0))) for post, delta in counts.items()],
+        default=F(field), output_field=PositiveIntegerField()
+    )})
+
+
+def bulk_insert(model, pairs):
+    """
+    insert the (user, post) pairs of an interaction model and count the inserted ones on posts.
+    returns (new pairs, pairs of posts that are not found), the other pairs already exist.
+    """
+    posts = {post for _, post in pairs}
+    users = {user for user, _ in pairs}
+    found_posts = set(Posts.objects.filter(Q(id__in=posts)).values_list('id', flat=True))
+    found_pairs = set(model.objects.filter(
+        Q(post__in=posts) & Q(user__in=users)
+    ).values_list('user', 'post'))
+
+    new_pairs = [
+        pair for pair in dict.fromkeys(pairs)
+        if pair[1] in found_posts and pair not in found_pairs
+    ]
+    missing = [pair for pair in pairs if pair[1] not in found_posts]
+    if not new_pairs:
+        return new_pairs, missing
+
+    with transaction.atomic():
+        # a pair that is inserted by a concurrent request or flush is skipped by the unique constraint
+        # and is not returned, so only the inserted rows are counted
+        new_pairs = insert_pairs(model, new_pairs)
+        counts = {}
+        for _, post in new_pairs:
+            counts[post] = counts.get(post, 0) + 1
+        update_counters(model, counts)
+    return new_pairs, missing
+
+
+def insert_pairs(model, pairs):
+    """
+    insert the (user, post) pairs by INSERT ... ON CONFLICT DO NOTHING and returns the inserted pairs.
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    field = model._meta.get_field('created_at')
+    created_at = field.get_db_prep_value(field.pre_save(model(), add=True), connection)
+
+    inserted = []
+    for start in range(0, len(pairs), BATCH_SIZE):
+        batch = pairs[start:start + BATCH_SIZE]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} ("user_id", "post_id", "created_at") '
+                f'VALUES {", ".join(["(%s, %s, %s)"] * len(batch))} '
+                f'ON CONFLICT ("user_id", "post_id") DO NOTHING RETURNING "user_id", "post_id"',
+                [item for user, post in batch for item in (user, post, created_at)]
+            )
+            inserted.extend(cursor.fetchall())
+    return [(user, post) for user, post in inserted]
+
+
+def reconcile_counters(start_id, end_id):
+    """
+    recompute all counters of posts with id in [start_id, end_id) from the interaction tables.
+    """
+    counts = {}
+    for model, field in COUNTERS.items():
+        counts[field] = Coalesce(Subquery(
+            model.objects.filter(
+                Q(post=OuterRef('pk'))
+            ).order_by().values('post').annotate(count=Count('pk')).values('count')
+        ), 0)
+
+    return Posts.objects.filter(
+        Q(id__gte=start_id) & Q(id__lt=end_id)
+    ).update(**counts)
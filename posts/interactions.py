@@ -0,0 +1,26 @@
+from django.db.models import (
+    Q, Exists, OuterRef, QuerySet
+)
+from posts import models as PostsModels
+
+
+# the interactions of the viewer on posts, the names are the fields of PostsSerializer
+VIEWER_INTERACTIONS = {
+    'liked': PostsModels.LikePost,
+    'saved': PostsModels.SavePosts,
+    'viewed': PostsModels.ViewPost,
+}
+
+
+def annotate_viewer(queryset: QuerySet, user):
+    """
+    annotate the posts of the queryset with the interactions of the user by Exists() subqueries,
+    so they are selected in the same statement as the posts. anonymous users are not annotated.
+    """
+    if not getattr(user, 'is_authenticated', False):
+        return queryset
+
+    return queryset.annotate(**{
+        name: Exists(model.objects.filter(Q(user=user.pk) & Q(post=OuterRef('pk'))))
+        for name, model in VIEWER_INTERACTIONS.items()
+    })
@@ -0,0 +1,111 @@
+import threading
+from time import perf_counter
+from django.core.management.base import BaseCommand
+from django.db import connection, IntegrityError
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from core import models as CoreModels
+from posts import models as PostsModels
+from colorama import Fore, Style
+
+
+class Command(BaseCommand):
+    help = "Compare check-then-insert with insert-on-conflict for likes and run a duplicate like race."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--likes', type=int, default=1000, help="Number of likes that are created in every mode."
+        )
+        parser.add_argument(
+            '--threads', type=int, default=16, help="Number of threads that like the same post in the race."
+        )
+
+    def setup(self, count):
+        user, _ = CoreModels.Users.objects.get_or_create(
+            username='bench-interactions',
+            defaults={'first_name': 'bench', 'last_name': 'bench', 'phone': '0', 'email': None},
+        )
+        posts = list(CoreModels.Posts.objects.filter(Q(user=user)).values_list('id', flat=True)[:count])
+        missing = count - len(posts)
+        if missing > 0:
+            texts = CoreModels.Texts.objects.bulk_create([
+                CoreModels.Texts(text='bench', user=user, status=CoreModels.Texts.Status.IS_USED)
+                for _ in range(missing)
+            ])
+            created = CoreModels.Posts.objects.bulk_create([
+                CoreModels.Posts(user=user, title='bench', text=text) for text in texts
+            ])
+            posts += [post.pk for post in created]
+        PostsModels.LikePost.objects.filter(Q(user=user)).delete()
+        return user, posts
+
+    def check_then_insert(self, user, post):
+        # the old path: one SELECT for duplicates and one INSERT
+        if PostsModels.LikePost.objects.filter(Q(user=user, post=post)).exists():
+            return False
+        PostsModels.LikePost.objects.create(user=user, post_id=post)
+        return True
+
+    def insert_on_conflict(self, user, post):
+        # the new path: one INSERT, the unique constraint rejects duplicates.
+        # the command runs in autocommit so a rejected INSERT does not break a transaction
+        try:
+            PostsModels.LikePost.objects.create(user=user, post_id=post)
+        except IntegrityError:
+            return False
+        return True
+
+    def measure(self, name, user, posts, create):
+        PostsModels.LikePost.objects.filter(Q(user=user)).delete()
+        with CaptureQueriesContext(connection) as queries:
+            started = perf_counter()
+            for post in posts:
+                create(user, post)
+            elapsed = perf_counter() - started
+
+        print(
+            f"{name:<20} {elapsed * 1000:>10.1f} ms   "
+            f"{len(queries) / len(posts):.2f} queries per like   "
+            f"{elapsed * 1000000 / len(posts):>8.1f} us per like"
+        )
+
+    def race(self, name, user, post, threads, create):
+        PostsModels.LikePost.objects.filter(Q(user=user)).delete()
+        barrier = threading.Barrier(threads)
+        created, errors = [], []
+
+        def worker():
+            try:
+                barrier.wait()
+                created.append(create(user, post))
+            except IntegrityError:
+                # a duplicate that passed the check, the request would fail with 500
+                errors.append(True)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        rows = PostsModels.LikePost.objects.filter(Q(user=user, post=post)).count()
+        print(
+            f"{name:<20} {threads} concurrent likes -> {sum(created)} created, "
+            f"{len(errors)} unhandled IntegrityError, {rows} rows"
+        )
+
+    def handle(self, *args, **options):
+        user, posts = self.setup(options['likes'])
+        print(f"{Fore.CYAN}Likes: {len(posts)}, threads: {options['threads']}{Style.RESET_ALL}")
+
+        self.measure("check-then-insert", user, posts, self.check_then_insert)
+        self.measure("insert-on-conflict", user, posts, self.insert_on_conflict)
+
+        # the unique constraint keeps one row in both paths, but only insert-on-conflict
+        # handles the duplicates that pass the check of the old path
+        self.race("check-then-insert", user, posts[0], options['threads'], self.check_then_insert)
+        self.race("insert-on-conflict", user, posts[0], options['threads'], self.insert_on_conflict)
+
+        PostsModels.LikePost.objects.filter(Q(user=user)).delete()
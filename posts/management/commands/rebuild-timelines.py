@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from core import models as CoreModels
+from posts.timeline import rebuild_timeline
+from colorama import Fore, Style
+
+
+class Command(BaseCommand):
+    help = "Rebuild the materialized home timeline of users from their followings."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, default=None, help="Rebuild only the timeline of this user id."
+        )
+
+    def handle(self, *args, **options):
+        users = CoreModels.Users.objects.filter(Q(role=CoreModels.Users.Roles.USER))
+        if options['user']:
+            users = users.filter(Q(pk=options['user']))
+
+        print("Rebuilding Timelines ... ", end='')
+        for user_id in users.values_list('id', flat=True).iterator():
+            rebuild_timeline(user_id)
+        print(f"{Fore.GREEN}OK{Style.RESET_ALL}")
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Min, Max
+from core.models import Posts
+from posts.counters import reconcile_counters
+from colorama import Fore, Style
+
+
+class Command(BaseCommand):
+    help = "Recompute likes, comments, views and saves counters of posts in id-range chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000, help="Number of post ids in every chunk."
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        bounds = Posts.objects.aggregate(start=Min('id'), end=Max('id'))
+        if bounds['start'] is None:
+            print(f"{Fore.CYAN}No posts.{Style.RESET_ALL}")
+            return
+
+        print("Reconciling Counters ... ", end='', flush=True)
+        updated = 0
+        for start in range(bounds['start'], bounds['end'] + 1, chunk_size):
+            # every chunk is a short transaction so writers are not blocked for long
+            with transaction.atomic():
+                updated += reconcile_counters(start, start + chunk_size)
+        print(f"{Fore.GREEN}OK{Style.RESET_ALL} ({updated} posts)")
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from posts import search
+from colorama import Fore, Style
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search documents of posts and comments in id-range chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000, help="Number of rows in every UPDATE."
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+
+        print("Reindexing Posts ... ", end='', flush=True)
+        search.index_posts(Q(), chunk_size)
+        print(f"{Fore.GREEN}OK{Style.RESET_ALL}")
+
+        print("Reindexing Comments ... ", end='', flush=True)
+        search.index_comments(Q(), chunk_size)
+        print(f"{Fore.GREEN}OK{Style.RESET_ALL}")
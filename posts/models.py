@@ -1,4 +1,9 @@
 from django.db import models
+from django.contrib.postgres.indexes import (
+    OpClass, GinIndex
+)
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models.functions import Upper
 from core.models import (
     Users, Posts
 )
@@ -19,6 +24,9 @@ class Albums(models.Model):
         verbose_name='created_at', auto_now_add=True
     )
 
+    # query params of dynamic_search, every field is backed by an index
+    search_fields = ('id', 'title', 'user-id')
+
     class Meta:
         db_table = 'Albums'
         constraints = [
@@ -26,6 +34,11 @@ class Albums(models.Model):
                 fields=['user', 'title'], name='unique_user_title'
             )
         ]
+        indexes = [
+            models.Index(
+                OpClass(Upper('title'), name='text_pattern_ops'), name='albums_title_upper_idx'
+            ),
+        ]
 
     def __str__(self):
         return "%s -> %s" % (self.user.username, self.title)
@@ -51,8 +64,24 @@ class SavePosts(models.Model):
         verbose_name='created_at', auto_now_add=True
     )
 
+    # query params of dynamic_search, every field is backed by an index
+    search_fields = ('id', 'user-id', 'post-id', 'album-id')
+
     class Meta:
         db_table = 'SavePosts'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post', 'album'], name='unique_saveposts_user_post_album'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['album', 'created_at', 'id'], name='saveposts_album_created_idx'
+            ),
+            models.Index(
+                fields=['post', 'created_at'], name='saveposts_post_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return "%s -> %s => %s" % (self.user.username, self.post.title, self.album.title)
@@ -74,8 +103,21 @@ class LikePost(models.Model):
         verbose_name='created_at', auto_now_add=True
     )
 
+    # query params of dynamic_search, every field is backed by an index
+    search_fields = ('id', 'user-id', 'post-id')
+
     class Meta:
         db_table = 'LikePost'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_likepost_user_post'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['post', 'created_at'], name='likepost_post_created_idx'
+            )
+        ]
 
     def __str__(self):
         return "%s %s" % (self.user.username, self.post.title)
@@ -99,9 +141,24 @@ class Comments(models.Model):
     created_at = models.DateField(
         verbose_name='created_at', auto_now_add=True
     )
+    # full-text search document of comment, kept by posts.search
+    search_vector = SearchVectorField(
+        verbose_name='search_vector', null=True, editable=False
+    )
+
+    # query params of dynamic_search, every field is backed by an index
+    search_fields = ('id', 'user-id', 'post-id')
 
     class Meta:
         db_table = 'Comments'
+        indexes = [
+            models.Index(
+                fields=['post', 'created_at'], name='comments_post_created_idx'
+            ),
+            GinIndex(
+                fields=['search_vector'], name='comments_search_vector_idx'
+            ),
+        ]
 
     def __str__(self):
         return "%s %s" % (self.user.username, self.comment[:10])
@@ -123,8 +180,58 @@ class ViewPost(models.Model):
         verbose_name='created_at', auto_now_add=True
     )
 
+    # query params of dynamic_search, every field is backed by an index
+    search_fields = ('id', 'user-id', 'post-id')
+
     class Meta:
         db_table = 'ViewPost'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_viewpost_user_post'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['created_at', 'id'], name='viewpost_created_id_idx'
+            ),
+            models.Index(
+                fields=['post', 'created_at'], name='viewpost_post_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return "%s %s" % (self.user.username, self.post.title)
+
+
+class Timeline(models.Model):
+    """
+    The materialized home feed of users.
+    every post is pushed to the timeline of followers of its uploader when it is created.
+    """
+    user = models.ForeignKey(
+        to=Users, verbose_name='user', null=False, blank=False, on_delete=models.DO_NOTHING,
+        related_name='user_timeline'
+    )
+    post = models.ForeignKey(
+        to=Posts, verbose_name='post', null=False, blank=False, on_delete=models.CASCADE,
+        related_name='timeline_post'
+    )
+    created_at = models.DateTimeField(
+        verbose_name='created_at', auto_now_add=True
+    )
+
+    class Meta:
+        db_table = 'Timeline'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_user_post'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-post'], name='timeline_user_post_idx'
+            )
+        ]
+
+    def __str__(self):
+        return "%s -> %s" % (self.user.username, self.post.title)
@@ -0,0 +1,197 @@
+import re
+import threading
+from math import log
+from django.contrib.postgres.search import (
+    SearchVector, SearchQuery, SearchRank
+)
+from django.db import connection
+from django.db.models import (
+    Q, F, OuterRef, Subquery, QuerySet
+)
+from core.models import (
+    Posts, Texts, Images, Videos
+)
+from posts.models import Comments
+
+
+# text search configuration of postgres, simple is language agnostic
+SEARCH_CONFIG = 'simple'
+# weights of ranks in the in-memory index, same as the default weights of ts_rank
+WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2, 'D': 0.1}
+
+
+def use_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def post_vector():
+    """
+    the search document of a post: title, text and captions of its image and video.
+    """
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG) +
+        SearchVector(
+            Subquery(Texts.objects.filter(pk=OuterRef('text')).values('text')[:1]),
+            weight='B', config=SEARCH_CONFIG
+        ) +
+        SearchVector(
+            Subquery(Images.objects.filter(pk=OuterRef('image')).values('caption')[:1]),
+            weight='C', config=SEARCH_CONFIG
+        ) +
+        SearchVector(
+            Subquery(Videos.objects.filter(pk=OuterRef('video')).values('caption')[:1]),
+            weight='C', config=SEARCH_CONFIG
+        )
+    )
+
+
+def comment_vector():
+    return SearchVector('comment', weight='B', config=SEARCH_CONFIG)
+
+
+class InvertedIndex:
+    """
+    A pure-Python inverted index that is used instead of tsvector columns
+    when the database is not postgres (tests and local sqlite).
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.documents = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def tokenize(text):
+        return re.findall(r'\w+', (text or '').lower())
+
+    def add(self, key, weighted_texts):
+        """
+        index the document of key, weighted_texts is a list of (text, weight).
+        """
+        scores = {}
+        for text, weight in weighted_texts:
+            for token in self.tokenize(text):
+                scores[token] = scores.get(token, 0) + WEIGHTS[weight]
+
+        with self.lock:
+            self._remove(key)
+            self.documents[key] = scores
+            for token, score in scores.items():
+                self.postings.setdefault(token, {})[key] = score
+
+    def _remove(self, key):
+        for token in self.documents.pop(key, {}):
+            found = self.postings.get(token, {})
+            found.pop(key, None)
+            if not found:
+                self.postings.pop(token, None)
+
+    def remove(self, key):
+        with self.lock:
+            self._remove(key)
+
+    def search(self, kind, query):
+        """
+        returns (id, rank) of the documents of the kind that have all tokens of the query.
+        """
+        tokens = set(self.tokenize(query))
+        if not tokens:
+            return []
+
+        with self.lock:
+            postings = [self.postings.get(token, {}) for token in tokens]
+            total = len(self.documents) or 1
+            matches = set.intersection(*(set(found) for found in postings))
+            ranks = {
+                key[1]: sum(found[key] * log(1 + total / len(found)) for found in postings)
+                for key in matches if key[0] == kind
+            }
+        return sorted(ranks.items(), key=lambda item: (-item[1], -item[0]))
+
+
+memory_index = InvertedIndex()
+_memory_built = False
+
+
+def build_memory_index(chunk_size=2000):
+    """
+    build the in-memory index from database.
+    """
+    global _memory_built
+    _memory_built = True
+    index_posts(Q(), chunk_size)
+    index_comments(Q(), chunk_size)
+
+
+def _chunks(queryset: QuerySet, chunk_size):
+    # walk the queryset in id ranges, without chunk_size the whole queryset is one chunk
+    if chunk_size is None:
+        yield Q()
+        return
+
+    last = 0
+    while True:
+        ids = list(queryset.filter(Q(id__gt=last)).order_by('id').values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return
+        yield Q(id__gte=ids[0]) & Q(id__lte=ids[-1])
+        last = ids[-1]
+
+
+def index_posts(query: Q, chunk_size=None):
+    """
+    update the search document of posts that match the query.
+    """
+    for chunk in _chunks(Posts.objects.filter(query), chunk_size):
+        posts = Posts.objects.filter(query & chunk)
+        if use_postgres():
+            posts.update(search_vector=post_vector())
+            continue
+
+        for post in posts.values('id', 'title', 'text__text', 'image__caption', 'video__caption'):
+            memory_index.add(('posts', post['id']), [
+                (post['title'], 'A'), (post['text__text'], 'B'),
+                (post['image__caption'], 'C'), (post['video__caption'], 'C'),
+            ])
+
+
+def index_comments(query: Q, chunk_size=None):
+    """
+    update the search document of comments that match the query.
+    """
+    for chunk in _chunks(Comments.objects.filter(query), chunk_size):
+        comments = Comments.objects.filter(query & chunk)
+        if use_postgres():
+            comments.update(search_vector=comment_vector())
+            continue
+
+        for comment in comments.values('id', 'comment'):
+            memory_index.add(('comments', comment['id']), [(comment['comment'], 'B')])
+
+
+def remove_document(kind, pk):
+    if not use_postgres():
+        memory_index.remove((kind, pk))
+
+
+def search(kind, query, queryset: QuerySet):
+    """
+    returns the objects of the queryset (posts or comments) that match the query ordered by rank.
+    """
+    if use_postgres():
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='plain')
+        return queryset.filter(Q(search_vector=search_query)).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-rank', '-id')
+
+    if not _memory_built:
+        build_memory_index()
+
+    ranks = memory_index.search(kind, query)
+    found = queryset.filter(Q(pk__in=[pk for pk, _ in ranks])).in_bulk()
+    results = []
+    for pk, rank in ranks:
+        if pk in found:
+            found[pk].rank = rank
+            results.append(found[pk])
+    return results
@@ -1,55 +1,68 @@
 from rest_framework.serializers import (
-    ModelSerializer, Serializer
+    ModelSerializer, Serializer, PrimaryKeyRelatedField, IntegerField, CharField
 )
 from posts import models as PostsModels
 from core.serializers import (
-    UsersSerializer, PostsSerializer
+    UsersSerializer, PostsSerializer, DynamicFieldsMixin, ValuesSerializer
 )
 
 
-class AlbumsSerializer(ModelSerializer):
+class AlbumsSerializer(DynamicFieldsMixin, ModelSerializer):
+    user = PrimaryKeyRelatedField(read_only=True)
     user_details = UsersSerializer(read_only=True, source='user')
 
     class Meta:
         model = PostsModels.Albums
-        exclude = ['user']
+        fields = '__all__'
 
 
-class SavePostSerializer(ModelSerializer):
+class SavePostSerializer(DynamicFieldsMixin, ModelSerializer):
+    user = PrimaryKeyRelatedField(read_only=True)
     user_details = UsersSerializer(read_only=True, source='user')
     post_details = PostsSerializer(read_only=True, source='post')
     album_details = AlbumsSerializer(read_only=True, source='album')
 
     class Meta:
         model = PostsModels.SavePosts
-        exclude = ['user']
+        fields = '__all__'
 
 
-class LikePostSerializer(ModelSerializer):
+class LikePostSerializer(DynamicFieldsMixin, ModelSerializer):
+    user = PrimaryKeyRelatedField(read_only=True)
     user_details = UsersSerializer(read_only=True, source='user')
     post_details = PostsSerializer(read_only=True, source='post')
 
     class Meta:
         model = PostsModels.LikePost
-        exclude = ['user']
+        fields = '__all__'
 
 
-class CommentsSerializer(ModelSerializer):
+class CommentsSerializer(DynamicFieldsMixin, ModelSerializer):
+    user = PrimaryKeyRelatedField(read_only=True)
     user_details = UsersSerializer(read_only=True, source='user')
     post_details = PostsSerializer(read_only=True, source='post')
 
     class Meta:
         model = PostsModels.Comments
-        exclude = ['user']
+        exclude = ['search_vector']
 
 
-class ViewPostSerializer(ModelSerializer):
+class ViewPostSerializer(DynamicFieldsMixin, ModelSerializer):
+    user = PrimaryKeyRelatedField(read_only=True)
     user_details = UsersSerializer(read_only=True, source='user')
     post_details = PostsSerializer(read_only=True, source='post')
 
     class Meta:
         model = PostsModels.ViewPost
-        exclude = ['user']
+        fields = '__all__'
+
+
+# read-only fast serializers of list responses
+AlbumsValues = ValuesSerializer(AlbumsSerializer)
+SavePostValues = ValuesSerializer(SavePostSerializer)
+LikePostValues = ValuesSerializer(LikePostSerializer)
+CommentsValues = ValuesSerializer(CommentsSerializer)
+ViewPostValues = ValuesSerializer(ViewPostSerializer)
 
 
 class AlbumWithPostSerializer(Serializer):
@@ -58,10 +71,16 @@ class AlbumWithPostSerializer(Serializer):
     The output format will be a dictionary:
         {
             "album": { ...album data... },
-            "posts": [ ...list of post data... ]
+            "posts": [ ...list of post data... ],
+            "posts_count": ...count of posts in list of albums...
         }
     """
 
+    # the declared fields describe the response in the schema, to_representation builds it
+    album = AlbumsSerializer(read_only=True)
+    posts = PostsSerializer(many=True, read_only=True)
+    posts_count = IntegerField(read_only=True)
+
     def to_representation(self, instance):
         """
         Convert a tuple (album, posts) into a dictionary representation.
@@ -70,13 +89,27 @@ class AlbumWithPostSerializer(Serializer):
         1. Unpack the tuple into `album` and `posts`.
         2. Serialize the album instance using AlbumsSerializer.
         3. Serialize the list of posts using PostsSerializer with many=True.
-        4. Return a dictionary with keys 'album' and 'posts'.
+        4. Return a dictionary with keys 'album' and 'posts', and 'posts_count'
+           when the album is annotated with it.
         """
         album, posts = instance  # unpack the tuple
-        album_data = AlbumsSerializer(album).data  # serialize the album
+        # the context keeps ?fields= and ?expand= of the request on the nested serializers
+        album_data = AlbumsSerializer(album, context=self.context).data  # serialize the album
         # serialize all related posts
-        posts_data = PostsSerializer(posts, many=True).data
-        return {
+        posts_data = PostsSerializer(posts, many=True, context=self.context).data
+        data = {
             'album': album_data,  # key 'album' holds serialized album data
             'posts': posts_data   # key 'posts' holds list of serialized posts
         }
+        if hasattr(album, 'posts_count'):
+            data['posts_count'] = album.posts_count  # total posts saved in the album
+        return data
+
+
+class AlbumWithPostsPageSerializer(AlbumWithPostSerializer):
+    """
+    the response of one album, its posts are a page of the saved posts with the links of the cursors.
+    """
+    posts_count = None
+    next = CharField(read_only=True, allow_null=True)
+    previous = CharField(read_only=True, allow_null=True)
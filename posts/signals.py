@@ -0,0 +1,80 @@
+from django.db import transaction
+from django.db.models.signals import (
+    post_save, post_delete
+)
+from django.dispatch import receiver
+from django.db.models import Q
+from core.models import (
+    Posts, Texts, Images, Videos
+)
+from users.models import Follow
+from posts.models import Comments
+from posts import timeline, search
+
+
+@receiver(post_save, sender=Posts)
+def push_post_to_timelines(sender, instance: Posts, created, **kwargs):
+    """
+    fan-out the created post to the timeline of followers after the transaction is committed.
+    """
+    if created:
+        transaction.on_commit(
+            lambda: timeline.fan_out_post(instance.pk, instance.user_id)
+        )
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance: Follow, created, **kwargs):
+    """
+    fill the timeline of the follower with the posts of the followed user.
+    """
+    if created:
+        transaction.on_commit(
+            lambda: timeline.backfill_follow(instance.follower_user_id, instance.followed_user_id)
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance: Follow, **kwargs):
+    """
+    remove the posts of the unfollowed user from the timeline of the follower.
+    """
+    transaction.on_commit(
+        lambda: timeline.prune_follow(instance.follower_user_id, instance.followed_user_id)
+    )
+
+
+@receiver(post_save, sender=Posts)
+def index_post(sender, instance: Posts, **kwargs):
+    """
+    update the search document of the saved post.
+    """
+    search.index_posts(Q(pk=instance.pk))
+
+
+@receiver(post_save, sender=Texts)
+@receiver(post_save, sender=Images)
+@receiver(post_save, sender=Videos)
+def index_post_content(sender, instance, created, **kwargs):
+    """
+    update the search document of the post that uses the saved text, image or video.
+    """
+    if created:
+        # no post uses a new content yet
+        return
+    field = {Texts: 'text', Images: 'image', Videos: 'video'}[sender]
+    search.index_posts(Q(**{field: instance.pk}))
+
+
+@receiver(post_save, sender=Comments)
+def index_comment(sender, instance: Comments, **kwargs):
+    """
+    update the search document of the saved comment.
+    """
+    search.index_comments(Q(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Posts)
+@receiver(post_delete, sender=Comments)
+def remove_search_document(sender, instance, **kwargs):
+    search.remove_document('posts' if sender is Posts else 'comments', instance.pk)
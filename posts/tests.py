@@ -1,3 +1,393 @@
-from django.test import TestCase
+import tempfile
+import threading
+from unittest import mock
+from django.test import TestCase, SimpleTestCase
+from core.tests import SocialData, QueryCounts, ValuesParity
+from core import models as CoreModels
+from posts import models as PostsModels
+from posts import serializers as PostsSerializers
+from posts import search, timeline
+from users import models as UsersModels
+from posts.buffers import ViewBuffer
 
-# Create your tests here.
+
+class ValuesParityTests(ValuesParity, TestCase):
+
+    def post_details(self):
+        return ','.join(f'post_details.{path}' for path in self.post_expand.split(','))
+
+    def test_albums(self):
+        self.assertParities('/posts/albums/', 'expand=user_details', 'fields=id,title,user_details.username&expand=user_details')
+
+    def test_save_posts(self):
+        self.assertParities(
+            '/posts/save-posts/', f'expand=user_details,album_details.user_details,{self.post_details()}',
+            'fields=id,post_details.title,post_details.image_detail,album_details.title&'
+            'expand=post_details.image_detail,album_details',
+            'limit=none&expand=album_details.user_details'
+        )
+
+    def test_like_posts(self):
+        self.assertParities(
+            '/posts/like-posts/', f'expand=user_details,{self.post_details()}', 'fields=id,post&expand=post_details'
+        )
+
+    def test_comments(self):
+        self.assertParities(
+            '/posts/comments/', f'expand=user_details,{self.post_details()}', 'fields=id,comment,user_details.username&expand=user_details'
+        )
+
+    def test_interacted_posts(self):
+        for route in ('commented-posts', 'liked-posts', 'visited-posts', 'saved-posts'):
+            self.assertParities(
+                f'/posts/{route}/', f'expand={self.post_expand}', 'fields=id,title,text_detail&expand=text_detail'
+            )
+
+    def test_random_posts_following(self):
+        self.assertParities('/posts/random-posts-following/', f'expand={self.post_expand}', 'fields=id,liked,user_detail&expand=user_detail')
+
+
+class QueryCountTests(QueryCounts, TestCase):
+
+    def test_albums(self):
+        self.assertQueries('/posts/albums/?expand=user_details', 3)
+        self.assertQueries(f'/posts/albums/{self.album.pk}/?expand=user_details', 1)
+
+    def test_save_posts(self):
+        expand = ','.join(
+            ['user_details', 'album_details.user_details'] +
+            [f'post_details.{path}' for path in self.post_expand.split(',')]
+        )
+        self.assertQueries('/posts/save-posts/', 2)
+        self.assertQueries(f'/posts/save-posts/?expand={expand}', 3)
+        self.assertQueries(
+            f'/posts/save-posts/{self.first_id(PostsModels.SavePosts, user=self.user)}/'
+            '?expand=post_details.user_details,album_details', 1
+        )
+
+    def test_like_posts(self):
+        self.assertQueries('/posts/like-posts/', 2)
+        self.assertQueries('/posts/like-posts/?expand=user_details,post_details.user_details,post_details.text_detail', 3)
+        self.assertQueries(
+            f'/posts/like-posts/{self.first_id(PostsModels.LikePost, user=self.user)}/?expand=post_details.user_details', 1
+        )
+
+    def test_comments(self):
+        self.assertQueries('/posts/comments/', 2)
+        self.assertQueries('/posts/comments/?expand=user_details,post_details.user_details', 3)
+        self.assertQueries(
+            f'/posts/comments/{self.first_id(PostsModels.Comments, user=self.user)}/?expand=post_details', 1
+        )
+
+    def test_view_post(self):
+        self.assertQueries('/posts/view-post/', 1)
+        self.assertQueries('/posts/view-post/?expand=user_details,post_details.user_details', 1)
+        self.assertQueries(
+            f'/posts/view-post/{self.first_id(PostsModels.ViewPost, user=self.user)}/?expand=post_details', 1
+        )
+
+    def test_interacted_posts(self):
+        for route in ('commented-posts', 'liked-posts', 'visited-posts', 'saved-posts'):
+            with self.subTest(route=route):
+                self.assertQueries(f'/posts/{route}/', 2)
+                self.assertQueries(f'/posts/{route}/?expand={self.post_expand}', 3)
+
+    def test_album_with_posts(self):
+        self.assertQueries('/posts/album-with-posts/', 3)
+        self.assertQueries(f'/posts/album-with-posts/?expand=user_details,{self.post_expand}', 3)
+        self.assertQueries(f'/posts/album-with-posts/{self.album.pk}/', 2)
+        self.assertQueries(f'/posts/album-with-posts/{self.album.pk}/?expand=user_details,{self.post_expand}', 2)
+
+    def test_random_posts(self):
+        self.assertQueries('/posts/random-posts-following/', 2)
+        self.assertQueries(f'/posts/random-posts-following/?expand={self.post_expand}', 3)
+        self.assertQueries('/posts/random-posts/?day=30', 2)
+        self.assertQueries(f'/posts/random-posts/?day=30&expand={self.post_expand}', 2)
+
+
+class AlbumWithPostsTests(SocialData, TestCase):
+
+    def test_fields_and_expand(self):
+        # the album and its posts are shaped by ?fields= and ?expand= like the other endpoints
+        data = self.client.get(f'/posts/album-with-posts/{self.album.pk}/').json()
+        self.assertIsInstance(data['album']['user'], int)
+        self.assertNotIn('user_detail', data['posts'][0])
+
+        data = self.client.get(
+            f'/posts/album-with-posts/{self.album.pk}/'
+            '?expand=user_details,user_detail&fields=id,title,user_details,user_detail'
+        ).json()
+        self.assertEqual(set(data['album']), {'id', 'title', 'user_details'})
+        self.assertEqual(data['album']['user_details']['id'], self.user.pk)
+        self.assertEqual(set(data['posts'][0]), {'id', 'title', 'user_detail'})
+
+    def test_schema_of_responses(self):
+        # the responses have the fields that are declared for the schema
+        data = self.client.get(f'/posts/album-with-posts/{self.album.pk}/').json()
+        self.assertEqual(set(data), set(PostsSerializers.AlbumWithPostsPageSerializer().fields))
+        data = self.client.get('/posts/album-with-posts/').json()
+        self.assertEqual(set(data['results'][0]), set(PostsSerializers.AlbumWithPostSerializer().fields))
+        self.assertEqual(data['results'][0]['posts_count'], len(self.posts))
+
+
+class ScopeTests(SocialData, TestCase):
+    """
+    the params of representation and pagination do not change the rows of a view,
+    only search params change the scope of a user to dynamic_search.
+    """
+    routes = ('/posts/albums/', '/posts/save-posts/', '/posts/like-posts/', '/posts/comments/', '/posts/view-post/')
+
+    def ids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return sorted(row['id'] for row in response.json()['results'])
+
+    def test_fields_and_expand_keep_the_rows(self):
+        for user in (self.user, self.users[1]):
+            self.login(user)
+            for route in self.routes:
+                with self.subTest(user=user.username, route=route):
+                    ids = self.ids(route)
+                    self.assertEqual(self.ids(f'{route}?fields=id,user'), ids)
+                    self.assertEqual(self.ids(f'{route}?expand=user_details'), ids)
+                    self.assertEqual(self.ids(f'{route}?limit=100'), ids)
+                    if user != self.user:
+                        self.assertEqual(ids, [])
+
+    def test_cursor_keeps_the_rows(self):
+        # the next link of the owner does not list the views of the owner to another user
+        response = self.client.get('/posts/view-post/?limit=3')
+        first = [row['id'] for row in response.json()['results']]
+        next_link = response.json()['next']
+        self.assertIn('cursor=', next_link)
+
+        second = [row['id'] for row in self.client.get(next_link).json()['results']]
+        self.assertEqual(len(second), 3)
+        self.assertFalse(set(first) & set(second))
+
+        self.login(self.users[1])
+        self.assertEqual(self.client.get(next_link).json()['results'], [])
+
+
+class BulkTests(SocialData, TestCase):
+
+    def post(self, route, data):
+        return self.client.post(f'/posts/{route}/', data, format='json')
+
+    def test_like_posts(self):
+        self.login(self.users[2])
+        post, liked = self.posts[0], self.posts[1]
+        PostsModels.LikePost.objects.create(user=self.users[2], post=liked)
+        likes = CoreModels.Posts.objects.get(pk=post.pk).likes_count
+
+        response = self.post('bulk-like-posts', {'posts': [post.pk, liked.pk, 0, post.pk]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [
+            {'post': post.pk, 'result': 'created'},
+            {'post': liked.pk, 'result': 'exists'},
+            {'post': 0, 'result': 'not_found'},
+        ])
+        self.assertEqual(CoreModels.Posts.objects.get(pk=post.pk).likes_count, likes + 1)
+
+        # a second request does not count the like again
+        self.post('bulk-like-posts', {'posts': [post.pk]})
+        self.assertEqual(CoreModels.Posts.objects.get(pk=post.pk).likes_count, likes + 1)
+
+    def test_invalid_bodies(self):
+        self.login(self.users[2])
+        for route in ('bulk-like-posts', 'bulk-view-post'):
+            for body in ([self.posts[0].pk], 'posts', {'posts': []}, {'posts': ['a']}, {}):
+                with self.subTest(route=route, body=body):
+                    self.assertEqual(self.post(route, body).status_code, 400)
+
+
+class ViewBufferTests(SimpleTestCase):
+
+    def test_full_buffer_does_not_block(self):
+        started, release, done = threading.Event(), threading.Event(), threading.Event()
+
+        def insert_views(pairs):
+            started.set()
+            release.wait(5)
+            done.set()
+            return len(pairs)
+
+        with tempfile.TemporaryDirectory() as spool_dir, \
+                mock.patch('posts.buffers.insert_views', side_effect=insert_views):
+            buffer = ViewBuffer(max_size=2, flush_interval=60, spool_dir=spool_dir)
+            buffer.add(1, 1)
+            buffer.add(1, 2)
+            # the worker is inserting the full buffer while the request returns and adds the next view
+            self.assertTrue(started.wait(5))
+            self.assertFalse(done.is_set())
+            buffer.add(1, 3)
+            self.assertEqual(buffer.stats['depth'], 1)
+
+            release.set()
+            self.assertTrue(done.wait(5))
+            self.assertEqual(buffer.flush(), 1)
+            self.assertEqual(buffer.stats['flushed_rows'], 3)
+            buffer.journal.close()
+
+
+class SearchTests(SocialData, TestCase):
+    """
+    the in-memory index that is used instead of tsvector columns when the database is not postgres.
+    """
+
+    def setUp(self):
+        super().setUp()
+        # an empty index of this test, it is built from database on the first search
+        patcher = mock.patch.multiple(search, memory_index=search.InvertedIndex(), _memory_built=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_post(self, title, text='text'):
+        text = CoreModels.Texts.objects.create(text=text, user=self.user)
+        return CoreModels.Posts.objects.create(user=self.user, title=title, text=text)
+
+    def search_ids(self, query):
+        response = self.client.get(f'/posts/search/?limit=none&{query}')
+        self.assertEqual(response.status_code, 200, query)
+        return [row['id'] for row in response.json()]
+
+    def test_index_ranks(self):
+        index = search.InvertedIndex()
+        index.add(('posts', 1), [('red apple', 'B')])
+        index.add(('posts', 2), [('red apple', 'A')])
+        index.add(('posts', 3), [('red', 'A'), ('apple apple', 'C')])
+        index.add(('comments', 1), [('red apple', 'A')])
+
+        # every token is needed, a title (A) ranks above a text (B) and repeated tokens add up
+        self.assertEqual([pk for pk, _ in index.search('posts', 'Apple RED')], [2, 3, 1])
+        self.assertEqual([pk for pk, _ in index.search('posts', 'red pear')], [])
+        self.assertEqual([pk for pk, _ in index.search('comments', 'apple')], [1])
+        self.assertEqual(index.search('posts', '!!'), [])
+
+        index.remove(('posts', 2))
+        self.assertEqual([pk for pk, _ in index.search('posts', 'apple')], [3, 1])
+        self.assertNotIn(('posts', 2), index.documents)
+
+    def test_posts(self):
+        in_text = self.create_post('first', 'a banana')
+        in_title = self.create_post('banana split')
+        self.create_post('apple')
+        self.assertEqual(self.search_ids('q=banana'), [in_title.pk, in_text.pk])
+        self.assertEqual(self.search_ids('q=banana split'), [in_title.pk])
+
+    def test_comments(self):
+        post = self.posts[0]
+        comments = [
+            PostsModels.Comments.objects.create(user=self.user, post=post, comment=comment)
+            for comment in ('nice banana', 'banana banana', 'apple')
+        ]
+        self.assertEqual(self.search_ids('type=comments&q=banana'), [comments[1].pk, comments[0].pk])
+        self.assertEqual(self.search_ids('type=comments&q=post'), [])
+
+        for query in ('type=users&q=banana', 'q=', 'type=comments'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/posts/search/?{query}').status_code, 400)
+
+    def test_changes_of_posts(self):
+        post = self.create_post('banana', 'yellow')
+        self.assertEqual(self.search_ids('q=banana'), [post.pk])
+
+        # the title, the text and the comments of a post are indexed again when they change
+        post.title = 'cherry'
+        post.save()
+        self.assertEqual(self.search_ids('q=banana'), [])
+        self.assertEqual(self.search_ids('q=cherry'), [post.pk])
+
+        post.text.text = 'red'
+        post.text.save()
+        self.assertEqual(self.search_ids('q=yellow'), [])
+        self.assertEqual(self.search_ids('q=cherry red'), [post.pk])
+
+        comment = PostsModels.Comments.objects.create(user=self.user, post=post, comment='banana')
+        comment.comment = 'cherry'
+        comment.save()
+        self.assertEqual(self.search_ids('type=comments&q=banana'), [])
+        self.assertEqual(self.search_ids('type=comments&q=cherry'), [comment.pk])
+
+        # deleted documents are removed from the index
+        comment.delete()
+        self.assertEqual(self.search_ids('type=comments&q=cherry'), [])
+        post.delete()
+        self.assertEqual(self.search_ids('q=cherry'), [])
+
+
+class TimelineTests(SocialData, TestCase):
+    """
+    the timelines are changed by the signals of posts and follows after their transaction is committed.
+    """
+
+    def timeline(self, user):
+        return list(timeline.timeline_post_ids(user.pk))
+
+    def posts_of(self, *users):
+        return list(CoreModels.Posts.objects.filter(user__in=users).order_by('-id').values_list('id', flat=True))
+
+    def assertRebuilt(self, user):
+        # the timeline that is changed by the signals is the same as a rebuilt one
+        expected = self.timeline(user)
+        timeline.rebuild_timeline(user.pk)
+        self.assertEqual(self.timeline(user), expected)
+
+    def create_post(self, user):
+        text = CoreModels.Texts.objects.create(text='text', user=user)
+        return CoreModels.Posts.objects.create(user=user, title='new', text=text)
+
+    def test_fan_out_on_create(self):
+        author = self.users[1]
+        # nothing is pushed before the transaction is committed
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            post = self.create_post(author)
+        self.assertNotIn(post.pk, self.timeline(self.user))
+        for callback in callbacks:
+            callback()
+
+        # followers of the author get the post first, the others do not
+        self.assertEqual(self.timeline(self.user)[0], post.pk)
+        self.assertNotIn(post.pk, self.timeline(self.users[2]))
+        self.assertNotIn(post.pk, self.timeline(author))
+        self.assertRebuilt(self.user)
+
+    def test_backfill_on_follow(self):
+        follower = self.users[2]
+        self.assertEqual(self.timeline(follower), self.posts_of(self.user))
+        with self.captureOnCommitCallbacks(execute=True):
+            UsersModels.Follow.objects.create(follower_user=follower, followed_user=self.users[1])
+
+        self.assertEqual(self.timeline(follower), self.posts_of(self.user, self.users[1]))
+        self.assertRebuilt(follower)
+
+    def test_prune_on_unfollow(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            UsersModels.Follow.objects.filter(follower_user=self.user, followed_user=self.users[1]).delete()
+
+        self.assertEqual(self.timeline(self.user), [])
+        # the timelines of the other followers of the user are not changed
+        self.assertEqual(self.timeline(self.users[1]), self.posts_of(self.user))
+        self.assertRebuilt(self.user)
+
+    def test_removal_on_post_delete(self):
+        post = self.posts[1]
+        self.assertIn(post.pk, self.timeline(self.user))
+        with self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+
+        self.assertNotIn(post.pk, self.timeline(self.user))
+        self.assertRebuilt(self.user)
+
+    def test_trim(self):
+        follower = self.users[2]
+        with mock.patch.object(timeline, 'TIMELINE_SIZE', 2):
+            with self.captureOnCommitCallbacks(execute=True):
+                post = self.create_post(self.user)
+            # the timeline keeps the newest TIMELINE_SIZE posts
+            self.assertEqual(self.timeline(follower), self.posts_of(self.user)[:2])
+            self.assertEqual(self.timeline(follower)[0], post.pk)
+        self.assertEqual(
+            list(PostsModels.Timeline.objects.filter(user=follower).values_list('post', flat=True).order_by('-post')),
+            self.posts_of(self.user)[:2]
+        )
@@ -0,0 +1,97 @@
+from django.db.models import Q, OuterRef, Subquery
+from core.models import Posts
+from posts.models import Timeline
+from users.models import Follow
+
+
+# the number of rows that are inserted in every bulk_create of fan-out
+FANOUT_BATCH_SIZE = 1000
+# the number of newest posts that are kept in the timeline of a user, older rows are trimmed
+TIMELINE_SIZE = 800
+
+
+def _bulk_push(user_post_pairs):
+    """
+    insert (user, post) pairs in the Timeline table by batches and ignore the duplicates,
+    then trim the timelines of the batch to their TIMELINE_SIZE newest posts.
+    """
+    batch = []
+    for user, post in user_post_pairs:
+        batch.append(Timeline(user_id=user, post_id=post))
+        if len(batch) >= FANOUT_BATCH_SIZE:
+            Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+            trim_timelines({row.user_id for row in batch})
+            batch = []
+    if batch:
+        Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+        trim_timelines({row.user_id for row in batch})
+
+
+def trim_timelines(user_ids):
+    """
+    delete the rows of the timelines of the users that are older than their TIMELINE_SIZE-th newest post,
+    so a timeline never grows past the slice that is read.
+    """
+    oldest_kept = Timeline.objects.filter(
+        Q(user=OuterRef('user'))
+    ).order_by('-post').values('post')[TIMELINE_SIZE - 1:TIMELINE_SIZE]
+
+    Timeline.objects.filter(
+        Q(user__in=user_ids) & Q(post__lt=Subquery(oldest_kept))
+    ).delete()
+
+
+def fan_out_post(post_id, user_id):
+    """
+    push a new post to the timeline of all followers of its uploader.
+    """
+    followers = Follow.objects.filter(
+        Q(followed_user=user_id)
+    ).values_list('follower_user', flat=True).iterator(chunk_size=FANOUT_BATCH_SIZE)
+
+    _bulk_push((follower, post_id) for follower in followers)
+
+
+def backfill_follow(follower_id, followed_id):
+    """
+    push the newest posts of the followed user to the timeline of the follower.
+    """
+    posts = Posts.objects.filter(
+        Q(user=followed_id)
+    ).order_by('-id').values_list('id', flat=True)[:TIMELINE_SIZE]
+
+    _bulk_push((follower_id, post) for post in posts)
+
+
+def prune_follow(follower_id, followed_id):
+    """
+    remove the posts of the unfollowed user from the timeline of the follower.
+    """
+    Timeline.objects.filter(
+        Q(user=follower_id) & Q(post__user=followed_id)
+    ).delete()
+
+
+def timeline_post_ids(user_id):
+    """
+    returns a bounded and ordered (newest first) queryset of post ids in the timeline of the user.
+    """
+    return Timeline.objects.filter(
+        Q(user=user_id)
+    ).order_by('-post').values_list('post', flat=True)[:TIMELINE_SIZE]
+
+
+def rebuild_timeline(user_id):
+    """
+    rebuild the whole timeline of the user from the users that are followed by the user.
+    """
+    Timeline.objects.filter(Q(user=user_id)).delete()
+
+    followed_users = Follow.objects.filter(
+        Q(follower_user=user_id)
+    ).values_list('followed_user', flat=True)
+    posts = Posts.objects.filter(
+        Q(user__in=followed_users)
+    ).order_by('-id').values_list('id', flat=True)[:TIMELINE_SIZE]
+
+    _bulk_push((user_id, post) for post in posts)
@@ -17,6 +17,10 @@ router.register(r'saved-posts', views.SavedPosts, 'saved-posts')
 router.register(r'album-with-posts', views.AlbumWithPosts, 'album-with-posts')
 router.register(r'random-posts-following',views.RandomPostsFollowingUser, 'random-posts-following')
 router.register(r'random-posts',views.RandomPosts, 'random-posts')
+router.register(r'search', views.SearchView, 'search')
+router.register(r'bulk-like-posts', views.BulkLikePosts, 'bulk-like-posts')
+router.register(r'bulk-view-post', views.BulkViewPosts, 'bulk-view-post')
+router.register(r'interactions', views.PostsInteractions, 'interactions')
 
 urlpatterns = [
     path('', include(router.urls)),
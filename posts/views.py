@@ -6,31 +6,46 @@ from rest_framework.mixins import (
 )
 from posts import serializers as PostsSerializers
 from posts import models as PostsModels
-from django.db.models import Q
+from django.db.models import (
+    Q, Count, Prefetch
+)
 from rest_framework.response import Response
 from rest_framework import status as Status
 from core.helper import (
-    dynamic_search, set_queryset
+    dynamic_search, search_keys, set_queryset, sample_list, PrefetchMixin, StreamingListMixin, ValuesListMixin, related_paths,
+    bulk_ids
 )
 from rest_framework.request import Request
 from drf_spectacular.utils import (
     extend_schema, OpenApiParameter
 )
 from core.permissions import (IsActive, IsSelfOrReadOnly, IsUser)
+from core.paginations import KeysetPagination
 from core.models import (
     Users, Posts
 )
 from core.serializers import (
     PostsSerializer
 )
-from users.models import Follow
 from datetime import timedelta
 from django.utils import timezone
 from rest_framework.exceptions import ValidationError
+from django.db import transaction, IntegrityError
+from posts.counters import (
+    update_counter, bulk_insert
+)
+from posts.buffers import get_view_buffer
+from posts.search import search
+from posts.timeline import timeline_post_ids
+from posts.interactions import (
+    VIEWER_INTERACTIONS, annotate_viewer
+)
+from random import shuffle
+from collections.abc import Mapping
 
 
 # Albums APIs
-class AlbumsView(ModelViewSet):
+class AlbumsView(PrefetchMixin, StreamingListMixin, ValuesListMixin, ModelViewSet):
     serializer_class = PostsSerializers.AlbumsSerializer
     queryset = PostsModels.Albums.objects.all()
     permission_classes = [IsSelfOrReadOnly]
@@ -45,14 +60,14 @@ class AlbumsView(ModelViewSet):
 
     def get_queryset(self):
         request = self.request
-        if request.query_params:
+        if search_keys(request):
             return dynamic_search(request, PostsModels.Albums)
         return set_queryset(self, Users.Roles.USER, 'user', self.request.user.pk, PostsModels.Albums)
 
     @extend_schema(
         description="""
         Get request of users returns all of the Albums.
-        for search in them and all of fields (foreign, normal) can use queryparmas.
+        for search in them the searchable fields (foreign, normal) of the model can use queryparmas.
         """,
         parameters=[
             OpenApiParameter(
@@ -92,7 +107,7 @@ class AlbumsView(ModelViewSet):
 
 
 # SavePosts APIs
-class SavePostsView(GenericViewSet, ListModelMixin, RetrieveModelMixin, CreateModelMixin, DestroyModelMixin):
+class SavePostsView(PrefetchMixin, StreamingListMixin, ValuesListMixin, GenericViewSet, ListModelMixin, RetrieveModelMixin, CreateModelMixin, DestroyModelMixin):
     serializer_class = PostsSerializers.SavePostSerializer
     queryset = PostsModels.SavePosts.objects.all()
 
@@ -106,14 +121,14 @@ class SavePostsView(GenericViewSet, ListModelMixin, RetrieveModelMixin, CreateMo
 
     def get_queryset(self):
         request = self.request
-        if request.query_params:
+        if search_keys(request):
             return dynamic_search(request, PostsModels.SavePosts)
         return set_queryset(self, Users.Roles.USER, 'user', self.request.user.pk, PostsModels.SavePosts)
 
     @extend_schema(
         description="""
         Get request of users returns all of the SavePosts.
-        for search in them and all of fields (foreign, normal) can use queryparmas.
+        for search in them the searchable fields (foreign, normal) of the model can use queryparmas.
         """,
         parameters=[
             OpenApiParameter(
@@ -151,35 +166,40 @@ class SavePostsView(GenericViewSet, ListModelMixin, RetrieveModelMixin, CreateMo
                     status=Status.HTTP_400_BAD_REQUEST
                 )
 
-            # check post not to save in same album by the user
-            found = PostsModels.SavePosts.objects.filter(Q(
-                user=user, post=post, album=album
-            )).exists()
-            if found:
-                return Response(
-                    {"detail": f"This post({post}) has been saved by this user({user}) in this album({album})."},
-                    status=Status.HTTP_400_BAD_REQUEST
-                )
         else:
             return Response(
                 {"detail": "No Parameter."}, status=Status.HTTP_400_BAD_REQUEST
             )
 
-        return super().create(request, *args, **kwargs)
+        # the unique constraint rejects saving a post in same album by the user
+        try:
+            return super().create(request, *args, **kwargs)
+        except IntegrityError:
+            return Response(
+                {"detail": f"This post({post}) has been saved by this user({user}) in this album({album})."},
+                status=Status.HTTP_400_BAD_REQUEST
+            )
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
-        return super().perform_create(serializer)
+        with transaction.atomic():
+            serializer.save(user=self.request.user)
+            update_counter(PostsModels.SavePosts, serializer.instance.post_id)
+            return super().perform_create(serializer)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            super().perform_destroy(instance)
+            update_counter(PostsModels.SavePosts, instance.post_id, -1)
 
 
 # LikePost APIs
-class LikePostView(ListModelMixin, RetrieveModelMixin, CreateModelMixin, DestroyModelMixin, GenericViewSet):
+class LikePostView(PrefetchMixin, StreamingListMixin, ValuesListMixin, ListModelMixin, RetrieveModelMixin, CreateModelMixin, DestroyModelMixin, GenericViewSet):
     serializer_class = PostsSerializers.LikePostSerializer
     queryset = PostsModels.LikePost.objects.all()
 
     def get_queryset(self):
         request = self.request
-        if request.query_params:
+        if search_keys(request):
             return dynamic_search(request, PostsModels.LikePost)
         return set_queryset(self, Users.Roles.USER, 'user', self.request.user.pk, PostsModels.LikePost)
 
@@ -194,7 +214,7 @@ class LikePostView(ListModelMixin, RetrieveModelMixin, CreateModelMixin, Destroy
     @extend_schema(
         description="""
         Get request of users returns all of the LikePost.
-        for search in them and all of fields (foreign, normal) can use queryparmas.
+        for search in them the searchable fields (foreign, normal) of the model can use queryparmas.
         """,
         parameters=[
             OpenApiParameter(
@@ -212,36 +232,38 @@ class LikePostView(ListModelMixin, RetrieveModelMixin, CreateModelMixin, Destroy
         return super().list(request, *args, **kwargs)
 
     def create(self, request: Request, *args, **kwargs):
-        data = request.data
-        user = data.get('user')
-        post = data.get('post')
-
-        if user and post:
-            found_like = PostsModels.LikePost.objects.filter(Q(
-                user=user, post=post
-            ))
-
-            if found_like:
-                return Response(
-                    {"detail": f"This user({user}) have liked this ({post})."},
-                    status=Status.HTTP_400_BAD_REQUEST
-                )
+        user = request.user.pk
+        post = request.data.get('post')
 
-        return super().create(request, *args, **kwargs)
+        # the unique constraint rejects liking a post twice by the user
+        try:
+            return super().create(request, *args, **kwargs)
+        except IntegrityError:
+            return Response(
+                {"detail": f"This user({user}) have liked this ({post})."},
+                status=Status.HTTP_400_BAD_REQUEST
+            )
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
-        return super().perform_create(serializer)
+        with transaction.atomic():
+            serializer.save(user=self.request.user)
+            update_counter(PostsModels.LikePost, serializer.instance.post_id)
+            return super().perform_create(serializer)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            super().perform_destroy(instance)
+            update_counter(PostsModels.LikePost, instance.post_id, -1)
 
 
 # Comments APIs
-class CommentsView(ModelViewSet):
+class CommentsView(PrefetchMixin, StreamingListMixin, ValuesListMixin, ModelViewSet):
     serializer_class = PostsSerializers.CommentsSerializer
     queryset = PostsModels.Comments.objects.all()
 
     def get_queryset(self):
         request = self.request
-        if request.query_params:
+        if search_keys(request):
             return dynamic_search(request, PostsModels.Comments)
         return set_queryset(self, Users.Roles.USER, 'user', self.request.user.pk, PostsModels.Comments)
 
@@ -256,12 +278,9 @@ class CommentsView(ModelViewSet):
     @extend_schema(
         description="""
         Get request of users returns all of the Comments.
-        for search in them and all of fields (foreign, normal) can use queryparmas.
+        for search in them the searchable fields (foreign, normal) of the model can use queryparmas.
         """,
         parameters=[
-            OpenApiParameter(
-                name='comment', description="An example as normal field in search (?comment=abc)", required=False,
-            ),
             OpenApiParameter(
                 name='user-id', description="An example as foreign field in search (?user-id=1)", required=False,
             ),
@@ -288,13 +307,21 @@ class CommentsView(ModelViewSet):
         return Response(PostsSerializers.CommentsSerializer(instance).data, status=Status.HTTP_200_OK)
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
-        return super().perform_create(serializer)
+        with transaction.atomic():
+            serializer.save(user=self.request.user)
+            update_counter(PostsModels.Comments, serializer.instance.post_id)
+            return super().perform_create(serializer)
 
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            super().perform_destroy(instance)
+            update_counter(PostsModels.Comments, instance.post_id, -1)
 
-class ViewPostView(ListModelMixin, RetrieveModelMixin, CreateModelMixin, GenericViewSet):
+
+class ViewPostView(PrefetchMixin, StreamingListMixin, ListModelMixin, RetrieveModelMixin, CreateModelMixin, GenericViewSet):
     serializer_class = PostsSerializers.ViewPostSerializer
     queryset = PostsModels.ViewPost.objects.all()
+    pagination_class = KeysetPagination
 
     def get_permissions(self):
         request = self.request
@@ -306,21 +333,21 @@ class ViewPostView(ListModelMixin, RetrieveModelMixin, CreateModelMixin, Generic
 
     def get_queryset(self):
         request = self.request
-        if request.query_params:
+        if search_keys(request):
             return dynamic_search(request, PostsModels.ViewPost)
         return set_queryset(self, Users.Roles.USER, 'user', self.request.user.pk, PostsModels.ViewPost)
 
     @extend_schema(
         description="""
         Get request of users returns all of the ViewPost.
-        for search in them and all of fields (foreign, normal) can use queryparmas.
+        for search in them the searchable fields (foreign, normal) of the model can use queryparmas.
         """,
         parameters=[
             OpenApiParameter(
                 name='user-id', description="An example as foreign field in search (?user-id=1)", required=False,
             ),
             OpenApiParameter(
-                name='page', type=int, description="Page number to return.", required=False,
+                name='cursor', type=str, description="Cursor of the page to return.", required=False,
             ),
             OpenApiParameter(
                 name='limit', type=int, description="Number of items per page.", required=False,
@@ -335,17 +362,30 @@ class ViewPostView(ListModelMixin, RetrieveModelMixin, CreateModelMixin, Generic
         user = request.user.pk
         post = data.get('post')
 
-        if user and post:
-            found_view = PostsModels.ViewPost.objects.filter(
-                Q(user=user, post=post)
+        # write-behind mode, the view is queued and inserted by the next flush
+        view_buffer = get_view_buffer()
+        if view_buffer is not None and user and post:
+            try:
+                view_buffer.add(user, int(post))
+            except (TypeError, ValueError):
+                return Response(
+                    {"detail": "post must be an integer."},
+                    status=Status.HTTP_400_BAD_REQUEST
+                )
+            return Response(
+                {"detail": f"The view of this user({user}) on this ({post}) is queued."},
+                status=Status.HTTP_202_ACCEPTED
             )
-            if found_view:
+
+        if user and post:
+            # the unique constraint rejects the second view of a post by the user
+            try:
+                return super().create(request, *args, **kwargs)
+            except IntegrityError:
                 return Response(
                     {"detail": f"This user({user}) have seen this ({post})."},
                     status=Status.HTTP_200_OK
                 )
-            else:
-                return super().create(request, *args, **kwargs)
         else:
             return Response(
                 {"detail": "user and post are required."},
@@ -353,8 +393,10 @@ class ViewPostView(ListModelMixin, RetrieveModelMixin, CreateModelMixin, Generic
             )
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
-        return super().perform_create(serializer)
+        with transaction.atomic():
+            serializer.save(user=self.request.user)
+            update_counter(PostsModels.ViewPost, serializer.instance.post_id)
+            return super().perform_create(serializer)
 
 
 @extend_schema(
@@ -368,7 +410,7 @@ class ViewPostView(ListModelMixin, RetrieveModelMixin, CreateModelMixin, Generic
     ],
     responses=PostsSerializer(many=True)
 )
-class LikedPosts(ListModelMixin, RetrieveModelMixin, GenericViewSet):
+class LikedPosts(PrefetchMixin, StreamingListMixin, ValuesListMixin, ListModelMixin, RetrieveModelMixin, GenericViewSet):
     """
     API endpoint that returns a paginated list of posts liked by the current user.
 
@@ -404,7 +446,7 @@ class LikedPosts(ListModelMixin, RetrieveModelMixin, GenericViewSet):
     ],
     responses=PostsSerializer(many=True)
 )
-class CommentedPosts(GenericViewSet, ListModelMixin, RetrieveModelMixin):
+class CommentedPosts(PrefetchMixin, StreamingListMixin, ValuesListMixin, GenericViewSet, ListModelMixin, RetrieveModelMixin):
     serializer_class = PostsSerializer
     permission_classes = [IsUser]
 
@@ -433,7 +475,7 @@ class CommentedPosts(GenericViewSet, ListModelMixin, RetrieveModelMixin):
     ],
     responses=PostsSerializer(many=True)
 )
-class VisitedPosts(ListModelMixin, RetrieveModelMixin, GenericViewSet):
+class VisitedPosts(PrefetchMixin, StreamingListMixin, ValuesListMixin, ListModelMixin, RetrieveModelMixin, GenericViewSet):
     permission_classes = [IsUser]
     serializer_class = PostsSerializer
 
@@ -460,7 +502,7 @@ class VisitedPosts(ListModelMixin, RetrieveModelMixin, GenericViewSet):
     ],
     responses=PostsSerializer(many=True)
 )
-class SavedPosts(ListModelMixin, RetrieveModelMixin, GenericViewSet):
+class SavedPosts(PrefetchMixin, StreamingListMixin, ValuesListMixin, ListModelMixin, RetrieveModelMixin, GenericViewSet):
     serializer_class = PostsSerializer
     permission_classes = [IsUser]
 
@@ -475,36 +517,63 @@ class SavedPosts(ListModelMixin, RetrieveModelMixin, GenericViewSet):
 
 
 # album with posts are saved in it
-class AlbumWithPosts(ListModelMixin, RetrieveModelMixin, GenericViewSet):
+class AlbumWithPosts(PrefetchMixin, ListModelMixin, RetrieveModelMixin, GenericViewSet):
     serializer_class = PostsSerializers.AlbumWithPostSerializer
     permission_classes = [IsUser]
+    # the number of newest posts of every album in list
+    preview_size = 5
+    max_preview_size = 20
 
     def get_queryset(self):
         # set queryset as album are created by auth user
         request = self.request
-        return PostsModels.Albums.objects.filter(Q(user=request.user.pk))
+        return PostsModels.Albums.objects.filter(Q(user=request.user.pk)).select_related('user')
 
-    def get_serializer(self, *args, **kwargs):
-        # This allows passing a tuple (album, posts) directly to the serializer.
-        return self.serializer_class(*args, **kwargs)
+    def saves_queryset(self):
+        # saved posts with everything that PostsSerializer needs
+        select, prefetch = related_paths(PostsSerializer)
+        return PostsModels.SavePosts.objects.select_related(
+            'post', *[f"post__{path}" for path in select]
+        ).prefetch_related(*[f"post__{path}" for path in prefetch])
+
+    def get_preview_size(self, request: Request):
+        try:
+            preview = int(request.query_params.get('preview', self.preview_size))
+        except ValueError:
+            raise ValidationError({"detail": "preview must be an integer."})
+        return min(max(preview, 0), self.max_preview_size)
 
     @extend_schema(
-        description="Returns One album with posts are saved in it by authenticated user.",
+        description="Returns One album with posts are saved in it by authenticated user. posts are paginated by cursor.",
+        parameters=[
+            OpenApiParameter(
+                name='cursor', type=str, description="Cursor of the page to return.", required=False,
+            ),
+            OpenApiParameter(
+                name='limit', type=int, description="Number of items per page.", required=False,
+            ),
+        ],
+        responses=PostsSerializers.AlbumWithPostsPageSerializer
     )
     def retrieve(self, request, *args, **kwargs):
         album = self.get_object()  # fetch the album instance
-        posts = Posts.objects.filter(
-            Q(id__in=PostsModels.SavePosts.objects.filter(
-                Q(album=album)).values_list('post', flat=True)
-              )
-        )  # fetch related posts
-        return Response(
-            self.serializer_class((album, posts)).data,
-            status=Status.HTTP_200_OK
+
+        # page the saved posts of the album by (created_at, id) of SavePosts
+        paginator = KeysetPagination()
+        saves = paginator.paginate_queryset(
+            self.saves_queryset().filter(Q(album=album)), request, view=self
         )
 
+        data = self.get_serializer((album, [save.post for save in saves])).data
+        data['next'] = paginator.get_next_link()
+        data['previous'] = paginator.get_previous_link()
+        return Response(data, status=Status.HTTP_200_OK)
+
     @extend_schema(
-        description="Returns One album with posts are saved in it by authenticated user.",
+        description="""
+        Returns albums of authenticated user with the newest saved posts of every album and count of its posts.
+        all of albums and previews are fetched by one batch.
+        """,
         parameters=[
             OpenApiParameter(
                 name='page', type=int, description="Page number to return.", required=False,
@@ -512,28 +581,42 @@ class AlbumWithPosts(ListModelMixin, RetrieveModelMixin, GenericViewSet):
             OpenApiParameter(
                 name='limit', type=int, description="Number of items per page.", required=False,
             ),
+            OpenApiParameter(
+                name='preview', type=int, description="Number of posts of every album (default 5).", required=False,
+            ),
         ],
-        responses=PostsSerializer(many=True)
+        responses=PostsSerializers.AlbumWithPostSerializer(many=True)
     )
     def list(self, request, *args, **kwargs):
-        albums = self.get_queryset()  # get album queryset
-        data = []  # initialize list to hold serialized results
-
-        for album in albums:
-            # Get all posts linked to this album via SavePosts relation
-            posts = Posts.objects.filter(
-                Q(id__in=PostsModels.SavePosts.objects.filter(
-                    Q(album=album)).values_list('post', flat=True))
-            )
-            # Serialize the album and posts as a tuple and append to data
-            data.append(self.serializer_class((album, posts)).data)
+        preview = self.get_preview_size(request)
+
+        # count of posts and the newest posts of every album in a batch
+        albums = self.get_queryset().annotate(
+            posts_count=Count('saved_in_album')
+        ).prefetch_related(Prefetch(
+            'saved_in_album',
+            queryset=self.saves_queryset().order_by('-created_at', '-id')[:preview],
+            to_attr='preview_saves'
+        )).order_by('-id')
+
+        page = self.paginate_queryset(albums)
+        data = [
+            self.get_serializer((album, [save.post for save in album.preview_saves])).data
+            for album in (page if page is not None else albums)
+        ]
 
+        if page is not None:
+            return self.get_paginated_response(data)
         return Response(data, status=Status.HTTP_200_OK)
 
 
 # home view
 @extend_schema(
-    description="Returns random posts that are uploaded by users are followed by auth user.",
+    description="""
+    Returns the newest posts that are uploaded by users are followed by auth user.
+    the posts are read from the materialized timeline of auth user and with shuffle=true
+    the posts are shuffled only inside the returned page.
+    """,
     parameters=[
         OpenApiParameter(
             name='page', type=int, description="Page number to return.", required=False,
@@ -541,25 +624,37 @@ class AlbumWithPosts(ListModelMixin, RetrieveModelMixin, GenericViewSet):
         OpenApiParameter(
             name='limit', type=int, description="Number of items per page.", required=False,
         ),
+        OpenApiParameter(
+            name='shuffle', type=bool, description="Shuffle posts inside the page.", required=False,
+        ),
     ],
     responses=PostsSerializer(many=True)
 )
-class RandomPostsFollowingUser(ListModelMixin, GenericViewSet):
+class RandomPostsFollowingUser(PrefetchMixin, ValuesListMixin, ListModelMixin, GenericViewSet):
     serializer_class = PostsSerializer
     permission_classes = [IsUser]
 
     def get_queryset(self):
         request = self.request
 
-        following_users = Users.objects.filter(
-            Q(id__in=Follow.objects.filter(
-                Q(follower_user=request.user.pk)
-            ).values_list('followed_user', flat=True))
-        )
+        posts = Posts.objects.filter(
+            Q(id__in=timeline_post_ids(request.user.pk))
+        ).order_by('-id')
+        return annotate_viewer(posts, request.user)
 
-        return Posts.objects.filter(
-            Q(user__id__in=following_users)
-        ).order_by('?')
+    def list(self, request: Request, *args, **kwargs):
+        if request.query_params.get('shuffle', '').lower() not in ['true', '1']:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        posts = list(page if page is not None else queryset)
+        shuffle(posts)
+
+        serializer = self.get_serializer(posts, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
 
 
 @extend_schema(
@@ -574,9 +669,13 @@ class RandomPostsFollowingUser(ListModelMixin, GenericViewSet):
         OpenApiParameter(
             name='day', type=int, description="How many days before now.", required=True,
         ),
+        OpenApiParameter(
+            name='seed', type=int, description="Seed of random order, keep it to get next pages in same order.",
+            required=False,
+        ),
     ],
 )
-class RandomPosts(ListModelMixin, GenericViewSet):
+class RandomPosts(PrefetchMixin, ListModelMixin, GenericViewSet):
     serializer_class = PostsSerializer
     queryset = Posts.objects.all()
 
@@ -595,6 +694,176 @@ class RandomPosts(ListModelMixin, GenericViewSet):
             raise ValidationError({"detail": "day must be an integer."})
 
         # calculate the date days before now and return posts
-        time_before_now = timezone.now() - timedelta(days=day)
+        time_before_now = timezone.localdate() - timedelta(days=day)
+
+        posts = Posts.objects.filter(created_at__gte=time_before_now)
+        return annotate_viewer(posts, request.user)
+
+    def list(self, request: Request, *args, **kwargs):
+        return sample_list(request, self)
+
+
+@extend_schema(
+    description="""
+    Full-text search in posts (title, text and captions) or comments, ordered by rank.
+    """,
+    parameters=[
+        OpenApiParameter(
+            name='q', type=str, description="The words to search.", required=True,
+        ),
+        OpenApiParameter(
+            name='type', type=str, enum=['posts', 'comments'], description="What to search (default posts).",
+            required=False,
+        ),
+        OpenApiParameter(
+            name='page', type=int, description="Page number to return.", required=False,
+        ),
+        OpenApiParameter(
+            name='limit', type=int, description="Number of items per page.", required=False,
+        ),
+    ],
+    responses=PostsSerializer(many=True)
+)
+class SearchView(PrefetchMixin, ListModelMixin, GenericViewSet):
+    search_types = {
+        'posts': (Posts, PostsSerializer),
+        'comments': (PostsModels.Comments, PostsSerializers.CommentsSerializer),
+    }
+
+    def get_search_type(self):
+        search_type = self.request.query_params.get('type', 'posts')
+        if search_type not in self.search_types:
+            raise ValidationError({"detail": f"type must be one of {list(self.search_types)}."})
+        return search_type
+
+    def get_serializer_class(self):
+        return self.search_types[self.get_search_type()][1]
+
+    def get_queryset(self):
+        return self.search_types[self.get_search_type()][0].objects.all()
+
+    def list(self, request: Request, *args, **kwargs):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({"detail": "q parameter not found."})
+
+        results = search(self.get_search_type(), query, self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(results)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(results, many=True)
+        return Response(serializer.data, status=Status.HTTP_200_OK)
+
+
+# Bulk APIs
+def bulk_posts(request: Request):
+    """
+    returns the ids of posts of a bulk request, the body must be an object like {"posts": [1, 2, 3]}.
+    """
+    if not isinstance(request.data, Mapping):
+        raise ValidationError({"detail": 'body must be an object like {"posts": [1, 2, 3]}.'})
+    return bulk_ids(request.data.get('posts'), 'posts')
+
+
+def bulk_results(posts, new_pairs, missing_pairs, queued=False):
+    # the result of every post of a bulk request in the order of the request
+    created = {post for _, post in new_pairs}
+    missing = {post for _, post in missing_pairs}
+    results = []
+    for post in posts:
+        if queued:
+            result = 'queued'
+        elif post in missing:
+            result = 'not_found'
+        elif post in created:
+            result = 'created'
+        else:
+            result = 'exists'
+        results.append({'post': post, 'result': result})
+    return results
+
 
-        return Posts.objects.filter(created_at__gte=time_before_now).order_by('?')
+@extend_schema(
+    description="""
+    Like many posts in one request, body is {"posts": [1, 2, 3]}.
+    returns the result of every post: created, exists (liked before) or not_found.
+    """,
+    request=None, responses=None
+)
+class BulkLikePosts(GenericViewSet):
+    permission_classes = [IsUser]
+
+    def create(self, request: Request, *args, **kwargs):
+        user = request.user.pk
+        posts = bulk_posts(request)
+
+        new_pairs, missing = bulk_insert(PostsModels.LikePost, [(user, post) for post in posts])
+        return Response(
+            {"results": bulk_results(posts, new_pairs, missing)}, status=Status.HTTP_200_OK
+        )
+
+
+@extend_schema(
+    description="""
+    Record the views of many posts (impressions of a feed page) in one request, body is {"posts": [1, 2, 3]}.
+    returns the result of every post: created, exists (seen before), not_found or queued in write-behind mode.
+    """,
+    request=None, responses=None
+)
+class BulkViewPosts(GenericViewSet):
+    permission_classes = [IsUser]
+
+    def create(self, request: Request, *args, **kwargs):
+        user = request.user.pk
+        posts = bulk_posts(request)
+
+        # write-behind mode, the views are queued and inserted by the next flush
+        view_buffer = get_view_buffer()
+        if view_buffer is not None:
+            for post in posts:
+                view_buffer.add(user, post)
+            return Response(
+                {"results": bulk_results(posts, [], [], queued=True)}, status=Status.HTTP_202_ACCEPTED
+            )
+
+        new_pairs, missing = bulk_insert(PostsModels.ViewPost, [(user, post) for post in posts])
+        return Response(
+            {"results": bulk_results(posts, new_pairs, missing)}, status=Status.HTTP_200_OK
+        )
+
+
+@extend_schema(
+    description="""
+    Returns which of the posts are liked, saved and viewed by the authenticated user.
+    """,
+    parameters=[
+        OpenApiParameter(
+            name='posts', type=str, description="Comma separated ids of posts (?posts=1,2,3).", required=True,
+        ),
+    ],
+    responses=None
+)
+class PostsInteractions(GenericViewSet):
+    permission_classes = [IsUser]
+    interactions = VIEWER_INTERACTIONS
+
+    def list(self, request: Request, *args, **kwargs):
+        user = request.user.pk
+        posts = bulk_ids(request.query_params.get('posts'), 'posts')
+
+        # one IN lookup for every interaction
+        found = {
+            name: set(model.objects.filter(
+                Q(user=user) & Q(post__in=posts)
+            ).values_list('post', flat=True))
+            for name, model in self.interactions.items()
+        }
+        return Response({
+            "results": [
+                {'post': post, **{name: post in found[name] for name in self.interactions}}
+                for post in posts
+            ]
+        }, status=Status.HTTP_200_OK)
@@ -0,0 +1,178 @@
+import atexit
+import logging
+import threading
+from time import monotonic
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from core.models import Users
+from users.models import Logins
+from users.rollups import count_logins
+
+
+logger = logging.getLogger(__name__)
+
+SYNC = 'sync'
+DEFERRED = 'deferred'
+
+DEFAULTS = {
+    # sync inserts the login on the request path, deferred queues it for a background flush
+    'MODE': SYNC,
+    # flush when this number of logins are waiting
+    'MAX_SIZE': 200,
+    # flush when the oldest waiting login is older than this seconds
+    'FLUSH_INTERVAL': 1.0,
+    # the oldest logins are dropped when more than this number are waiting (the database is down)
+    'MAX_PENDING': 10000,
+}
+
+
+def audit_settings():
+    return {**DEFAULTS, **getattr(settings, 'LOGIN_AUDIT', {})}
+
+
+def mark_login(request, username, user):
+    """
+    keep the username and the authenticated user of a login attempt on the request,
+    users.middlewares.LogLoginMiddleware logs them without decoding the body or querying the user.
+    """
+    http_request = getattr(request, '_request', request)
+    http_request.login_attempt = (username, getattr(user, 'pk', None))
+
+
+def insert_logins(events):
+    """
+    insert (user_id, username, status, created_at) events by one bulk_create and count them in the
+    rollups, the users of failed attempts are resolved by their usernames in one query.
+    """
+    usernames = {username for user_id, username, _, _ in events if user_id is None and username}
+    user_ids = dict(
+        Users.objects.filter(username__in=usernames).values_list('username', 'id')
+    ) if usernames else {}
+
+    events = [
+        (user_id or user_ids.get(username), username, status, created_at)
+        for user_id, username, status, created_at in events
+    ]
+    with transaction.atomic():
+        Logins.objects.bulk_create([
+            Logins(user_id=user_id, username=username, status=status, created_at=created_at)
+            for user_id, username, status, created_at in events
+        ])
+        # the counts of the login analytics are updated with the logs
+        count_logins(events)
+    return len(events)
+
+
+class LoginAudit:
+    """
+    An in-process queue of login logs, a daemon thread inserts them in batches
+    when MAX_SIZE logins are waiting or FLUSH_INTERVAL is passed.
+    failed flushes keep their logins, but no more than MAX_PENDING are kept and the oldest are dropped.
+    """
+
+    def __init__(self, max_size, flush_interval, max_pending):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending = []
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stats = {
+            'depth': 0, 'flushes': 0, 'flushed_rows': 0, 'failed_flushes': 0, 'dropped': 0,
+            'last_flush_seconds': 0.0, 'max_flush_seconds': 0.0,
+        }
+
+        self.worker = threading.Thread(target=self._run, name='login-audit', daemon=True)
+        self.worker.start()
+
+    def add(self, event):
+        with self.lock:
+            self.pending.append(event)
+            self._trim()
+            full = len(self.pending) >= self.max_size
+
+        if full:
+            self.wake.set()
+
+    def _trim(self):
+        dropped = len(self.pending) - self.max_pending
+        if dropped > 0:
+            del self.pending[:dropped]
+            self.stats['dropped'] += dropped
+        self.stats['depth'] = len(self.pending)
+
+    def _run(self):
+        while True:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            try:
+                self.flush()
+            finally:
+                connection.close()
+
+    def flush(self):
+        """
+        insert the waiting logins, they are kept for the next flush if the insert fails.
+        """
+        with self.flush_lock:
+            with self.lock:
+                if not self.pending:
+                    return 0
+                events = self.pending
+                self.pending = []
+                self.stats['depth'] = 0
+
+            started = monotonic()
+            try:
+                inserted = insert_logins(events)
+            except Exception:
+                logger.exception(
+                    "flushing %s logins failed, %s logins are dropped so far", len(events), self.stats['dropped']
+                )
+                with self.lock:
+                    self.stats['failed_flushes'] += 1
+                    self.pending[:0] = events
+                    self._trim()
+                return 0
+
+            elapsed = monotonic() - started
+            self.stats['flushes'] += 1
+            self.stats['flushed_rows'] += inserted
+            self.stats['last_flush_seconds'] = elapsed
+            self.stats['max_flush_seconds'] = max(self.stats['max_flush_seconds'], elapsed)
+            logger.info(
+                "flushed %s logins in %.1f ms, queue depth %s", inserted, elapsed * 1000, self.stats['depth']
+            )
+            return inserted
+
+
+_audit = None
+_audit_lock = threading.Lock()
+
+
+def get_login_audit():
+    """
+    returns the login queue of this process or None when logins are inserted synchronously.
+    """
+    global _audit
+    config = audit_settings()
+    if config['MODE'] != DEFERRED:
+        return None
+
+    if _audit is None:
+        with _audit_lock:
+            if _audit is None:
+                _audit = LoginAudit(config['MAX_SIZE'], config['FLUSH_INTERVAL'], config['MAX_PENDING'])
+                atexit.register(_audit.flush)
+    return _audit
+
+
+def log_login(user_id, username, status):
+    event = (user_id, username, status, timezone.now())
+    audit = get_login_audit()
+    if audit is None:
+        insert_logins([event])
+    else:
+        audit.add(event)
@@ -0,0 +1,92 @@
+import threading
+from time import perf_counter, process_time
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+from django.test import Client
+from django.test.utils import override_settings
+from core import models as CoreModels
+from users import models as UsersModels
+from users.shield import shield_settings
+from colorama import Fore, Style
+
+
+USERNAME = 'bench-login-shield'
+
+
+class Command(BaseCommand):
+    help = "Compare the CPU time of login attempts that hash the password with attempts that are rejected by the login shield."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--attempts', type=int, default=40, help="Number of failed attempts that are sent in every mode."
+        )
+        parser.add_argument(
+            '--threads', type=int, default=8, help="Number of threads that send the attempts."
+        )
+
+    def setup(self):
+        user, _ = CoreModels.Users.objects.get_or_create(
+            username=USERNAME,
+            defaults={'first_name': 'bench', 'last_name': 'bench', 'phone': '0', 'email': None},
+        )
+        user.set_password('bench-login-shield')
+        user.save()
+        return user
+
+    def attack(self, attempts, threads, ip):
+        """
+        send attempts with a wrong password from threads and returns (statuses, wall seconds, cpu seconds).
+        """
+        statuses = []
+        lock = threading.Lock()
+
+        def worker(count):
+            client = Client(REMOTE_ADDR=ip)
+            try:
+                for _ in range(count):
+                    response = client.post(
+                        '/users/token/', {'username': USERNAME, 'password': 'wrong'},
+                        content_type='application/json'
+                    )
+                    with lock:
+                        statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        counts = [attempts // threads + (1 if i < attempts % threads else 0) for i in range(threads)]
+        workers = [threading.Thread(target=worker, args=(count,)) for count in counts if count]
+        started, cpu_started = perf_counter(), process_time()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return statuses, perf_counter() - started, process_time() - cpu_started
+
+    def report(self, name, statuses, wall, cpu):
+        found = ', '.join(f"{status}: {statuses.count(status)}" for status in sorted(set(statuses)))
+        print(
+            f"{name:<20} {cpu * 1000 / len(statuses):>9.2f} ms CPU per attempt   "
+            f"{len(statuses) / wall:>9.1f} attempts/s   ({found})"
+        )
+
+    def handle(self, *args, **options):
+        attempts, threads = options['attempts'], options['threads']
+        config = shield_settings()
+        self.setup()
+        print(f"{Fore.CYAN}Attempts: {attempts}, threads: {threads}{Style.RESET_ALL}")
+
+        # logs are inserted on the request path so they are deleted at the end
+        with override_settings(LOGIN_AUDIT={'MODE': 'sync'}):
+            with override_settings(LOGIN_SHIELD={**config, 'ENABLED': False}):
+                self.report("password check", *self.attack(attempts, threads, '198.51.100.1'))
+
+            with override_settings(LOGIN_SHIELD={**config, 'ENABLED': True}):
+                # fail until the username is blocked, these attempts still hash the password
+                self.attack(config['MAX_USERNAME_FAILURES'], 1, '198.51.100.2')
+                statuses, wall, cpu = self.attack(attempts, threads, '198.51.100.3')
+                self.report("rejected by shield", statuses, wall, cpu)
+
+        UsersModels.Logins.objects.filter(Q(username=USERNAME)).delete()
+        if statuses.count(429) != len(statuses):
+            print(f"{Fore.RED}some attempts were not rejected by the shield{Style.RESET_ALL}")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from users import retention
+from colorama import Fore, Style
+
+
+class Command(BaseCommand):
+    help = "Convert the Logins table to monthly range partitions of created_at and create the partitions of the next months."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead', type=int, default=retention.retention_settings()['MONTHS_AHEAD'],
+            help="Number of partitions that are created after the current month."
+        )
+
+    def handle(self, *args, **options):
+        if not retention.use_postgres():
+            print(f"{Fore.CYAN}Partitioning needs PostgreSQL, Logins is not changed.{Style.RESET_ALL}")
+            return
+
+        converting = not retention.is_partitioned()
+        print("Partitioning Logins ... " if converting else "Creating partitions ... ", end='', flush=True)
+        created = retention.partition_logins(options['months_ahead'])
+        print(f"{Fore.GREEN}OK{Style.RESET_ALL} ({len(created)} partitions created)")
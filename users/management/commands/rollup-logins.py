@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from users import retention
+from colorama import Fore, Style
+
+
+class Command(BaseCommand):
+    help = "Roll the Logins that are older than the retention into daily counts and drop them."
+
+    def add_arguments(self, parser):
+        config = retention.retention_settings()
+        parser.add_argument(
+            '--days', type=int, default=config['RAW_DAYS'], help="Days that raw logins are kept."
+        )
+        parser.add_argument(
+            '--months-ahead', type=int, default=config['MONTHS_AHEAD'],
+            help="Number of partitions that are created after the current month."
+        )
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help="Recompute the daily and hourly counts from the raw logins before the rollup."
+        )
+
+    def handle(self, *args, **options):
+        # the job runs daily so the partitions of the next months always exist
+        if retention.is_partitioned():
+            print("Creating partitions ... ", end='', flush=True)
+            created = retention.partition_logins(options['months_ahead'])
+            print(f"{Fore.GREEN}OK{Style.RESET_ALL} ({len(created)} partitions created)")
+
+        if options['rebuild']:
+            print("Rebuilding counts ... ", end='', flush=True)
+            counted = retention.rebuild_rollups()
+            print(f"{Fore.GREEN}OK{Style.RESET_ALL} ({counted} counts)")
+
+        print("Rolling up Logins ... ", end='', flush=True)
+        dropped, deleted, counted = retention.apply_retention(options['days'])
+        print(
+            f"{Fore.GREEN}OK{Style.RESET_ALL} "
+            f"({len(dropped)} partitions dropped, {deleted} rows deleted, {counted} daily counts)"
+        )
@@ -1,39 +1,15 @@
-from core.models import Users
 from users.models import Logins
+from users.audit import log_login
+from users.shield import add_login_failure
 import json
+from django.http.request import RawPostDataException
 from django.utils.deprecation import MiddlewareMixin
-from io import BytesIO
 
 
 TOKEN_USER = '/users/token/'
 
 
 class LogLoginMiddleware(MiddlewareMixin):
-    def process_request(self, request):
-        """
-        This method runs before the view is executed.
-        It reads the POST body for the /users/token/ endpoint,
-        extracts the username, and saves it on the request object
-        for later use in process_response.
-        """
-        if request.path == TOKEN_USER and request.method == 'POST':
-            # Read the raw body of the request
-            body_bytes = request.body.strip()
-
-            # Decode JSON and extract username
-            username = None
-            try:
-                data = json.loads(body_bytes.decode('utf-8'))
-                username = data.get('username')
-            except json.JSONDecodeError:
-                pass
-
-            # Save username in the request for later use
-            request._login_username = username
-
-            # Reset the request stream so the view can read it again
-            request._stream = BytesIO(body_bytes)
-
     def process_response(self, request, response):
         """
         This method runs after the view has processed the request.
@@ -42,18 +18,29 @@ class LogLoginMiddleware(MiddlewareMixin):
         otherwise as FAIL.
         """
         if request.path == TOKEN_USER and request.method == 'POST':
-            # Get the username saved in process_request
-            username = getattr(request, '_login_username', None)
-
-            # Try to get the user object, if it exists
-            user = Users.objects.filter(username=username).first()
+            # username and user of the attempt are kept on the request by the token view
+            username, user_id = getattr(request, 'login_attempt', None) or (self.read_username(request), None)
 
             # Determine login status based on response status code
             status_code = response.status_code
             status = Logins.Status.SUCCESS if status_code == 200 else Logins.Status.FAIL
 
-            # Create a login log entry
-            Logins.objects.create(user=user, status=status, username=username)
+            # the user of a failed attempt is resolved by its username when the log is inserted
+            log_login(user_id, username, status)
+
+            # wrong credentials feed the sliding window of users.shield
+            if status_code == 401:
+                add_login_failure(request, username)
 
         # Return the original response
         return response
+
+    def read_username(self, request):
+        """
+        read the username from the body of a request that is rejected before the token view.
+        """
+        try:
+            data = json.loads(request.body.decode('utf-8'))
+        except (RawPostDataException, UnicodeDecodeError, json.JSONDecodeError):
+            return None
+        return data.get('username') if isinstance(data, dict) else None
@@ -1,4 +1,7 @@
 from django.db import models
+from django.utils import timezone
+from django.contrib.postgres.indexes import OpClass
+from django.db.models.functions import Upper
 from core.models import Users
 from rest_framework.exceptions import ValidationError
 
@@ -19,8 +22,21 @@ class Follow(models.Model):
         verbose_name='created_at', auto_now_add=True
     )
 
+    # query params of dynamic_search, every field is backed by an index
+    search_fields = ('id', 'follower_user-id', 'followed_user-id')
+
     class Meta:
         db_table = 'Follow'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['follower_user', 'followed_user'], name='unique_follow_follower_followed'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['followed_user', 'follower_user'], name='follow_followed_follower_idx'
+            )
+        ]
 
     def __str__(self):
         return "%s -> %s" % (self.follower_user, self.followed_user)
@@ -41,23 +57,118 @@ class Logins(models.Model):
         SUCCESS = 'SUCCESS', 'success'
         FAIL = 'FAIL', 'fail'
 
+    # lookups by user are served by logins_user_created_idx
     user = models.ForeignKey(
         to=Users, on_delete=models.DO_NOTHING, null=True, blank=True, verbose_name='user',
-        related_name='user_logins'
+        related_name='user_logins', db_index=False
     )
     status = models.CharField(
         verbose_name='status', null=False, blank=False, choices=Status.choices, default=Status.SUCCESS,
         max_length=150
     )
+    # set by the audit sink when the login happens, it may be inserted later (users.audit).
+    # it is the key of the monthly partitions of the table on postgres (users.retention)
     created_at = models.DateTimeField(
-        verbose_name='created_at', auto_now_add=True
+        verbose_name='created_at', default=timezone.now, editable=False
     )
     username = models.CharField(
         verbose_name='username', null=True, blank=True, max_length=150
     )
 
+    # query params of dynamic_search, every field is backed by an index
+    search_fields = ('id', 'user-id', 'username')
+
     class Meta:
         db_table = 'Logins'
+        indexes = [
+            models.Index(
+                fields=['created_at', 'id'], name='logins_created_id_idx'
+            ),
+            models.Index(
+                OpClass(Upper('username'), name='text_pattern_ops'), name='logins_username_upper_idx'
+            ),
+            models.Index(
+                fields=['user', 'created_at'], name='logins_user_created_idx'
+            ),
+            models.Index(
+                fields=['username', 'created_at'], name='logins_username_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return "%s -> %s => %s" % (self.user.username or self.username, self.created_at, self.Status)
+
+
+class LoginsDaily(models.Model):
+    """
+    The model that keeps the number of logins of every username in a day,
+    it is counted when logins are inserted and raw logins are rolled into it before they are dropped
+    """
+    day = models.DateField(
+        verbose_name='day', null=False, blank=False
+    )
+    user = models.ForeignKey(
+        to=Users, on_delete=models.DO_NOTHING, null=True, blank=True, verbose_name='user',
+        related_name='user_daily_logins', db_index=False
+    )
+    # empty when the attempt had no username
+    username = models.CharField(
+        verbose_name='username', null=False, blank=True, default='', max_length=150
+    )
+    status = models.CharField(
+        verbose_name='status', null=False, blank=False, choices=Logins.Status.choices, max_length=150
+    )
+    count = models.PositiveIntegerField(
+        verbose_name='count', default=0
+    )
+
+    class Meta:
+        db_table = 'LoginsDaily'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'username', 'status'], name='unique_logins_daily_day_username_status'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'day'], name='logins_daily_user_day_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return "%s -> %s => %s: %s" % (self.username, self.day, self.status, self.count)
+
+
+class LoginsHourly(models.Model):
+    """
+    The model that keeps the number of logins of every username in an hour,
+    it is counted when logins are inserted and kept as long as raw logins
+    """
+    hour = models.DateTimeField(
+        verbose_name='hour', null=False, blank=False
+    )
+    user = models.ForeignKey(
+        to=Users, on_delete=models.DO_NOTHING, null=True, blank=True, verbose_name='user',
+        related_name='user_hourly_logins', db_index=False
+    )
+    # empty when the attempt had no username
+    username = models.CharField(
+        verbose_name='username', null=False, blank=True, default='', max_length=150
+    )
+    status = models.CharField(
+        verbose_name='status', null=False, blank=False, choices=Logins.Status.choices, max_length=150
+    )
+    count = models.PositiveIntegerField(
+        verbose_name='count', default=0
+    )
+
+    class Meta:
+        db_table = 'LoginsHourly'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['hour', 'username', 'status'], name='unique_logins_hourly_hour_username_status'
+            )
+        ]
+
+    def __str__(self):
+        return "%s -> %s => %s: %s" % (self.username, self.hour, self.status, self.count)
@@ -0,0 +1,214 @@
+import re
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from core.models import Users
+from users.models import Logins, LoginsDaily, LoginsHourly
+from users.rollups import PERIODS, rebuild_counts
+
+
+DEFAULTS = {
+    # days that raw logins and hourly counts are kept before they are rolled into daily counts and dropped
+    'RAW_DAYS': 90,
+    # number of monthly partitions that are created ahead of the current month
+    'MONTHS_AHEAD': 3,
+}
+
+TABLE = Logins._meta.db_table
+PARTITION_NAME = re.compile(rf'^{TABLE}_(\d{{4}})_(\d{{2}})$')
+
+
+def retention_settings():
+    return {**DEFAULTS, **getattr(settings, 'LOGINS_RETENTION', {})}
+
+
+def use_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def qn(name):
+    return connection.ops.quote_name(name)
+
+
+# months
+def month_start(value):
+    return timezone.localtime(value).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(month):
+    if month.month == 12:
+        return month.replace(year=month.year + 1, month=1)
+    return month.replace(month=month.month + 1)
+
+
+def day_start(value):
+    return timezone.localtime(value).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+# partitions
+def partition_name(month):
+    return f"{TABLE}_{month:%Y_%m}"
+
+
+def is_partitioned():
+    if not use_postgres():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [qn(TABLE)]
+        )
+        return cursor.fetchone() is not None
+
+
+def partitions():
+    """
+    returns {month: name} of the monthly partitions of the logins table.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)", [qn(TABLE)]
+        )
+        names = [name for name, in cursor.fetchall()]
+
+    found = {}
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            month = month_start(timezone.now()).replace(year=int(match[1]), month=int(match[2]))
+            found[month] = name
+    return found
+
+
+def create_partitions(first_month, months_ahead):
+    """
+    create the missing monthly partitions from first_month to months_ahead after the current month.
+    """
+    last = month_start(timezone.now())
+    for _ in range(months_ahead):
+        last = next_month(last)
+
+    existing = partitions()
+    created = []
+    month = first_month
+    while month <= last:
+        if month not in existing:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE TABLE {qn(partition_name(month))} PARTITION OF {qn(TABLE)} "
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+                )
+            created.append(partition_name(month))
+        month = next_month(month)
+    return created
+
+
+def partition_logins(months_ahead):
+    """
+    convert the logins table to a table that is partitioned by month of created_at, rows are
+    copied into the partitions and the indexes of the model are created on the new table.
+    a table that is already partitioned only gets its missing partitions.
+    """
+    if is_partitioned():
+        first = min(partitions(), default=month_start(timezone.now()))
+        return create_partitions(first, months_ahead)
+
+    old = f"{TABLE}_unpartitioned"
+    sequence = f"{TABLE}_id_seq"
+    with connection.schema_editor() as editor:
+        editor.execute(f"LOCK TABLE {qn(TABLE)} IN ACCESS EXCLUSIVE MODE")
+        editor.execute(f"ALTER TABLE {qn(TABLE)} RENAME TO {qn(old)}")
+        editor.execute(f"CREATE TABLE {qn(TABLE)} (LIKE {qn(old)}) PARTITION BY RANGE ({qn('created_at')})")
+        # rows out of the range of the partitions are kept until a partition is created for them
+        editor.execute(f"CREATE TABLE {qn(TABLE + '_default')} PARTITION OF {qn(TABLE)} DEFAULT")
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT min({qn('created_at')}) FROM {qn(old)}")
+            first, = cursor.fetchone()
+        created = create_partitions(month_start(first or timezone.now()), months_ahead)
+
+        editor.execute(f"INSERT INTO {qn(TABLE)} SELECT * FROM {qn(old)}")
+        # the identity sequence, primary key and indexes of the old table are dropped with it
+        # so they are created again with the same names
+        editor.execute(f"DROP TABLE {qn(old)}")
+        # the primary key of a partitioned table must have the partition key
+        editor.execute(f"ALTER TABLE {qn(TABLE)} ADD PRIMARY KEY ({qn('id')}, {qn('created_at')})")
+        editor.execute(f"CREATE SEQUENCE {qn(sequence)} OWNED BY {qn(TABLE)}.{qn('id')}")
+        editor.execute(
+            f"ALTER TABLE {qn(TABLE)} ALTER COLUMN {qn('id')} SET DEFAULT nextval('{qn(sequence)}')"
+        )
+        editor.execute(
+            f"SELECT setval('{qn(sequence)}', COALESCE((SELECT max({qn('id')}) FROM {qn(TABLE)}), 0) + 1, false)"
+        )
+        editor.execute(
+            f"ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(TABLE + '_user_id_fk')} FOREIGN KEY ({qn('user_id')}) "
+            f"REFERENCES {qn(Users._meta.db_table)} ({qn('id')}) DEFERRABLE INITIALLY DEFERRED"
+        )
+        for index in Logins._meta.indexes:
+            editor.add_index(Logins, index)
+    return created
+
+
+# rollup
+def rollup_logins(start, end):
+    """
+    replace the daily counts of whole days in [start, end) by the counts of raw logins.
+    """
+    return rebuild_counts(LoginsDaily, start, end)
+
+
+def rebuild_rollups():
+    """
+    recompute the daily and hourly counts of all raw logins month by month, it fills the counts
+    of logins that are inserted before the rollups are counted, returns the number of counts.
+    """
+    first = Logins.objects.order_by('created_at').values_list('created_at', flat=True).first()
+    if first is None:
+        return 0
+
+    counted = 0
+    month = month_start(first)
+    while month <= timezone.now():
+        with transaction.atomic():
+            for model in PERIODS:
+                counted += rebuild_counts(model, month, next_month(month))
+        month = next_month(month)
+    return counted
+
+
+def apply_retention(raw_days):
+    """
+    roll the logins that are older than raw_days into daily counts and drop them,
+    returns (dropped partitions, deleted rows, daily counts).
+    """
+    cutoff = day_start(timezone.now() - timedelta(days=raw_days))
+    dropped, deleted, counted = [], 0, 0
+
+    # whole partitions are dropped without deleting their rows one by one
+    if is_partitioned():
+        for month, name in sorted(partitions().items()):
+            if next_month(month) > cutoff:
+                break
+            with transaction.atomic():
+                counted += rollup_logins(month, next_month(month))
+                with connection.cursor() as cursor:
+                    cursor.execute(f"DROP TABLE {qn(name)}")
+            dropped.append(name)
+
+    # the old days of the other partitions and of tables that are not partitioned
+    first = Logins.objects.filter(Q(created_at__lt=cutoff)).order_by('created_at').values_list(
+        'created_at', flat=True
+    ).first()
+    month = month_start(first) if first else cutoff
+    while month < cutoff:
+        end = min(next_month(month), cutoff)
+        with transaction.atomic():
+            counted += rollup_logins(month, end)
+            deleted += Logins.objects.filter(Q(created_at__gte=month) & Q(created_at__lt=end)).delete()[0]
+        month = end
+
+    # hourly counts are kept as long as raw logins, daily counts are kept forever
+    LoginsHourly.objects.filter(Q(hour__lt=cutoff)).delete()
+    return dropped, deleted, counted
@@ -0,0 +1,115 @@
+from datetime import timedelta
+from django.db import connection
+from django.db.models import (
+    Q, Count, Max, Sum, Value
+)
+from django.db.models.functions import (
+    TruncDate, TruncHour, Coalesce
+)
+from django.utils import timezone
+from users.models import Logins, LoginsDaily, LoginsHourly
+
+
+# the rollup models, their period field and the function that truncates created_at to it
+PERIODS = {
+    LoginsDaily: ('day', TruncDate),
+    LoginsHourly: ('hour', TruncHour),
+}
+# rows of every INSERT, 5 params a row stays under the params limit of sqlite
+BATCH_SIZE = 150
+
+
+def truncate(field, value):
+    value = timezone.localtime(value)
+    if field == 'day':
+        return value.date()
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def count_logins(events):
+    """
+    add (user_id, username, status, created_at) events to the counts of every rollup model,
+    every count is incremented by an upsert so concurrent processes do not overwrite each other.
+    """
+    for model, (field, _) in PERIODS.items():
+        counts = {}
+        for user_id, username, status, created_at in events:
+            key = (truncate(field, created_at), username or '', status)
+            count, user = counts.get(key, (0, None))
+            counts[key] = (count + 1, user_id or user)
+
+        table = connection.ops.quote_name(model._meta.db_table)
+        period = connection.ops.quote_name(field)
+        adapt = connection.ops.adapt_datefield_value if field == 'day' else connection.ops.adapt_datetimefield_value
+        # sorted keys lock the rows of concurrent upserts in the same order
+        rows = sorted(counts.items())
+        for start in range(0, len(rows), BATCH_SIZE):
+            batch = rows[start:start + BATCH_SIZE]
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {table} ({period}, "username", "status", "user_id", "count") '
+                    f'VALUES {", ".join(["(%s, %s, %s, %s, %s)"] * len(batch))} '
+                    f'ON CONFLICT ({period}, "username", "status") DO UPDATE SET '
+                    f'"count" = {table}."count" + EXCLUDED."count", '
+                    f'"user_id" = COALESCE(EXCLUDED."user_id", {table}."user_id")',
+                    [
+                        item for (value, username, status), (count, user) in batch
+                        for item in (adapt(value), username, status, user, count)
+                    ]
+                )
+
+
+def rebuild_counts(model, start, end):
+    """
+    count the raw logins of whole periods in [start, end) into the rollup model and returns the number
+    of counts, counts of a period are replaced so a period that is rolled again is not counted twice.
+    """
+    field, trunc = PERIODS[model]
+    rows = Logins.objects.filter(
+        Q(created_at__gte=start) & Q(created_at__lt=end)
+    ).annotate(
+        period=trunc('created_at'), name=Coalesce('username', Value(''))
+    ).values('period', 'name', 'status').annotate(
+        count=Count('id'), last_user=Max('user')
+    ).order_by()
+
+    counts = [
+        model(**{
+            field: row['period'], 'username': row['name'], 'status': row['status'],
+            'user_id': row['last_user'], 'count': row['count'],
+        })
+        for row in rows
+    ]
+    model.objects.bulk_create(
+        counts, batch_size=1000, update_conflicts=True,
+        unique_fields=[field, 'username', 'status'], update_fields=['user', 'count'],
+    )
+    return len(counts)
+
+
+def login_stats(model, start, end):
+    """
+    returns the SUCCESS/FAIL counts and the number of unique users of every period of the rollup model
+    in [start, end), periods without logins have zero counts.
+    """
+    field, _ = PERIODS[model]
+    rows = model.objects.filter(
+        Q(**{f'{field}__gte': start}) & Q(**{f'{field}__lt': end})
+    ).values(field).annotate(
+        success=Sum('count', filter=Q(status=Logins.Status.SUCCESS), default=0),
+        fail=Sum('count', filter=Q(status=Logins.Status.FAIL), default=0),
+        users=Count('user', distinct=True),
+        success_users=Count('user', distinct=True, filter=Q(status=Logins.Status.SUCCESS)),
+    ).order_by(field)
+    found = {row.pop(field): row for row in rows}
+
+    step = timedelta(days=1) if field == 'day' else timedelta(hours=1)
+    results = []
+    period = start
+    while period < end:
+        results.append({
+            'period': period.isoformat(),
+            **found.get(period, {'success': 0, 'fail': 0, 'users': 0, 'success_users': 0}),
+        })
+        period += step
+    return results
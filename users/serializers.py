@@ -1,16 +1,17 @@
 from rest_framework.serializers import (
-    ModelSerializer
+    ModelSerializer, PrimaryKeyRelatedField
 )
 from users import models as UsersModels
 from core.serializers import (
-    UsersSerializer,
+    UsersSerializer, DynamicFieldsMixin, ValuesSerializer
 )
 from core.models import Users
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework.exceptions import AuthenticationFailed
 
 
-class FollowSerializer(ModelSerializer):
+class FollowSerializer(DynamicFieldsMixin, ModelSerializer):
+    follower_user = PrimaryKeyRelatedField(read_only=True)
     follower_user_details = UsersSerializer(
         read_only=True, source='follower_user'
     )
@@ -20,10 +21,10 @@ class FollowSerializer(ModelSerializer):
 
     class Meta:
         model = UsersModels.Follow
-        exclude = ['follower_user']
+        fields = '__all__'
 
 
-class LoginsSerializers(ModelSerializer):
+class LoginsSerializers(DynamicFieldsMixin, ModelSerializer):
     user_details = UsersSerializer(read_only=True, source='user')
 
     class Meta:
@@ -31,7 +32,21 @@ class LoginsSerializers(ModelSerializer):
         fields = '__all__'
 
 
+# read-only fast serializers of list responses
+FollowValues = ValuesSerializer(FollowSerializer)
+LoginsValues = ValuesSerializer(LoginsSerializers)
+
+
 class TokenSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        # claims of core.authentication.StatelessJWTAuthentication
+        token = super().get_token(user)
+        token['username'] = user.username
+        token['role'] = user.role
+        token['status'] = user.status
+        return token
+
     def validate(self, attrs):
         data = super().validate(attrs)
 
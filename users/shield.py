@@ -0,0 +1,194 @@
+import threading
+from collections import OrderedDict
+from hashlib import md5
+from time import time
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+from users.audit import mark_login
+
+
+DEFAULTS = {
+    # when it is False every attempt is authenticated
+    'ENABLED': True,
+    # seconds of the sliding window that failures are counted in
+    'WINDOW': 300,
+    # number of buckets of the window, the window slides by WINDOW / BUCKETS seconds
+    'BUCKETS': 10,
+    # failed attempts of a username in the window before its attempts are rejected
+    'MAX_USERNAME_FAILURES': 10,
+    # failed attempts of a client ip in the window before its attempts are rejected
+    'MAX_IP_FAILURES': 50,
+    # maximum number of usernames and ips in the in-process tier
+    'LRU_SIZE': 10000,
+}
+
+
+def shield_settings():
+    return {**DEFAULTS, **getattr(settings, 'LOGIN_SHIELD', {})}
+
+
+class LoginShield:
+    """
+    A sliding-window counter of failed logins by username and client ip.
+    failures are counted in time buckets of the shared cache so every process sees them, the
+    in-process tier keeps the failures of this process and the keys that are already blocked,
+    so most rejected attempts are decided without reaching the shared cache.
+    """
+
+    def __init__(self, window, buckets, limits, lru_size):
+        self.buckets = buckets
+        self.bucket_seconds = window / buckets
+        self.timeout = int(window + self.bucket_seconds) + 1
+        # {'ip': limit, 'username': limit}
+        self.limits = limits
+        self.lru_size = lru_size
+        # {key: {bucket: failures}}
+        self.failures = OrderedDict()
+        # {key: time that the key is blocked until}
+        self.blocked = OrderedDict()
+        self.lock = threading.Lock()
+
+    def keys(self, ip, username):
+        keys = [('ip', ip)]
+        # spellings of a username (Admin, admin ) share one counter
+        username = username.strip().lower() if username else ''
+        if username:
+            keys.append(('username', md5(username.encode('utf-8'), usedforsecurity=False).hexdigest()))
+        return keys
+
+    def shared_key(self, key, bucket):
+        return f"login-failures:{key[0]}:{key[1]}:{bucket}"
+
+    def _remember(self, entries, key, value):
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > self.lru_size:
+            entries.popitem(last=False)
+
+    def _retry_after(self, key, counts, now, current):
+        """
+        returns seconds until the failures of the key are under its limit or 0.
+        """
+        counts = {bucket: count for bucket, count in counts.items() if bucket > current - self.buckets}
+        if sum(counts.values()) < self.limits[key[0]]:
+            return 0
+        # the oldest bucket leaves the window first
+        until = (min(counts) + self.buckets) * self.bucket_seconds
+        self._remember(self.blocked, key, until)
+        return max(until - now, 1)
+
+    def retry_after(self, ip, username):
+        """
+        returns seconds that the attempt of the username from the ip must wait or 0 if it is allowed.
+        """
+        now = time()
+        current = int(now // self.bucket_seconds)
+        keys = self.keys(ip, username)
+
+        with self.lock:
+            for key in keys:
+                until = self.blocked.get(key)
+                if until is not None:
+                    if until > now:
+                        return until - now
+                    del self.blocked[key]
+            for key in keys:
+                wait = self._retry_after(key, self.failures.get(key, {}), now, current)
+                if wait:
+                    return wait
+
+        # failures of the other processes
+        buckets = range(current - self.buckets + 1, current + 1)
+        shared = cache.get_many([self.shared_key(key, bucket) for key in keys for bucket in buckets])
+        with self.lock:
+            for key in keys:
+                counts = {
+                    bucket: shared[self.shared_key(key, bucket)]
+                    for bucket in buckets if self.shared_key(key, bucket) in shared
+                }
+                wait = self._retry_after(key, counts, now, current)
+                if wait:
+                    return wait
+        return 0
+
+    def add_failure(self, ip, username):
+        """
+        count a failed attempt of the username from the ip.
+        """
+        current = int(time() // self.bucket_seconds)
+        keys = self.keys(ip, username)
+
+        with self.lock:
+            for key in keys:
+                counts = {
+                    bucket: count for bucket, count in self.failures.get(key, {}).items()
+                    if bucket > current - self.buckets
+                }
+                counts[current] = counts.get(current, 0) + 1
+                self._remember(self.failures, key, counts)
+
+        for key in keys:
+            shared_key = self.shared_key(key, current)
+            cache.add(shared_key, 0, timeout=self.timeout)
+            try:
+                cache.incr(shared_key)
+            except ValueError:
+                # expired between add and incr
+                cache.set(shared_key, 1, timeout=self.timeout)
+
+
+_shield = None
+_shield_lock = threading.Lock()
+
+
+def get_login_shield():
+    """
+    returns the login shield of this process or None when it is disabled.
+    """
+    global _shield
+    config = shield_settings()
+    if not config['ENABLED']:
+        return None
+
+    if _shield is None:
+        with _shield_lock:
+            if _shield is None:
+                _shield = LoginShield(
+                    config['WINDOW'], config['BUCKETS'],
+                    {'ip': config['MAX_IP_FAILURES'], 'username': config['MAX_USERNAME_FAILURES']},
+                    config['LRU_SIZE'],
+                )
+    return _shield
+
+
+class LoginShieldThrottle(BaseThrottle):
+    """
+    Rejects login attempts of usernames and ips that are failing repeatedly with 429,
+    it runs before the token serializer so rejected attempts do not hash the password.
+    """
+
+    def allow_request(self, request, view):
+        self.retry = 0
+        shield = get_login_shield()
+        if shield is None:
+            return True
+
+        username = request.data.get('username') if isinstance(request.data, dict) else None
+        username = username if isinstance(username, str) else None
+        # a rejected attempt is logged with its username although the token view does not run
+        mark_login(request, username, None)
+        self.retry = shield.retry_after(self.get_ident(request), username)
+        return not self.retry
+
+    def wait(self):
+        return self.retry
+
+
+def add_login_failure(request, username):
+    """
+    count a failed login of the request, called by users.middlewares.LogLoginMiddleware.
+    """
+    shield = get_login_shield()
+    if shield is not None:
+        shield.add_failure(LoginShieldThrottle().get_ident(request), username if isinstance(username, str) else None)
@@ -1,3 +1,268 @@
-from django.test import TestCase
+from contextlib import redirect_stdout
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from core.tests import SocialData, QueryCounts, ValuesParity
+from users import models as UsersModels
+from core import models as CoreModels
+from users import shield
+from users.audit import LoginAudit, insert_logins
+from users import retention
+from users.shield import LoginShield
+from users.rollups import count_logins
 
-# Create your tests here.
+
+class ValuesParityTests(ValuesParity, TestCase):
+
+    def test_follow(self):
+        self.assertParities(
+            '/users/follow/', 'expand=follower_user_details,followed_user_detials',
+            'fields=id,followed_user_detials.username&expand=followed_user_detials',
+            'limit=none&expand=follower_user_details'
+        )
+
+    def test_my_followers(self):
+        self.assertParities('/users/my-followers/', 'fields=id,username,email', 'limit=none')
+
+    def test_my_followings(self):
+        self.assertParities('/users/my-followings/', 'fields=id,username,email', 'limit=none')
+
+    def test_logins(self):
+        # the streamed export of logins is rendered by the values serializer, with null users
+        self.login(self.admin)
+        self.assertParities('/users/logins/', 'limit=none', 'limit=none&expand=user_details')
+
+
+class QueryCountTests(QueryCounts, TestCase):
+
+    def test_follow(self):
+        self.assertQueries('/users/follow/', 2)
+        self.assertQueries('/users/follow/?expand=follower_user_details,followed_user_detials', 3)
+        self.assertQueries(
+            f'/users/follow/{self.first_id(UsersModels.Follow, follower_user=self.user)}/?expand=followed_user_detials', 1
+        )
+
+    def test_my_followers(self):
+        self.assertQueries('/users/my-followers/', 2)
+        self.assertQueries('/users/my-followers/?fields=id,username', 2)
+
+    def test_my_followings(self):
+        self.assertQueries('/users/my-followings/', 2)
+        self.assertQueries('/users/my-followings/?fields=id,username', 2)
+
+    def test_random_users(self):
+        self.assertQueries('/users/random-users/', 2)
+        self.assertQueries(f'/users/random-users/{self.users[1].pk}/', 1)
+
+    def test_logins(self):
+        self.login(self.admin)
+        self.assertQueries('/users/logins/', 1)
+        self.assertQueries('/users/logins/?expand=user_details', 1)
+        self.assertQueries(f'/users/logins/{self.first_id(UsersModels.Logins)}/?expand=user_details', 1)
+
+
+class LoginStatsTests(SocialData, TestCase):
+
+    def test_permissions(self):
+        self.assertEqual(APIClient().get('/users/login-stats/').status_code, 401)
+        self.assertEqual(self.client.get('/users/login-stats/').status_code, 403)
+        self.login(self.admin)
+        self.assertEqual(self.client.get('/users/login-stats/').status_code, 200)
+
+    def test_counts(self):
+        now = timezone.now()
+        count_logins([
+            (self.user.pk, self.user.username, UsersModels.Logins.Status.SUCCESS, now),
+            (self.user.pk, self.user.username, UsersModels.Logins.Status.SUCCESS, now),
+            (None, 'unknown', UsersModels.Logins.Status.FAIL, now),
+            (self.user.pk, self.user.username, UsersModels.Logins.Status.FAIL, now - timedelta(days=1)),
+        ])
+        self.login(self.admin)
+
+        results = self.client.get('/users/login-stats/').json()['results']
+        # seven days that end today, days without logins have zero counts
+        self.assertEqual(len(results), 7)
+        today, yesterday = results[-1], results[-2]
+        self.assertEqual((today['success'], today['fail'], today['success_users']), (2, 1, 1))
+        self.assertEqual((yesterday['success'], yesterday['fail']), (0, 1))
+        self.assertEqual(results[0]['success'], 0)
+
+        results = self.client.get('/users/login-stats/?interval=hour').json()['results']
+        self.assertEqual(len(results), 7 * 24)
+        self.assertEqual(sum(row['success'] for row in results), 2)
+
+    def test_invalid_params(self):
+        self.login(self.admin)
+        for query in ('interval=week', 'start=2020-13-01', 'start=2024-02-01&end=2024-01-01', 'start=2020-01-01'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/users/login-stats/?{query}').status_code, 400)
+
+
+class LoginAuditTests(SimpleTestCase):
+
+    def test_failed_flushes_are_bounded(self):
+        audit = LoginAudit(max_size=100, flush_interval=60, max_pending=3)
+        events = [(None, f'user{index}', UsersModels.Logins.Status.FAIL, timezone.now()) for index in range(5)]
+        audit.add(events[0])
+        audit.add(events[1])
+
+        with mock.patch('users.audit.insert_logins', side_effect=Exception('database is down')):
+            self.assertEqual(audit.flush(), 0)
+        # the failed logins are kept before the new ones and the oldest are dropped
+        for event in events[2:]:
+            audit.add(event)
+        self.assertEqual(audit.pending, events[2:])
+        self.assertEqual((audit.stats['depth'], audit.stats['dropped'], audit.stats['failed_flushes']), (3, 2, 1))
+
+        with mock.patch('users.audit.insert_logins', side_effect=lambda pending: len(pending)):
+            self.assertEqual(audit.flush(), 3)
+        self.assertEqual(audit.stats['depth'], 0)
+
+
+@override_settings(LOGIN_AUDIT={'MODE': 'sync'})
+class LoginShieldTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(shield, '_shield', self.new_shield())
+        self.shield = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = CoreModels.Users.objects.create(
+            username='user', first_name='first', last_name='last', phone='0912'
+        )
+        self.user.set_password('password')
+        self.user.save()
+
+    def new_shield(self):
+        # a window of 100 seconds in buckets of 10 seconds
+        return LoginShield(window=100, buckets=10, limits={'ip': 5, 'username': 3}, lru_size=100)
+
+    def login(self, username, password='wrong', **headers):
+        return APIClient().post(
+            '/users/token/', {'username': username, 'password': password}, format='json', **headers
+        )
+
+    def test_sliding_window(self):
+        with mock.patch.object(shield, 'time', return_value=1000):
+            self.shield.add_failure('1.1.1.1', 'user')
+        with mock.patch.object(shield, 'time', return_value=1050):
+            self.shield.add_failure('2.2.2.2', 'user')
+            self.shield.add_failure('3.3.3.3', 'user')
+            # the username is blocked until its oldest failure leaves the window
+            self.assertEqual(self.shield.retry_after('4.4.4.4', 'user'), 50)
+            self.assertEqual(self.shield.retry_after('4.4.4.4', 'other'), 0)
+            # the other processes read the failures from the shared cache
+            self.assertEqual(self.new_shield().retry_after('4.4.4.4', 'user'), 50)
+        with mock.patch.object(shield, 'time', return_value=1100):
+            self.assertEqual(self.shield.retry_after('4.4.4.4', 'user'), 0)
+            self.assertEqual(self.new_shield().retry_after('4.4.4.4', 'user'), 0)
+
+    def test_username_normalisation(self):
+        for username in ('User', ' USER ', 'user'):
+            self.shield.add_failure('1.1.1.1', username)
+        self.assertTrue(self.shield.retry_after('2.2.2.2', 'uSeR'))
+        self.assertFalse(self.shield.retry_after('2.2.2.2', 'user2'))
+
+    def test_429(self):
+        for _ in range(3):
+            self.assertEqual(self.login(' User').status_code, 401)
+        # the right password is rejected too and the attempt is logged
+        response = self.login('user', 'password')
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(int(response['Retry-After']) > 0)
+        self.assertTrue(UsersModels.Logins.objects.filter(
+            user=self.user, username='user', status=UsersModels.Logins.Status.FAIL
+        ).exists())
+        self.assertEqual(self.login('other').status_code, 401)
+
+    def test_remote_addr(self):
+        # without trusted proxies X-Forwarded-For is ignored, a client can not spoof its ip
+        for index in range(5):
+            response = self.login(f'user{index}', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=f'1.1.1.{index}')
+            self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.login('user5', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='1.1.1.9').status_code, 429)
+        self.assertEqual(self.login('user5', REMOTE_ADDR='10.0.0.2').status_code, 401)
+
+    def test_trusted_proxy(self):
+        # behind one proxy the client is the address that the proxy appended to X-Forwarded-For
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            for index in range(5):
+                response = self.login(
+                    f'user{index}', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=f'9.9.9.{index}, 1.1.1.1'
+                )
+                self.assertEqual(response.status_code, 401)
+            for client, status_code in (('1.1.1.1', 429), ('2.2.2.2', 401)):
+                response = self.login('user5', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=client)
+                self.assertEqual(response.status_code, status_code, client)
+
+
+class RetentionTests(TestCase):
+
+    def setUp(self):
+        self.user = CoreModels.Users.objects.create(
+            username='user', first_name='first', last_name='last', phone='0912'
+        )
+        noon = retention.day_start(timezone.now()) + timedelta(hours=12)
+        self.old = noon - timedelta(days=100)
+        self.recent = noon - timedelta(days=10)
+        success, fail = UsersModels.Logins.Status.SUCCESS, UsersModels.Logins.Status.FAIL
+        # the logs are counted in the rollups when they are inserted, like the logs of /users/token/
+        insert_logins([
+            (self.user.pk, 'user', success, self.old),
+            (self.user.pk, 'user', success, self.old + timedelta(minutes=1)),
+            (None, 'user', fail, self.old),
+            (None, 'unknown', fail, self.old),
+            (self.user.pk, 'user', success, self.recent),
+        ])
+
+    def call(self, name, *args):
+        with redirect_stdout(StringIO()) as output:
+            call_command(name, *args)
+        return output.getvalue()
+
+    def daily_counts(self):
+        return sorted(UsersModels.LoginsDaily.objects.values_list('day', 'username', 'status', 'user', 'count'))
+
+    def test_rollup(self):
+        counts = self.daily_counts()
+        output = self.call('rollup-logins', '--days=90')
+        self.assertIn('4 rows deleted', output)
+
+        # the old logs are dropped and only their daily counts are kept
+        self.assertEqual(list(UsersModels.Logins.objects.values_list('created_at', flat=True)), [self.recent])
+        self.assertEqual(list(UsersModels.LoginsHourly.objects.values_list('hour', flat=True)), [self.recent])
+        self.assertEqual(self.daily_counts(), counts)
+        success, fail = UsersModels.Logins.Status.SUCCESS, UsersModels.Logins.Status.FAIL
+        self.assertIn((self.old.date(), 'user', success, self.user.pk, 2), counts)
+        # the user of a failed login is resolved by its username
+        self.assertIn((self.old.date(), 'user', fail, self.user.pk, 1), counts)
+        self.assertIn((self.old.date(), 'unknown', fail, None, 1), counts)
+
+    def test_rerun_is_idempotent(self):
+        self.call('rollup-logins', '--days=90')
+        counts = self.daily_counts()
+        hourly = UsersModels.LoginsHourly.objects.count()
+
+        # running the job again, with a rebuild or for the same period does not count the logs twice
+        self.assertIn('0 rows deleted', self.call('rollup-logins', '--days=90'))
+        self.call('rollup-logins', '--days=90', '--rebuild')
+        self.call('rollup-logins', '--days=90', '--rebuild')
+        start, end = self.recent - timedelta(days=1), self.recent + timedelta(days=1)
+        retention.rollup_logins(start, end)
+        retention.rollup_logins(start, end)
+        self.assertEqual(self.daily_counts(), counts)
+        self.assertEqual(UsersModels.LoginsHourly.objects.count(), hourly)
+
+    def test_partition_needs_postgres(self):
+        if retention.use_postgres():
+            self.skipTest('partitions are created on postgres')
+        self.assertIn('needs PostgreSQL', self.call('partition-logins'))
+        self.assertFalse(retention.is_partitioned())
+        self.assertEqual(UsersModels.Logins.objects.count(), 5)
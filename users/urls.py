@@ -13,6 +13,8 @@ router.register(r'logins', views.LoginsView, 'logins')
 router.register(r'my-followers', views.MyFollowers, 'my-followers')
 router.register(r'my-followings', views.MyFollowings, 'my-followings')
 router.register(r'random-users', views.RandomUsers, 'random-users')
+router.register(r'follow-status', views.FollowStatus, 'follow-status')
+router.register(r'login-stats', views.LoginStats, 'login-stats')
 
 
 urlpatterns = [
@@ -12,7 +12,8 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.request import Request
 from core.helper import (
-    dynamic_search, set_queryset,
+    dynamic_search, search_keys, set_queryset, sample_list, PrefetchMixin, StreamingListMixin, ValuesListMixin,
+    bulk_ids,
 )
 from drf_spectacular.utils import (
     extend_schema, OpenApiParameter
@@ -20,16 +21,26 @@ from drf_spectacular.utils import (
 from rest_framework_simplejwt.views import (
     TokenObtainPairView
 )
+from rest_framework_simplejwt.exceptions import (
+    TokenError, InvalidToken
+)
 from core.permissions import (
-    IsActive, IsAnonymous, IsSelfOrReadOnly, IsUser
+    IsActive, IsAnonymous, IsSelfOrReadOnly, IsUser, IsAdmin
 )
 from core.models import Users
 from core.serializers import UsersSerializer
+from core.paginations import KeysetPagination
 from rest_framework.exceptions import ValidationError
+from django.db import transaction, IntegrityError
+from users.audit import mark_login
+from users.shield import LoginShieldThrottle
+from users.rollups import login_stats
+from datetime import date, datetime, time, timedelta
+from django.utils import timezone
 
 
 # Follow APIs
-class FollowView(DestroyModelMixin, ListModelMixin, RetrieveModelMixin, CreateModelMixin, GenericViewSet):
+class FollowView(PrefetchMixin, StreamingListMixin, ValuesListMixin, DestroyModelMixin, ListModelMixin, RetrieveModelMixin, CreateModelMixin, GenericViewSet):
     serializer_class = UsersSerializers.FollowSerializer
     queryset = UsersModels.Follow.objects.all()
     permission_classes = [IsSelfOrReadOnly]
@@ -43,7 +54,7 @@ class FollowView(DestroyModelMixin, ListModelMixin, RetrieveModelMixin, CreateMo
                 Q(followed_user=request.user.pk)
             )
 
-        if request.query_params:
+        if search_keys(request):
             return dynamic_search(request, UsersModels.Follow)
 
         return super().get_queryset()
@@ -59,7 +70,7 @@ class FollowView(DestroyModelMixin, ListModelMixin, RetrieveModelMixin, CreateMo
     @extend_schema(
         description="""
         Get request of users returns all of the Follow.
-        for search in them and all of fields (foreign, normal) can use queryparmas.
+        for search in them the searchable fields (foreign, normal) of the model can use queryparmas.
         """,
         parameters=[
             OpenApiParameter(
@@ -108,40 +119,37 @@ class FollowView(DestroyModelMixin, ListModelMixin, RetrieveModelMixin, CreateMo
                 detail=f"Follower and followed user should not be in {out_users}.", code=400
             )
 
-        # prevent duplicate follow
-        found = UsersModels.Follow.objects.filter(Q(
-            followed_user=followed_user, follower_user=follower_user
-        )).exists()
-
-        if found:
+        # create follow relationship, the unique constraint prevents duplicate follow
+        try:
+            with transaction.atomic():
+                return super().create(request, *args, **kwargs)
+        except IntegrityError:
             return Response(
                 {"details": "These users are already following each other."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # create follow relationship
-        return super().create(request, *args, **kwargs)
-
     def perform_create(self, serializer):
         serializer.save(follower_user=self.request.user)
         return super().perform_create(serializer)
 
 
 # Login APIs
-class LoginsView(ReadOnlyModelViewSet):
+class LoginsView(PrefetchMixin, StreamingListMixin, ReadOnlyModelViewSet):
     serializer_class = UsersSerializers.LoginsSerializers
     queryset = UsersModels.Logins.objects.all()
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         request = self.request
-        if request.query_params:
+        if search_keys(request):
             return dynamic_search(request, UsersModels.Logins)
         return set_queryset(self, Users.Roles.USER, 'user', self.request.user.pk, UsersModels.Logins)
 
     @extend_schema(
         description="""
         Get request of users returns all of the Logins.
-        for search in them and all of fields (foreign, normal) can use queryparmas.
+        for search in them the searchable fields (foreign, normal) of the model can use queryparmas.
         """,
         parameters=[
             OpenApiParameter(
@@ -151,7 +159,7 @@ class LoginsView(ReadOnlyModelViewSet):
                 name='username', description="An example as foreign field in search (?username=abc)", required=False,
             ),
             OpenApiParameter(
-                name='page', type=int, description="Page number to return.", required=False,
+                name='cursor', type=str, description="Cursor of the page to return.", required=False,
             ),
             OpenApiParameter(
                 name='limit', type=int, description="Number of items per page.", required=False,
@@ -165,8 +173,23 @@ class LoginsView(ReadOnlyModelViewSet):
 # generate token view
 class TokenObtianView(TokenObtainPairView):
     permission_classes = [IsAnonymous]
+    # rejects usernames and ips that are failing repeatedly before the password is hashed
+    throttle_classes = [LoginShieldThrottle]
     serializer_class = UsersSerializers.TokenSerializer
 
+    def post(self, request: Request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+        finally:
+            # logged by users.middlewares.LogLoginMiddleware without looking up the user again
+            username = request.data.get('username') if isinstance(request.data, dict) else None
+            mark_login(request, username, getattr(serializer, 'user', None))
+
+        return Response(serializer.validated_data, status=status.HTTP_200_OK)
+
 
 @extend_schema(
     parameters=[
@@ -182,7 +205,7 @@ class TokenObtianView(TokenObtainPairView):
     ],
     responses=UsersSerializer(many=True)
 )
-class MyFollowers(ListModelMixin, RetrieveModelMixin, GenericViewSet):
+class MyFollowers(PrefetchMixin, StreamingListMixin, ValuesListMixin, ListModelMixin, RetrieveModelMixin, GenericViewSet):
     """
     API endpoint that returns a paginated list of the current user's followers.
 
@@ -220,7 +243,7 @@ class MyFollowers(ListModelMixin, RetrieveModelMixin, GenericViewSet):
     ],
     responses=UsersSerializer(many=True)
 )
-class MyFollowings(ListModelMixin, RetrieveModelMixin, GenericViewSet):
+class MyFollowings(PrefetchMixin, StreamingListMixin, ValuesListMixin, ListModelMixin, RetrieveModelMixin, GenericViewSet):
     """
     API endpoint that returns a paginated list of the current user's followings.
 
@@ -256,11 +279,114 @@ class MyFollowings(ListModelMixin, RetrieveModelMixin, GenericViewSet):
         OpenApiParameter(
             name='page', type=int, description="Page number to return.", required=False,
         ),
+        OpenApiParameter(
+            name='seed', type=int, description="Seed of random order, keep it to get next pages in same order.",
+            required=False,
+        ),
     ],
 )
-class RandomUsers(ListModelMixin, RetrieveModelMixin, GenericViewSet):
+class RandomUsers(PrefetchMixin, ListModelMixin, RetrieveModelMixin, GenericViewSet):
     serializer_class = UsersSerializer
 
     def get_queryset(self):
         # set users that have active status and user role in random way
-        return Users.objects.filter(Q(role=Users.Roles.USER) & Q(status=Users.Status.ACTIVE)).order_by('?')
+        return Users.objects.filter(Q(role=Users.Roles.USER) & Q(status=Users.Status.ACTIVE))
+
+    def list(self, request: Request, *args, **kwargs):
+        return sample_list(request, self)
+
+
+@extend_schema(
+    description="""
+    Returns the follow status of the authenticated user with the users:
+    following (the user follows them) and followed_by (they follow the user).
+    """,
+    parameters=[
+        OpenApiParameter(
+            name='users', type=str, description="Comma separated ids of users (?users=1,2,3).", required=True,
+        ),
+    ],
+    responses=None
+)
+class FollowStatus(GenericViewSet):
+    permission_classes = [IsUser]
+
+    def list(self, request: Request, *args, **kwargs):
+        user = request.user.pk
+        users = bulk_ids(request.query_params.get('users'), 'users')
+
+        following = set(UsersModels.Follow.objects.filter(
+            Q(follower_user=user) & Q(followed_user__in=users)
+        ).values_list('followed_user', flat=True))
+        followed_by = set(UsersModels.Follow.objects.filter(
+            Q(followed_user=user) & Q(follower_user__in=users)
+        ).values_list('follower_user', flat=True))
+
+        return Response({
+            "results": [
+                {'user': item, 'following': item in following, 'followed_by': item in followed_by}
+                for item in users
+            ]
+        }, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    description="""
+    Returns the SUCCESS and FAIL logins and the number of unique users of every day or hour
+    in the range, the counts are read from the rollups of logins.
+    """,
+    parameters=[
+        OpenApiParameter(
+            name='start', type=str, description="First day of the range (YYYY-MM-DD), default is 6 days before end.",
+            required=False,
+        ),
+        OpenApiParameter(
+            name='end', type=str, description="Last day of the range (YYYY-MM-DD), default is today.", required=False,
+        ),
+        OpenApiParameter(
+            name='interval', type=str, description="day (default) or hour.", required=False,
+        ),
+    ],
+    responses=None
+)
+class LoginStats(GenericViewSet):
+    permission_classes = [IsAdmin]
+    # number of days of a range of every interval
+    max_days = {'day': 366, 'hour': 31}
+
+    def get_day(self, name, default):
+        value = self.request.query_params.get(name)
+        if not value:
+            return default
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise ValidationError({"detail": f"{name} must be a date as YYYY-MM-DD."})
+
+    def list(self, request: Request, *args, **kwargs):
+        interval = request.query_params.get('interval', 'day')
+        if interval not in self.max_days:
+            raise ValidationError({"detail": "interval must be day or hour."})
+
+        end = self.get_day('end', timezone.localdate())
+        start = self.get_day('start', end - timedelta(days=6))
+        if start > end:
+            raise ValidationError({"detail": "start must not be after end."})
+        if (end - start).days >= self.max_days[interval]:
+            raise ValidationError({
+                "detail": f"range of {interval} interval must be at most {self.max_days[interval]} days."
+            })
+
+        if interval == 'day':
+            results = login_stats(UsersModels.LoginsDaily, start, end + timedelta(days=1))
+        else:
+            tz = timezone.get_current_timezone()
+            results = login_stats(
+                UsersModels.LoginsHourly,
+                datetime.combine(start, time.min, tzinfo=tz),
+                datetime.combine(end + timedelta(days=1), time.min, tzinfo=tz),
+            )
+
+        return Response({
+            "interval": interval, "start": start, "end": end, "results": results
+        }, status=status.HTTP_200_OK)